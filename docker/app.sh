@@ -3,6 +3,12 @@
 
 alembic upgrade head
 
+# Метрики Prometheus от всех воркеров gunicorn собираются через общий каталог
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 #cd src
 
-gunicorn src.main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:8000
+# Воркеры, цикл событий, --preload, keep-alive, max_requests - из профиля SERVER_PROFILE (src/server.py)
+export SERVER_PROFILE=${SERVER_PROFILE:-production}
+gunicorn src.main:app --config python:src.gunicorn_conf --bind=0.0.0.0:8000
@@ -3,6 +3,10 @@
 #cd src
 
 if [[ "${1}" == "celery" ]]; then
+  # Метрики задач отдаются воркером на CELERY_METRICS_PORT (общий каталог для prefork-процессов)
+  export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc_celery}
+  export CELERY_METRICS_PORT=${CELERY_METRICS_PORT:-9808}
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
   celery --app=src.tasks.tasks:celery worker -l INFO
 elif [[ "${1}" == "flower" ]]; then
   celery --app=src.tasks.tasks:celery flower
@@ -1,7 +1,9 @@
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 
 from alembic import context
 from src.config import DB_USER, DB_NAME, DB_PASS, DB_PORT, DB_HOST
@@ -30,6 +32,9 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = [Base.metadata, shorturl_metadata]
 
+# Сколько DDL ждёт блокировку таблицы, прежде чем упасть (см. migrations/online.py)
+LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -74,8 +79,17 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # ALTER TABLE в очереди за долгим запросом блокирует всех, кто пришёл после него:
+            # лучше упасть и повторить миграцию, чем остановить запись в links
+            connection.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+            connection.commit()
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            # Отдельная транзакция на миграцию: autocommit_block() в online.py
+            # фиксирует только текущую миграцию, а не всю цепочку
+            transaction_per_migration=True,
         )
 
         with context.begin_transaction():
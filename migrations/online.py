@@ -0,0 +1,177 @@
+"""Помощники для миграций без простоя на больших таблицах (в первую очередь links).
+
+Соглашения:
+- новые индексы на существующих таблицах - только create_index_concurrently;
+- заполнение/пересчёт столбцов - только backfill (пачки по ключу, пауза, контрольная точка),
+  а если значение считается кодом приложения - backfill_computed;
+- внешние ключи и CHECK на существующих таблицах - add_*_not_valid, а validate_constraint
+  отдельным шагом (можно в следующей миграции);
+- env.py выставляет lock_timeout, поэтому DDL, не получивший блокировку, падает сразу,
+  а не выстраивает за собой очередь из запросов приложения.
+
+На PostgreSQL используются CONCURRENTLY / NOT VALID, на остальных СУБД (SQLite в тестах) -
+обычные операции Alembic.
+"""
+import logging
+import time
+from typing import Callable, Iterator, Optional, Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+logger = logging.getLogger("alembic.online")
+
+CHECKPOINTS_TABLE = "alembic_backfill_checkpoints"
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _index_state(name: str) -> Optional[bool]:
+    """None - индекса нет, иначе признак indisvalid"""
+    return op.get_bind().execute(
+        sa.text("SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"),
+        {"name": name},
+    ).scalar()
+
+
+def create_index_concurrently(name: str, table: str, columns: Sequence[str], unique: bool = False,
+                              where: Optional[str] = None) -> None:
+    """CREATE INDEX CONCURRENTLY вне транзакции миграции: запись в таблицу не блокируется.
+
+    Невалидный индекс, оставшийся от прерванной попытки, удаляется и строится заново,
+    поэтому миграцию можно безопасно перезапускать.
+    """
+    if not _is_postgres():
+        op.create_index(name, table, list(columns), unique=unique,
+                        sqlite_where=sa.text(where) if where else None)
+        return
+    with op.get_context().autocommit_block():
+        state = _index_state(name)
+        if state is True:
+            return
+        if state is False:
+            logger.warning("Dropping invalid index %s left by an interrupted build", name)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, list(columns), unique=unique, postgresql_concurrently=True,
+                        postgresql_where=sa.text(where) if where else None)
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    if not _is_postgres():
+        op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def _checkpoint_table() -> sa.Table:
+    return sa.Table(
+        CHECKPOINTS_TABLE, sa.MetaData(),
+        sa.Column("name", sa.String(200), primary_key=True),
+        sa.Column("last_key", sa.String(200), nullable=True),
+        sa.Column("rows", sa.BigInteger, nullable=False, default=0),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now()),
+    )
+
+
+def _keyset_batches(name: str, table: str, key: str, where: Optional[str], batch_size: int, pause: float,
+                    columns: Sequence[str] = ()) -> Iterator[tuple[Optional[str], str, list]]:
+    """Пачки строк (start, end, rows) по ключу с контрольной точкой; вызывается внутри autocommit_block"""
+    checkpoints = _checkpoint_table()
+    bind = op.get_bind()
+    rows_sql = sa.text(
+        f"SELECT {', '.join([key, *columns])} FROM {table} WHERE (:start IS NULL OR {key} > :start)"
+        + (f" AND ({where})" if where else "")
+        + f" ORDER BY {key} LIMIT :batch"
+    )
+    row = bind.execute(sa.select(checkpoints.c.last_key).where(checkpoints.c.name == name)).first()
+    if row is None:
+        bind.execute(checkpoints.insert().values(name=name, last_key=None, rows=0))
+    start = row.last_key if row else None
+    while True:
+        rows = bind.execute(rows_sql, {"start": start, "batch": batch_size}).all()
+        if not rows:
+            break
+        end = str(rows[-1][0])
+        yield start, end, rows
+        bind.execute(
+            checkpoints.update().where(checkpoints.c.name == name)
+            .values(last_key=end, rows=checkpoints.c.rows + len(rows))
+        )
+        start = end
+        if pause:
+            time.sleep(pause)
+
+
+def backfill(name: str, table: str, update_sql: str, key: str = "id", where: Optional[str] = None,
+             batch_size: int = 10000, pause: float = 0.1) -> int:
+    """Пачечное заполнение: UPDATE по диапазонам ключа, каждая пачка фиксируется сразу (autocommit).
+
+    update_sql - UPDATE с условием на диапазон `{key} > :start AND {key} <= :end`
+    (:start равен NULL для первой пачки - используйте `(:start IS NULL OR id > :start)`).
+    where ограничивает выборку ключей (например, только ещё не заполненные строки).
+    Последний обработанный ключ хранится в alembic_backfill_checkpoints[name],
+    прерванная миграция продолжается с него (последняя пачка может выполниться повторно,
+    поэтому UPDATE должен быть идемпотентным). pause - пауза между пачками, чтобы не
+    забивать диск, WAL и реплики. Возвращает число обновлённых строк за этот запуск.
+    """
+    bind = op.get_bind()
+    _checkpoint_table().create(bind, checkfirst=True)
+    update = sa.text(update_sql)
+    total = 0
+    with op.get_context().autocommit_block():
+        for start, end, _ in _keyset_batches(name, table, key, where, batch_size, pause):
+            total += bind.execute(update, {"start": start, "end": end}).rowcount
+            logger.info("%s: up to %s=%s, %d rows updated", name, key, end, total)
+    return total
+
+
+def backfill_computed(name: str, table: str, columns: Sequence[str], compute: Callable[..., dict],
+                      key: str = "id", where: Optional[str] = None, batch_size: int = 10000,
+                      pause: float = 0.1) -> int:
+    """Как backfill, но значения считает Python: compute(row) -> {столбец: значение} для строки
+    с выбранными columns. Для значений, которые должны совпадать с кодом приложения
+    (хэши, нормализация). Пачка записывается одним executemany UPDATE по ключу.
+    """
+    bind = op.get_bind()
+    _checkpoint_table().create(bind, checkfirst=True)
+    total = 0
+    with op.get_context().autocommit_block():
+        for _, end, rows in _keyset_batches(name, table, key, where, batch_size, pause, columns):
+            params = [{**compute(row), "_key": row[0]} for row in rows]
+            assignments = ", ".join(f"{column} = :{column}" for column in params[0] if column != "_key")
+            bind.execute(sa.text(f"UPDATE {table} SET {assignments} WHERE {key} = :_key"), params)
+            total += len(params)
+            logger.info("%s: up to %s=%s, %d rows updated", name, key, end, total)
+    return total
+
+
+def add_foreign_key_not_valid(name: str, source: str, referent: str, local_cols: Sequence[str],
+                              remote_cols: Sequence[str], ondelete: Optional[str] = None) -> None:
+    """Внешний ключ без проверки существующих строк (короткая блокировка), проверка - validate_constraint"""
+    if not _is_postgres():
+        op.create_foreign_key(name, source, referent, list(local_cols), list(remote_cols), ondelete=ondelete)
+        return
+    op.execute(
+        f"ALTER TABLE {source} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(local_cols)}) "
+        f"REFERENCES {referent} ({', '.join(remote_cols)})"
+        + (f" ON DELETE {ondelete}" if ondelete else "")
+        + " NOT VALID"
+    )
+
+
+def add_check_not_valid(name: str, table: str, condition: str) -> None:
+    if not _is_postgres():
+        op.create_check_constraint(name, table, sa.text(condition))
+        return
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} CHECK ({condition}) NOT VALID")
+
+
+def validate_constraint(name: str, table: str) -> None:
+    """Проверка существующих строк под SHARE UPDATE EXCLUSIVE: чтение и запись не блокируются"""
+    if not _is_postgres():
+        return
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
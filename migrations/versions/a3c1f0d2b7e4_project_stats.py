@@ -0,0 +1,48 @@
+"""project stats
+
+Revision ID: a3c1f0d2b7e4
+Revises: 5ef706b53a6a
+Create Date: 2026-10-19 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+import fastapi_users_db_sqlalchemy
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c1f0d2b7e4'
+down_revision: Union[str, None] = '5ef706b53a6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('project_stats',
+    sa.Column('user_id', fastapi_users_db_sqlalchemy.generics.GUID(), nullable=False),
+    sa.Column('project', sa.String(length=100), nullable=False),
+    sa.Column('total_links', sa.Integer(), nullable=False),
+    sa.Column('total_clicks', sa.Integer(), nullable=False),
+    sa.Column('active_links', sa.Integer(), nullable=False),
+    sa.Column('expired_links', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'project')
+    )
+    # Начальное заполнение по существующим ссылкам (только чтение links), дальше счётчики ведёт приложение
+    op.execute("""
+        INSERT INTO project_stats (user_id, project, total_links, total_clicks, active_links, expired_links)
+        SELECT user_id, project, count(*), coalesce(sum(clicks), 0),
+               sum(CASE WHEN is_active THEN 1 ELSE 0 END), 0
+        FROM links
+        WHERE user_id IS NOT NULL AND project IS NOT NULL
+        GROUP BY user_id, project
+    """)
+    create_index_concurrently('ix_links_user_project_clicks', 'links', ['user_id', 'project', 'clicks'])
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_links_user_project_clicks', 'links')
+    op.drop_table('project_stats')
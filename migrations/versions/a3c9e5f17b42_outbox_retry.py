@@ -0,0 +1,41 @@
+"""outbox retry backoff, per-step delivery and dead letters
+
+Revision ID: a3c9e5f17b42
+Revises: f5b1d7e3a2c8
+Create Date: 2026-10-20 11:18:42.530917
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e5f17b42'
+down_revision: Union[str, None] = 'f5b1d7e3a2c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('outbox', sa.Column('delivered', sa.JSON(), nullable=True))
+    op.add_column('outbox', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_table(
+        'outbox_dead',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=False, nullable=False),
+        sa.Column('event', sa.String(length=50), nullable=False),
+        sa.Column('short_code', sa.String(length=50), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('delivered', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('failed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('outbox_dead')
+    op.drop_column('outbox', 'next_attempt_at')
+    op.drop_column('outbox', 'delivered')
@@ -0,0 +1,71 @@
+"""projects
+
+Revision ID: b7d2e9c41f05
+Revises: a3c1f0d2b7e4
+Create Date: 2026-10-19 14:37:05.918342
+
+"""
+from typing import Sequence, Union
+import fastapi_users_db_sqlalchemy
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online import (
+    add_foreign_key_not_valid, backfill, create_index_concurrently, drop_index_concurrently, validate_constraint,
+)
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e9c41f05'
+down_revision: Union[str, None] = 'a3c1f0d2b7e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 10000
+
+
+def upgrade() -> None:
+    op.create_table('projects',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', fastapi_users_db_sqlalchemy.generics.GUID(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'name', name='uq_projects_user_name')
+    )
+    # Nullable-столбец без значения по умолчанию и NOT VALID-ключ - только короткая блокировка links
+    op.add_column('links', sa.Column('project_id', sa.Uuid(), nullable=True))
+    add_foreign_key_not_valid('links_project_id_fkey', 'links', 'projects', ['project_id'], ['id'], ondelete='SET NULL')
+
+    # Проекты из существующих строк, затем project_id в ссылках - пачками, чтобы не держать
+    # блокировку на всех строках links одним UPDATE
+    op.execute("""
+        INSERT INTO projects (id, user_id, name)
+        SELECT gen_random_uuid(), user_id, project
+        FROM links
+        WHERE user_id IS NOT NULL AND project IS NOT NULL
+        GROUP BY user_id, project
+    """)
+    backfill(
+        'links_project_id', 'links',
+        """
+        UPDATE links SET project_id = projects.id
+        FROM projects
+        WHERE projects.user_id = links.user_id AND projects.name = links.project
+          AND (:start IS NULL OR links.id > :start) AND links.id <= :end
+          AND links.project_id IS NULL
+        """,
+        where="project IS NOT NULL AND user_id IS NOT NULL",
+        batch_size=BACKFILL_BATCH,
+    )
+
+    create_index_concurrently('ix_links_user_project_id_created', 'links', ['user_id', 'project_id', 'created_at'])
+    validate_constraint('links_project_id_fkey', 'links')
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_links_user_project_id_created', 'links')
+    op.drop_constraint('links_project_id_fkey', 'links', type_='foreignkey')
+    op.drop_column('links', 'project_id')
+    op.drop_table('projects')
@@ -0,0 +1,62 @@
+"""project stats by project id
+
+Revision ID: b8d4f2a6c931
+Revises: a3c9e5f17b42
+Create Date: 2026-10-20 14:02:19.847213
+
+"""
+from typing import Sequence, Union
+import fastapi_users_db_sqlalchemy
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4f2a6c931'
+down_revision: Union[str, None] = 'a3c9e5f17b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = "total_links, total_clicks, active_links, expired_links"
+
+
+def upgrade() -> None:
+    # Счётчики переносятся как есть (expired_links по ссылкам не восстановить), ключ - id проекта
+    op.create_table('project_stats_by_id',
+    sa.Column('project_id', sa.Uuid(), nullable=False),
+    sa.Column('total_links', sa.Integer(), nullable=False),
+    sa.Column('total_clicks', sa.Integer(), nullable=False),
+    sa.Column('active_links', sa.Integer(), nullable=False),
+    sa.Column('expired_links', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('project_id')
+    )
+    op.execute(f"""
+        INSERT INTO project_stats_by_id (project_id, {COUNTERS})
+        SELECT projects.id, {COUNTERS}
+        FROM project_stats
+        JOIN projects ON projects.user_id = project_stats.user_id AND projects.name = project_stats.project
+    """)
+    op.drop_table('project_stats')
+    op.rename_table('project_stats_by_id', 'project_stats')
+
+
+def downgrade() -> None:
+    op.create_table('project_stats_by_name',
+    sa.Column('user_id', fastapi_users_db_sqlalchemy.generics.GUID(), nullable=False),
+    sa.Column('project', sa.String(length=100), nullable=False),
+    sa.Column('total_links', sa.Integer(), nullable=False),
+    sa.Column('total_clicks', sa.Integer(), nullable=False),
+    sa.Column('active_links', sa.Integer(), nullable=False),
+    sa.Column('expired_links', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'project')
+    )
+    op.execute(f"""
+        INSERT INTO project_stats_by_name (user_id, project, {COUNTERS})
+        SELECT projects.user_id, projects.name, {COUNTERS}
+        FROM project_stats
+        JOIN projects ON projects.id = project_stats.project_id
+    """)
+    op.drop_table('project_stats')
+    op.rename_table('project_stats_by_name', 'project_stats')
@@ -0,0 +1,34 @@
+"""link aliases
+
+Revision ID: c4e8a1d93b26
+Revises: b7d2e9c41f05
+Create Date: 2026-10-19 18:02:41.507219
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1d93b26'
+down_revision: Union[str, None] = 'b7d2e9c41f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Новая пустая таблица: обычные операции, links не блокируется
+    op.create_table('link_aliases',
+    sa.Column('short_code', sa.String(length=50), nullable=False),
+    sa.Column('link_id', sa.Uuid(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['links.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('short_code')
+    )
+    op.create_index(op.f('ix_link_aliases_link_id'), 'link_aliases', ['link_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_link_aliases_link_id'), table_name='link_aliases')
+    op.drop_table('link_aliases')
@@ -0,0 +1,39 @@
+"""link url hash
+
+Revision ID: d9f3b2a7c510
+Revises: c4e8a1d93b26
+Create Date: 2026-10-19 19:11:08.264730
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.online import backfill_computed, create_index_concurrently, drop_index_concurrently
+from src.utils.url import url_hash
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f3b2a7c510'
+down_revision: Union[str, None] = 'c4e8a1d93b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 10000
+
+
+def upgrade() -> None:
+    op.add_column('links', sa.Column('url_hash', sa.LargeBinary(length=32), nullable=True))
+    # Хэш считается тем же кодом, что и в приложении (канонизация URL в SQL не повторить)
+    backfill_computed(
+        'links_url_hash', 'links', ['original_url'],
+        lambda row: {'url_hash': url_hash(row.original_url)},
+        where='url_hash IS NULL',
+        batch_size=BACKFILL_BATCH,
+    )
+    create_index_concurrently('ix_links_user_url_hash', 'links', ['user_id', 'url_hash'])
+
+
+def downgrade() -> None:
+    drop_index_concurrently('ix_links_user_url_hash', 'links')
+    op.drop_column('links', 'url_hash')
@@ -0,0 +1,30 @@
+"""link redirect policy
+
+Revision ID: e2a6c8f4d913
+Revises: d9f3b2a7c510
+Create Date: 2026-10-19 20:05:41.518302
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a6c8f4d913'
+down_revision: Union[str, None] = 'd9f3b2a7c510'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Константные DEFAULT в PostgreSQL 11+ не переписывают таблицу
+    op.add_column('links', sa.Column('redirect_code', sa.SmallInteger(), server_default=sa.text('307'), nullable=False))
+    op.add_column('links', sa.Column('cache_ttl', sa.Integer(), nullable=True))
+    op.add_column('links', sa.Column('click_beacon', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('links', 'click_beacon')
+    op.drop_column('links', 'cache_ttl')
+    op.drop_column('links', 'redirect_code')
@@ -13,4 +13,4 @@ coverage html
 echo "Coverage report generated at htmlcov/index.html"
 
 # Load testing (optional)
-echo "To run load tests, execute: locust -f tests/load/locustfile.py"
\ No newline at end of file
+echo "To run load tests, execute: python -m tests.load.seed && PYTHONPATH=. locust -f tests/load/locustfile.py"
\ No newline at end of file
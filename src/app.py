@@ -1,20 +1,61 @@
 from fastapi import FastAPI
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import logging
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from redis import asyncio as aioredis
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.config import (
+    CLICK_STREAM, COMPRESSION_MINIMUM_SIZE, OUTBOX_EVENTS_STREAM, OUTBOX_WEBHOOK_URL, REDIRECT_CACHE_WARMUP, SQL_PROFILING,
+)
+from src.database import dispose_engine, init_engine
+from src.sharding import dispose_shards, init_shards, link_engines
+from src.shorturl.clicks import click_buffer
+from src.shorturl.click_stream import click_stream
+from src.metrics import MetricsMiddleware, instrument_sqlalchemy
+from src.profiling import QueryProfilerMiddleware
+from src.compression import CompressionMiddleware
+from src.redis_client import create_redis
+from src.shorturl.fast_redirect import warm_redirect_cache
+from src.cache import CACHE_PREFIX, TaggingRedisBackend
+from src.invalidation import invalidation_bus
+from src.outbox import outbox_relay, stream_hook, webhook_hook
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logging.basicConfig(level=logging.INFO)
-    redis = aioredis.from_url("redis://redis_app:5370/0")
-    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    redis = create_redis()
+    FastAPICache.init(TaggingRedisBackend(redis), prefix=CACHE_PREFIX)
     app.state.redis = redis
+    engine = app.state.engine = init_engine()
+    init_shards()
+    if REDIRECT_CACHE_WARMUP:
+        await warm_redirect_cache(engine, REDIRECT_CACHE_WARMUP)
+    # Переходы пишутся в поток Redis; буфер воркера остаётся на случай недоступного Redis
+    if CLICK_STREAM:
+        click_stream.redis = redis
+    # Фоновый сброс накопленных переходов в БД
+    click_flusher = asyncio.create_task(click_buffer.run(engine))
+    # Подписка на инвалидацию локального кэша редиректов
+    bus_listener = asyncio.create_task(invalidation_bus.run(redis))
+    # События изменения ссылок: инвалидация кэша, аналитика, вебхуки
+    outbox_relay.hooks = {}
+    if OUTBOX_EVENTS_STREAM:
+        outbox_relay.add_hook(stream_hook(redis, OUTBOX_EVENTS_STREAM), "stream")
+    if OUTBOX_WEBHOOK_URL:
+        outbox_relay.add_hook(webhook_hook(OUTBOX_WEBHOOK_URL), "webhook")
+    # События пишутся рядом со ссылками: на шардах outbox у каждого шарда свой
+    relays = [asyncio.create_task(outbox_relay.run(link_engine)) for link_engine in link_engines(engine)]
     yield
+    for task in (*relays, bus_listener, click_flusher):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    click_stream.redis = None
     await redis.close()
+    await dispose_shards()
+    await dispose_engine()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -26,3 +67,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# Сжатие больших ответов (списки ссылок) по Accept-Encoding: br/gzip
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+# Метрики Prometheus (/metrics)
+instrument_sqlalchemy()
+app.add_middleware(MetricsMiddleware)
+
+# Server-Timing и поиск N+1 для SQL (SQL_PROFILING=1)
+if SQL_PROFILING:
+    app.add_middleware(QueryProfilerMiddleware)
@@ -1,6 +1,6 @@
-from src.database import engine, Base
+from src.database import get_engine, Base
 
 
 async def create_db_and_tables():
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
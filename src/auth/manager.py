@@ -1,3 +1,4 @@
+import logging
 import uuid
 from typing import Optional
 
@@ -10,23 +11,26 @@ from src.config import SECRET
 
 SECRET = SECRET
 
+logger = logging.getLogger(__name__)
+
 
 class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     reset_password_token_secret = SECRET
     verification_token_secret = SECRET
 
     async def on_after_register(self, user: User, request: Optional[Request] = None):
-        print(f"User {user.id} has registered.")
+        logger.info("User %s has registered", user.id)
 
     async def on_after_forgot_password(
         self, user: User, token: str, request: Optional[Request] = None
     ):
-        print(f"User {user.id} has forgot their password. Reset token: {token}")
+        # Токен в лог не пишется: по нему можно сменить пароль
+        logger.info("User %s has forgot their password", user.id)
 
     async def on_after_request_verify(
         self, user: User, token: str, request: Optional[Request] = None
     ):
-        print(f"Verification requested for user {user.id}. Verification token: {token}")
+        logger.info("Verification requested for user %s", user.id)
 
 
 async def get_user_manager(user_db=Depends(get_user_db)):
@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import zlib
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+from urllib.parse import quote
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+
+from src.config import REDIRECT_CACHE_BUCKETS
+from src.invalidation import invalidation_bus
+from src.redis_client import execute_batched
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "fastapi-cache"
+# Наборы тегов живут дольше любой записи кэша (устаревшие ключи в наборе безвредны)
+TAG_TTL = 3600
+LINK_TAG_PREFIX = "link:"
+
+
+def link_tag(short_code: str) -> str:
+    return f"{LINK_TAG_PREFIX}{short_code}"
+
+
+def user_tag(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def project_tag(user_id, project: str) -> str:
+    return f"project:{user_id}:{project}"
+
+
+def cache_key(kind: str, *parts) -> str:
+    """Детерминированный ключ: {prefix}:{kind}:{part}:..., части экранируются, чтобы ':' не склеивал их"""
+    return ":".join([FastAPICache.get_prefix(), kind, *(quote(str(part), safe="") for part in parts)])
+
+
+def redirect_cache_key(short_code: str) -> str:
+    return cache_key("redirect", short_code)
+
+
+def redirect_bucket_key(short_code: str) -> str:
+    """Хэш Redis с записью редиректа (поле - короткий код), см. src/shorturl/redirect_cache.py"""
+    return cache_key("redirect-bucket", zlib.crc32(short_code.encode()) % REDIRECT_CACHE_BUCKETS)
+
+
+def _tag_key(tag: str) -> str:
+    return cache_key("tag", tag)
+
+
+# Теги для бэкендов без общего хранилища (InMemoryBackend в тестах): в памяти процесса
+_local_tags: dict[str, set[str]] = defaultdict(set)
+
+
+# Теги ключа, собранного key_builder, до записи значения (TaggingRedisBackend.set)
+_pending_tags: ContextVar[Optional[tuple[str, list[str]]]] = ContextVar("pending_cache_tags", default=None)
+
+
+def _tag_commands(key: str, tags: Iterable[str]) -> list[tuple]:
+    return [command for tag in tags for command in (("sadd", _tag_key(tag), key), ("expire", _tag_key(tag), TAG_TTL))]
+
+
+class TaggingRedisBackend(RedisBackend):
+    """RedisBackend, который привязывает ключ к тегам при записи значения - тем же конвейером, что SET.
+    Попадание в кэш обходится одним обменом с Redis, без SADD на каждую сборку ключа"""
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        pending = _pending_tags.get()
+        tags = pending[1] if pending is not None and pending[0] == key else []
+        _pending_tags.set(None)
+        await execute_batched(self.redis, [("set", key, value, expire), *_tag_commands(key, tags)])
+
+
+async def tag_key(key: str, tags: Iterable[str]) -> None:
+    """Связывает ключ кэша с тегами. Ошибка кэша, как и в fastapi-cache, не роняет запрос"""
+    backend = FastAPICache.get_backend()
+    if isinstance(backend, RedisBackend):
+        try:
+            await execute_batched(backend.redis, _tag_commands(key, tags))
+        except Exception:
+            logger.warning("Error tagging cache key '%s'", key, exc_info=True)
+    else:
+        for tag in tags:
+            _local_tags[tag].add(key)
+
+
+async def invalidate(*tags: Optional[str], strict: bool = False) -> int:
+    """Удаляет все записи кэша, связанные с тегами. Возвращает число удалённых ключей.
+
+    Теги ссылок в Redis также удаляют поле редиректа из его хэша-корзины, а коды ссылок
+    публикуются в шину инвалидации для локальных кэшей всех воркеров.
+    В Redis - два обмена: чтение наборов тегов и удаление всех ключей разом.
+    Без инициализированного кэша (например, в воркере Celery) ничего не делает.
+    strict - ошибка Redis пробрасывается, а не только пишется в лог (ретранслятор outbox повторит пачку).
+    """
+    tags = [tag for tag in tags if tag]
+    if not tags or FastAPICache._backend is None:
+        return 0
+    backend = FastAPICache.get_backend()
+    if isinstance(backend, RedisBackend):
+        tag_keys = [_tag_key(tag) for tag in tags]
+        codes = [tag[len(LINK_TAG_PREFIX):] for tag in tags if tag.startswith(LINK_TAG_PREFIX)]
+        try:
+            results = await execute_batched(backend.redis, [
+                *(("smembers", tag_key_) for tag_key_ in tag_keys),
+                *(("hdel", redirect_bucket_key(code), code) for code in codes),
+            ])
+            keys = list({key for group in results[:len(tag_keys)] for key in group})
+            # UNLINK по ключу: память освобождается в фоне, ключи из разных слотов кластера не мешают
+            unlinked = await execute_batched(backend.redis, [("unlink", key) for key in [*keys, *tag_keys]])
+            deleted = sum(results[len(tag_keys):]) + sum(unlinked[:len(keys)])
+            if codes:
+                await invalidation_bus.publish(backend.redis, codes)
+        except Exception:
+            if strict:
+                raise
+            logger.warning("Error invalidating cache tags %s", tags, exc_info=True)
+            return 0
+        return deleted
+
+    keys = set()
+    for tag in tags:
+        keys |= _local_tags.pop(tag, set())
+    deleted = 0
+    for key in keys:
+        try:
+            deleted += await backend.clear(key=key)
+        except KeyError:
+            pass
+    return deleted
+
+
+async def get_many(keys: list[str]) -> list[Optional[bytes]]:
+    """Значения ключей кэша по порядку, в Redis - одним конвейером GET.
+    Ошибка кэша - все ключи промахи (запрос не падает)"""
+    backend = FastAPICache.get_backend()
+    try:
+        if isinstance(backend, RedisBackend):
+            return await execute_batched(backend.redis, [("get", key) for key in keys])
+        return [await backend.get(key) for key in keys]
+    except Exception:
+        logger.warning("Error retrieving %d cache keys", len(keys), exc_info=True)
+        return [None] * len(keys)
+
+
+async def set_many(entries: Iterable[tuple[str, bytes, Iterable[str]]], expire: int) -> None:
+    """Записи (ключ, значение, теги) с привязкой к тегам; в Redis - одним конвейером на всю пачку"""
+    entries = list(entries)
+    backend = FastAPICache.get_backend()
+    if isinstance(backend, RedisBackend):
+        try:
+            await execute_batched(backend.redis, [
+                command
+                for key, value, tags in entries
+                for command in (("set", key, value, expire), *_tag_commands(key, tags))
+            ])
+        except Exception:
+            logger.warning("Error setting %d cache keys", len(entries), exc_info=True)
+        return
+    for key, value, tags in entries:
+        await backend.set(key, value, expire)
+        for tag in tags:
+            _local_tags[tag].add(key)
+
+
+def tagged_key_builder(
+        kind: str,
+        *params: str,
+        tags: Callable[[dict], Iterable[str]],
+        per_user: bool = True,
+        hashed: bool = False,
+):
+    """key_builder для @cache: ключ из имени ручки и её параметров, без сессии БД и прочих зависимостей.
+
+    per_user - в ключ входит id пользователя (ответ зависит от прав доступа);
+    hashed - параметры хэшируются (произвольный текст поиска);
+    tags(kwargs) - теги, по которым запись будет сброшена; с TaggingRedisBackend они пишутся
+    вместе со значением (при промахе), иначе - сразу при сборке ключа.
+    """
+    async def build(func, namespace: str = "", *, request=None, response=None, args=(), kwargs=None):
+        kwargs = kwargs or {}
+        values = [kwargs.get(name) for name in params]
+        if hashed:
+            values = [hashlib.sha1("\0".join(map(str, values)).encode()).hexdigest()]
+        if per_user:
+            values.insert(0, getattr(kwargs.get("user"), "id", "anonymous"))
+        key = cache_key(kind, *values)
+        if isinstance(FastAPICache.get_backend(), TaggingRedisBackend):
+            _pending_tags.set((key, list(tags(kwargs))))
+        else:
+            await tag_key(key, tags(kwargs))
+        return key
+
+    return build
+
+
+def _owner(kwargs: dict):
+    return getattr(kwargs.get("user"), "id", None)
+
+
+stats_key_builder = tagged_key_builder(
+    "stats", "short_code", tags=lambda kw: [link_tag(kw["short_code"])],
+)
+search_key_builder = tagged_key_builder(
+    "search", "original_url", hashed=True, tags=lambda kw: [user_tag(_owner(kw))],
+)
+project_links_key_builder = tagged_key_builder(
+    "project", "project_name", tags=lambda kw: [project_tag(_owner(kw), kw["project_name"])],
+)
+
+
+def link_tags(link) -> list[str]:
+    """Всё, что зависит от ссылки: редирект, статистика, поиск и ссылки проекта владельца"""
+    tags = [link_tag(link.short_code)]
+    if link.user_id is not None:
+        tags.append(user_tag(link.user_id))
+        if link.project:
+            tags.append(project_tag(link.user_id, link.project))
+    return tags
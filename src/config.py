@@ -12,11 +12,93 @@ DB_NAME = os.getenv("DB_NAME")
 
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SMTP_USER = os.getenv("SMTP_USER")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+# SMTP_USE_SSL=0 - обычное соединение, например с локальным отладочным сервером (python -m aiosmtpd -n)
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "1") == "1"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 2))
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", 100))
+# Ограничение провайдера: писем в секунду на воркер (0 - без ограничения)
+SMTP_RATE_LIMIT = float(os.getenv("SMTP_RATE_LIMIT", 10))
 
 SECRET = os.getenv("SECRET_KEY")
 
+# Redis приложения (кэш, теги, очереди). REDIS_MODE: standalone | sentinel | cluster
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis_app:5370/0")
+REDIS_MODE = os.getenv("REDIS_MODE", "standalone")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 1.0))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 1.0))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+# Для REDIS_MODE=sentinel: "host:port,host:port" и имя мастера
+REDIS_SENTINELS = os.getenv("REDIS_SENTINELS", "")
+REDIS_SENTINEL_MASTER = os.getenv("REDIS_SENTINEL_MASTER", "mymaster")
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
+
 DEFAULT_LINK_DAYS = os.getenv("DEFAULT_LINK_EXPIRE_DAYS")
 DEFAULT_UNUSED_LINK_DAYS = os.getenv("DEFAULT_UNUSED_LINK_EXPIRE_DAYS")
 
 MAX_ANONYMOUS_LINKS = os.getenv("MAX_ANONYMOUS_LINKS")
 ANONYMOUS_LINK_EXPIRE_DAYS = os.getenv("ANONYMOUS_LINK_EXPIRE_DAYS")
+
+# Быстрый путь редиректа без DI/ORM (FAST_REDIRECT=0 - обычный маршрут FastAPI)
+FAST_REDIRECT = os.getenv("FAST_REDIRECT", "1") == "1"
+# Число хэшей Redis, по которым раскладываются записи кэша редиректа (~100 записей на хэш)
+REDIRECT_CACHE_BUCKETS = int(os.getenv("REDIRECT_CACHE_BUCKETS", 1024))
+# Сколько самых посещаемых ссылок положить в кэш при старте воркера (0 - не прогревать)
+REDIRECT_CACHE_WARMUP = int(os.getenv("REDIRECT_CACHE_WARMUP", 0))
+# max-age редиректов 301/308 без явного cache_ttl ссылки, секунды
+REDIRECT_PERMANENT_MAX_AGE = int(os.getenv("REDIRECT_PERMANENT_MAX_AGE", 86400))
+# Локальный LRU редиректов в воркере поверх Redis (0 - выключен) и сверка версии шины инвалидации
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", 10000))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", 5))
+INVALIDATION_RESYNC_INTERVAL = float(os.getenv("INVALIDATION_RESYNC_INTERVAL", 5))
+
+# Переходы через Redis Stream (src/shorturl/click_stream.py): CLICK_STREAM=1 - редирект только пишет
+# событие в поток, в БД его сводит отдельный потребитель; иначе - буфер переходов в воркере
+CLICK_STREAM = os.getenv("CLICK_STREAM") == "1"
+CLICK_STREAM_KEY = os.getenv("CLICK_STREAM_KEY", "clicks")
+CLICK_STREAM_GROUP = os.getenv("CLICK_STREAM_GROUP", "click-ingest")
+# Примерная длина потока (XADD MAXLEN ~): старые события вытесняются, даже если их не успели прочитать
+CLICK_STREAM_MAXLEN = int(os.getenv("CLICK_STREAM_MAXLEN", 1000000))
+CLICK_STREAM_BATCH = int(os.getenv("CLICK_STREAM_BATCH", 5000))
+CLICK_STREAM_BLOCK_MS = int(os.getenv("CLICK_STREAM_BLOCK_MS", 1000))
+# Через сколько миллисекунд без подтверждения событие забирает другой потребитель
+CLICK_STREAM_CLAIM_IDLE_MS = int(os.getenv("CLICK_STREAM_CLAIM_IDLE_MS", 60000))
+
+# Маячок переходов (POST /links/{code}/beacon): не больше BEACON_RATE_LIMIT запросов с одного адреса
+# за BEACON_RATE_WINDOW секунд (0 - без ограничения)
+BEACON_RATE_LIMIT = int(os.getenv("BEACON_RATE_LIMIT", 60))
+BEACON_RATE_WINDOW = int(os.getenv("BEACON_RATE_WINDOW", 60))
+
+# Ретранслятор outbox (src/outbox.py): пачка событий, период фонового цикла (секунды), число попыток
+# доставки и пауза перед повтором (удваивается с каждой попыткой до OUTBOX_RETRY_MAX секунд);
+# поток Redis для аналитики и URL вебхука (пусто - не отправлять)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 500))
+OUTBOX_RELAY_INTERVAL = float(os.getenv("OUTBOX_RELAY_INTERVAL", 1.0))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 20))
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", 1.0))
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", 300))
+OUTBOX_EVENTS_STREAM = os.getenv("OUTBOX_EVENTS_STREAM", "")
+OUTBOX_WEBHOOK_URL = os.getenv("OUTBOX_WEBHOOK_URL", "")
+
+# Наибольшее число кодов в одном POST /links/stats/batch
+STATS_BATCH_MAX_CODES = int(os.getenv("STATS_BATCH_MAX_CODES", 5000))
+
+# Шарды таблицы links (src/sharding.py): "имя=url имя=url", пусто - одна основная БД;
+# точек на шард в кольце consistent hashing
+DB_SHARDS = os.getenv("DB_SHARDS", "")
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", 128))
+
+# Снимок редиректов для режима чтения (src/snapshot_app.py): путь к файлу, период выгрузки
+# задачей Celery beat (0 - только по запросу) и как часто читатель проверяет, не сменился ли файл
+REDIRECT_SNAPSHOT_PATH = os.getenv("REDIRECT_SNAPSHOT_PATH", "redirects.snapshot")
+REDIRECT_SNAPSHOT_INTERVAL = int(os.getenv("REDIRECT_SNAPSHOT_INTERVAL", 0))
+SNAPSHOT_RELOAD_INTERVAL = float(os.getenv("SNAPSHOT_RELOAD_INTERVAL", 5))
+
+# Ответы меньше этого размера (байт) не сжимаются
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))
+
+# Профилирование SQL по запросам (только для разработки)
+SQL_PROFILING = os.getenv("SQL_PROFILING") == "1"
+SQL_PROFILING_N_PLUS_ONE = int(os.getenv("SQL_PROFILING_N_PLUS_ONE", 5))
@@ -1,9 +1,13 @@
 from collections.abc import AsyncGenerator
 from fastapi import Depends
 from fastapi_users.db import SQLAlchemyBaseUserTableUUID, SQLAlchemyUserDatabase
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import (
+    JSON, BigInteger, DateTime, ForeignKey, Index, Integer, LargeBinary, SmallInteger, String, Text, UniqueConstraint, false,
+    text,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.sql import func
 import uuid
 import os
@@ -30,6 +34,24 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
     # Связи
     links: Mapped[List["Link"]] = relationship("Link", back_populates="user", cascade="all, delete-orphan")
     expired_links: Mapped[List["ExpiredLink"]] = relationship("ExpiredLink", back_populates="user")
+    projects: Mapped[List["Project"]] = relationship("Project", back_populates="user", cascade="all, delete-orphan")
+
+
+class Project(Base):
+    __tablename__ = "projects"
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    name: Mapped[str] = mapped_column(String(100))
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    user: Mapped["User"] = relationship(back_populates="projects")
+    links: Mapped[List["Link"]] = relationship(back_populates="project_ref", passive_deletes=True)
+
+    __table_args__ = (
+        # Список проектов пользователя и поиск по имени - диапазон по одному индексу
+        UniqueConstraint("user_id", "name", name="uq_projects_user_name"),
+    )
 
 
 class Link(Base):
@@ -37,6 +59,9 @@ class Link(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4, index=True)
     original_url: Mapped[str] = mapped_column(String(2048))
+    # SHA-256 канонического original_url (src/utils/url.py): поиск дубликатов без сравнения длинных строк.
+    # deferred - нужен только в условиях запросов, в объекты Link (и кэш ответов) не загружается
+    url_hash: Mapped[Optional[bytes]] = mapped_column(LargeBinary(32), nullable=True, deferred=True)
     short_code: Mapped[str] = mapped_column(String(50), unique=True, index=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     expires_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -45,9 +70,70 @@ class Link(Base):
     last_clicked_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
     user_id: Mapped[Optional[uuid.UUID]] = mapped_column(ForeignKey("users.id"), nullable=True)
     is_custom: Mapped[bool] = mapped_column(default=False)
+    # Имя проекта остаётся в ссылке (ответы API, счётчики project_stats), связь - через project_id
     project: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    project_id: Mapped[Optional[uuid.UUID]] = mapped_column(ForeignKey("projects.id", ondelete="SET NULL"), nullable=True)
+    # Политика редиректа (src/shorturl/redirect_policy.py): код ответа, max-age для браузера/CDN
+    # (NULL - по умолчанию для кода) и учёт переходов маячком при кэшируемом редиректе
+    redirect_code: Mapped[int] = mapped_column(SmallInteger, default=307, server_default=text("307"))
+    cache_ttl: Mapped[Optional[int]] = mapped_column(nullable=True)
+    click_beacon: Mapped[bool] = mapped_column(default=False, server_default=false())
 
     user: Mapped[Optional["User"]] = relationship(back_populates="links")
+    project_ref: Mapped[Optional["Project"]] = relationship(back_populates="links")
+
+    __table_args__ = (
+        # Топ ссылок проекта по переходам без сортировки всех ссылок проекта
+        Index("ix_links_user_project_clicks", "user_id", "project", "clicks"),
+        # Ссылки проекта по дате создания - диапазон по индексу
+        Index("ix_links_user_project_id_created", "user_id", "project_id", "created_at"),
+        # Существующая ссылка пользователя на тот же URL (reuse_existing)
+        Index("ix_links_user_url_hash", "user_id", "url_hash"),
+    )
+
+
+class LinkAlias(Base):
+    """Прежний код переименованной ссылки, который продолжает вести на неё"""
+    __tablename__ = "link_aliases"
+
+    short_code: Mapped[str] = mapped_column(String(50), primary_key=True)
+    link_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("links.id", ondelete="CASCADE"), index=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class OutboxEvent(Base):
+    """Событие изменения ссылки, записанное в транзакции изменения (src/outbox.py)"""
+    __tablename__ = "outbox"
+
+    # BIGSERIAL в PostgreSQL; в SQLite автоинкремент есть только у INTEGER PRIMARY KEY
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    event: Mapped[str] = mapped_column(String(50))
+    short_code: Mapped[str] = mapped_column(String(50))
+    # Теги кэша для инвалидации и данные для обработчиков (аналитика, вебхуки)
+    payload: Mapped[dict] = mapped_column(JSON)
+    attempts: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    # Пройденные шаги доставки ("invalidate" и имена обработчиков) - при повторе они пропускаются
+    delivered: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    # Следующая попытка не раньше этого времени (NULL - новое событие, доставляется сразу)
+    next_attempt_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class OutboxDeadEvent(Base):
+    """Событие outbox, не доставленное за OUTBOX_MAX_ATTEMPTS попыток (src/outbox.py)"""
+    __tablename__ = "outbox_dead"
+
+    # id события в outbox
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False)
+    event: Mapped[str] = mapped_column(String(50))
+    short_code: Mapped[str] = mapped_column(String(50))
+    payload: Mapped[dict] = mapped_column(JSON)
+    attempts: Mapped[int] = mapped_column()
+    delivered: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    # Последняя ошибка доставки
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
+    failed_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
 class ExpiredLink(Base):
@@ -65,11 +151,54 @@ class ExpiredLink(Base):
     user: Mapped[Optional["User"]] = relationship(back_populates="expired_links")
 
 
-engine = create_async_engine(DATABASE_URL)
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+class ProjectStats(Base):
+    """Счётчики проекта пользователя, обновляемые при создании/удалении ссылок и сбросе переходов"""
+    __tablename__ = "project_stats"
+
+    # По id проекта: переименование проекта счётчики не затрагивает
+    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    total_links: Mapped[int] = mapped_column(default=0)
+    total_clicks: Mapped[int] = mapped_column(default=0)
+    active_links: Mapped[int] = mapped_column(default=0)
+    # Ссылки, удалённые очисткой как просроченные или неиспользуемые
+    expired_links: Mapped[int] = mapped_column(default=0)
+
+
+def dialect_insert(db):
+    """insert() диалекта сессии или соединения - для ON CONFLICT (PostgreSQL и SQLite)"""
+    dialect = db.dialect if hasattr(db, "dialect") else db.bind.dialect
+    return postgresql.insert if dialect.name == "postgresql" else sqlite.insert
+
+
+# Движок создаётся не при импорте, а в lifespan приложения (init_engine) или при первом
+# обращении (get_engine) - в воркере Celery уже после fork
+engine: Optional[AsyncEngine] = None
+async_session_maker = async_sessionmaker(expire_on_commit=False)
+
+
+def init_engine(url: Optional[str] = None, **kwargs) -> AsyncEngine:
+    """Создаёт движок и привязывает к нему async_session_maker; повторный вызов возвращает уже созданный"""
+    global engine
+    if engine is None:
+        engine = create_async_engine(url or DATABASE_URL, **kwargs)
+        async_session_maker.configure(bind=engine)
+    return engine
+
+
+def get_engine() -> AsyncEngine:
+    return engine if engine is not None else init_engine()
+
+
+async def dispose_engine() -> None:
+    global engine
+    if engine is not None:
+        await engine.dispose()
+        engine = None
+        async_session_maker.configure(bind=None)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    get_engine()
     async with async_session_maker() as session:
         yield session
 
@@ -0,0 +1,51 @@
+import gc
+import logging
+import os
+
+from prometheus_client import multiprocess
+
+from src.server import server_profile
+
+logger = logging.getLogger(__name__)
+
+# Настройки gunicorn из профиля запуска (SERVER_PROFILE, см. src/server.py)
+profile = server_profile()
+bind = os.getenv("WEB_BIND", "0.0.0.0:8000")
+workers = profile.workers
+worker_class = profile.worker_class
+preload_app = profile.preload
+keepalive = profile.keepalive
+backlog = profile.backlog
+max_requests = profile.max_requests
+max_requests_jitter = profile.max_requests_jitter
+timeout = profile.timeout
+graceful_timeout = profile.graceful_timeout
+
+
+def when_ready(server):
+    server.log.info(
+        "Server profile %s: %d workers (%s), preload=%s",
+        profile.name, profile.workers, profile.worker_class, profile.preload,
+    )
+
+
+def pre_fork(server, worker):
+    """Объекты, загруженные мастером (--preload), переводятся в постоянное поколение GC:
+    сборщик в воркерах их не обходит и не трогает страницы памяти, общие после fork"""
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Движок создаётся в lifespan воркера; если мастер всё же успел создать его при загрузке
+    # приложения, соединения его пула не должны использоваться в нескольких процессах
+    from src import database
+
+    if database.engine is not None:
+        database.engine.sync_engine.dispose(close=False)
+        logger.warning("Database engine was created before fork, its pool has been reset")
+
+
+def child_exit(server, worker):
+    """Удаляет файлы метрик завершившегося воркера (prometheus multiprocess)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,146 @@
+"""Локальный кэш редиректов воркера и шина его инвалидации через Redis pub/sub.
+
+Каждый воркер держит небольшой LRU (local_redirects) поверх общего кэша в Redis и в lifespan
+подписывается на канал инвалидации. cache.invalidate после удаления общих записей публикует
+в канал коды изменённых ссылок вместе с номером версии (INCR общего счётчика) - все воркеры
+всех узлов вычищают эти коды. Пропуск версии (сообщение потерялось при переподключении)
+или расхождение со счётчиком при периодической сверке очищают локальный кэш целиком.
+Пока воркер не подписан, локальный кэш выключен.
+
+В режиме REDIS_MODE=cluster у RedisCluster нет pubsub/publish: сообщение публикуется командой
+PUBLISH на узел по умолчанию, а подписка идёт через отдельное соединение с одним узлом -
+кластер пересылает опубликованное на всех узлах.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from fastapi_cache import FastAPICache
+
+from src.config import LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL, INVALIDATION_RESYNC_INTERVAL
+from src.redis_client import cluster_node_client, is_cluster
+
+logger = logging.getLogger(__name__)
+
+
+def channel_name() -> str:
+    return f"{FastAPICache.get_prefix()}:invalidation"
+
+
+def version_key() -> str:
+    return f"{FastAPICache.get_prefix()}:invalidation-version"
+
+
+class LocalCache:
+    """LRU в памяти воркера с коротким TTL; работает, только пока включён шиной"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = False
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        value, deadline = item
+        if deadline <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if not self.enabled or self.maxsize <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + min(self.ttl, ttl if ttl is not None else self.ttl))
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def evict(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class InvalidationBus:
+    def __init__(self, local: LocalCache, resync_interval: float = INVALIDATION_RESYNC_INTERVAL):
+        self.local = local
+        self.resync_interval = resync_interval
+        # Последняя применённая версия; меняется при каждой инвалидации в кластере
+        self.version: Optional[int] = None
+
+    async def publish(self, redis, codes: Iterable[str]) -> int:
+        """Вызывается после коммита и удаления общих записей. Возвращает номер версии"""
+        version = await redis.incr(version_key())
+        message = json.dumps({"v": version, "codes": list(codes)})
+        if is_cluster(redis):
+            await redis.execute_command("PUBLISH", channel_name(), message, target_nodes=redis.DEFAULT_NODE)
+        else:
+            await redis.publish(channel_name(), message)
+        return version
+
+    def apply(self, message: dict) -> None:
+        version = message["v"]
+        if self.version is not None and version > self.version + 1:
+            logger.info("Invalidation versions %d..%d missed, clearing local cache", self.version + 1, version - 1)
+            self.local.clear()
+        else:
+            self.local.evict(message["codes"])
+        self.version = max(version, self.version or 0)
+
+    async def resync(self, redis) -> None:
+        version = int(await redis.get(version_key()) or 0)
+        if version != self.version:
+            self.local.clear()
+            self.version = version
+
+    async def _listen(self, redis) -> None:
+        subscriber = await cluster_node_client(redis) if is_cluster(redis) else redis
+        pubsub = subscriber.pubsub()
+        try:
+            # Сначала подписка, потом сверка: между ними ничего не теряется
+            await pubsub.subscribe(channel_name())
+            await self.resync(redis)
+            self.local.enabled = True
+            resynced = time.monotonic()
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.resync_interval)
+                if message is not None:
+                    self.apply(json.loads(message["data"]))
+                if time.monotonic() - resynced >= self.resync_interval:
+                    await self.resync(redis)
+                    resynced = time.monotonic()
+        finally:
+            self.local.enabled = False
+            self.local.clear()
+            await pubsub.reset()
+            if subscriber is not redis:
+                await subscriber.close(close_connection_pool=True)
+
+    async def run(self, redis, retry_delay: float = 1.0) -> None:
+        """Фоновая подписка (запускается в lifespan), переподключается при ошибках Redis"""
+        while True:
+            try:
+                await self._listen(redis)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Invalidation bus disconnected, local cache disabled", exc_info=True)
+                await asyncio.sleep(retry_delay)
+
+
+local_redirects = LocalCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+invalidation_bus = InvalidationBus(local_redirects)
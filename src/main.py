@@ -4,9 +4,15 @@ from src.auth.manager import fastapi_users, current_active_user
 from src.auth.schemas import UserCreate, UserRead
 from src.shorturl.router import router as shortlink_router
 from src.tasks.router import router as tasks_router
+from src.projects.router import router as projects_router
+from src.metrics import router as metrics_router
 from src.database import User
 from src.app import app
+from src.config import FAST_REDIRECT
+from src.shorturl.fast_redirect import mount_fast_redirect
+from src.server import server_profile, uvicorn_options
 
+import os
 import uvicorn
 
 # Роутеры
@@ -21,7 +27,13 @@ app.include_router(
     tags=["auth"],
 )
 app.include_router(shortlink_router)
+app.include_router(projects_router)
 app.include_router(tasks_router)
+app.include_router(metrics_router)
+
+# Редирект по короткой ссылке обслуживается быстрым Starlette-маршрутом (те же URL и коды ответа)
+if FAST_REDIRECT:
+    mount_fast_redirect(app)
 
 
 @app.get("/protected-route")
@@ -35,4 +47,6 @@ def unprotected_route():
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", reload=True, host="0.0.0.0", log_level="info")
+    # Без gunicorn: по умолчанию профиль development (перезагрузка при изменении кода)
+    profile = server_profile(os.getenv("SERVER_PROFILE", "development"))
+    uvicorn.run("src.main:app", host="0.0.0.0", log_level="info", **uvicorn_options(profile))
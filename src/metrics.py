@@ -0,0 +1,227 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import APIRouter, Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+    start_http_server,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+from src.config import CLICK_STREAM
+from src.redis_client import execute_batched
+from src.sql_timing import add_query_observer
+
+logger = logging.getLogger(__name__)
+
+# В режиме нескольких воркеров gunicorn метрики пишутся в файлы каталога PROMETHEUS_MULTIPROC_DIR
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+CELERY_QUEUES = ("celery",)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Обращения к кэшу ответов (fastapi-cache)",
+    ["route", "result"],
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Время выполнения SQL-запроса",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "Количество SQL-запросов на один HTTP-запрос",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50),
+)
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Соединения, выданные из пула SQLAlchemy",
+    multiprocess_mode="livesum",
+)
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Время выполнения задач Celery",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+CELERY_QUEUE_DEPTH = Gauge(
+    "celery_queue_depth",
+    "Количество задач в очереди брокера",
+    ["queue"],
+    multiprocess_mode="max",
+)
+REDIRECTS = Counter(
+    "redirects_total",
+    "Результаты редиректов по коротким ссылкам",
+    ["outcome"],
+)
+CLICK_EVENTS = Counter(
+    "click_events_total",
+    "События переходов потока Redis: записанные в поток, в буфер при недоступном Redis, сведённые в БД",
+    ["outcome"],
+)
+CLICK_STREAM_LAG = Gauge(
+    "click_stream_lag",
+    "События потока переходов, ещё не выданные группе потребителей",
+    multiprocess_mode="max",
+)
+CLICK_STREAM_LAG_SECONDS = Gauge(
+    "click_stream_lag_seconds",
+    "Возраст самого старого события, не выданного группе потребителей",
+    multiprocess_mode="max",
+)
+CLICK_STREAM_PENDING = Gauge(
+    "click_stream_pending",
+    "События, выданные потребителям и ещё не подтверждённые",
+    multiprocess_mode="max",
+)
+
+# Счётчик SQL-запросов текущего HTTP-запроса (None вне запроса)
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+def _observe_query(statement, parameters, duration: float) -> None:
+    DB_QUERY_DURATION.observe(duration)
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CONNECTIONS_IN_USE.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS_IN_USE.dec()
+
+
+def instrument_sqlalchemy() -> None:
+    """Подписка на события всех движков и пулов SQLAlchemy (в том числе тестовых)"""
+    add_query_observer(_observe_query)
+    if event.contains(Pool, "checkout", _on_checkout):
+        return
+    event.listen(Pool, "checkout", _on_checkout)
+    event.listen(Pool, "checkin", _on_checkin)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """Реестр для выдачи метрик: общий по всем процессам в multiprocess-режиме"""
+    if not MULTIPROCESS:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def instrument_celery() -> None:
+    """Время выполнения задач Celery по сигналам prerun/postrun.
+
+    Воркер отдаёт метрики на порту CELERY_METRICS_PORT, если он задан.
+    """
+    from celery.signals import task_postrun, task_prerun, worker_ready
+
+    started: dict[str, float] = {}
+
+    @worker_ready.connect(weak=False)
+    def on_worker_ready(**kwargs):
+        port = os.getenv("CELERY_METRICS_PORT")
+        if port:
+            start_http_server(int(port), registry=metrics_registry())
+
+    @task_prerun.connect(weak=False)
+    def on_prerun(task_id=None, **kwargs):
+        started[task_id] = time.perf_counter()
+
+    @task_postrun.connect(weak=False)
+    def on_postrun(task_id=None, task=None, state=None, **kwargs):
+        start = started.pop(task_id, None)
+        if start is not None:
+            CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: гистограмма по шаблону маршрута, кэш-хиты и число SQL-запросов"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        cache_result = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, cache_result
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"x-fastapi-cache":
+                        cache_result = value.decode().lower()
+            await send(message)
+
+        token = _request_queries.set([0])
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            queries = _request_queries.get()[0]
+            _request_queries.reset(token)
+            route = scope.get("route")
+            # Для неизвестных путей не создаём отдельную серию на каждый URL
+            route_path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.labels(scope["method"], route_path, str(status_code)).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route_path).observe(queries)
+            if cache_result is not None:
+                CACHE_REQUESTS.labels(route_path, cache_result).inc()
+
+
+async def _update_queue_depth(request: Request) -> None:
+    redis = getattr(request.app.state, "redis", None)
+    if redis is None:
+        return
+    try:
+        depths = await execute_batched(redis, [("llen", queue) for queue in CELERY_QUEUES])
+    except Exception as e:
+        logger.warning("Cannot read celery queue depth: %s", e)
+        return
+    for queue, depth in zip(CELERY_QUEUES, depths):
+        CELERY_QUEUE_DEPTH.labels(queue).set(depth)
+
+
+async def _update_click_stream_lag(request: Request) -> None:
+    redis = getattr(request.app.state, "redis", None)
+    if redis is None or not CLICK_STREAM:
+        return
+    from src.shorturl.click_stream import update_lag_metrics
+
+    try:
+        await update_lag_metrics(redis)
+    except Exception as e:
+        logger.warning("Cannot read click stream lag: %s", e)
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Метрики в формате Prometheus"""
+    await _update_queue_depth(request)
+    await _update_click_stream_lag(request)
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
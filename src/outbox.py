@@ -0,0 +1,219 @@
+"""Transactional outbox изменений ссылок.
+
+Обработчик, меняющий links, в той же транзакции добавляет событие в таблицу outbox (add_event) -
+событие есть тогда и только тогда, когда изменение зафиксировано. Ретранслятор (OutboxRelay) забирает
+события пачками по id (FOR UPDATE SKIP LOCKED - несколько воркеров не мешают друг другу), сбрасывает
+кэш по их тегам одним invalidate, передаёт пачку обработчикам (поток Redis для аналитики, вебхук)
+и удаляет события. Доставка - не менее одного раза. Шаги (сброс кэша "invalidate" и каждый обработчик
+под своим именем) выполняются независимо, пройденные отмечаются в событии (delivered) и при повторе
+не выполняются снова: упавший вебхук не повторяет сброс кэша и поток. Повтор - не раньше next_attempt_at,
+пауза растёт вдвое с каждой попыткой (OUTBOX_RETRY_BASE..OUTBOX_RETRY_MAX), поэтому порядок событий
+при сбоях не сохраняется. После OUTBOX_MAX_ATTEMPTS попыток событие переносится в outbox_dead.
+
+Ретранслятор работает в lifespan каждого воркера API; после изменения обработчик ставит drain в
+фоновые задачи ответа - события расходятся сразу после отправки ответа, без сетевых вызовов до неё.
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import bindparam, delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.cache import invalidate
+from src.config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_MAX_ATTEMPTS, OUTBOX_RELAY_INTERVAL, OUTBOX_RETRY_BASE, OUTBOX_RETRY_MAX,
+)
+from src.database import OutboxDeadEvent, OutboxEvent
+from src.redis_client import execute_batched
+
+logger = logging.getLogger(__name__)
+
+outbox_table = OutboxEvent.__table__
+dead_table = OutboxDeadEvent.__table__
+
+LINK_CREATED = "link.created"
+LINK_UPDATED = "link.updated"
+LINK_DELETED = "link.deleted"
+LINK_EXPIRED = "link.expired"
+
+# Шаг доставки, который выполняется до обработчиков
+INVALIDATE_STEP = "invalidate"
+
+Hook = Callable[[list[dict]], Awaitable[None]]
+
+
+def add_event(db, event: str, link, tags: Iterable[str], **data) -> None:
+    """Событие в текущей транзакции сессии (фиксируется вместе с изменением ссылки)"""
+    db.add(OutboxEvent(
+        event=event,
+        short_code=link.short_code,
+        payload={
+            "tags": sorted(set(filter(None, tags))),
+            "user_id": str(link.user_id) if link.user_id else None,
+            "project": link.project,
+            **data,
+        },
+    ))
+
+
+def _batch_stmt(limit: int):
+    return (
+        select(outbox_table)
+        .where(or_(outbox_table.c.next_attempt_at.is_(None), outbox_table.c.next_attempt_at <= bindparam("now")))
+        .order_by(outbox_table.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+_retry_stmt = (
+    update(outbox_table)
+    .where(outbox_table.c.id == bindparam("event_id"))
+    .values(attempts=bindparam("n_attempts"), delivered=bindparam("steps"), next_attempt_at=bindparam("next_at"))
+)
+
+
+def event_message(row) -> dict:
+    return {
+        "id": row.id,
+        "event": row.event,
+        "short_code": row.short_code,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        **{key: value for key, value in row.payload.items() if key != "tags"},
+    }
+
+
+class OutboxRelay:
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 retry_base: float = OUTBOX_RETRY_BASE, retry_max: float = OUTBOX_RETRY_MAX):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.hooks: dict[str, Hook] = {}
+
+    def add_hook(self, hook: Hook, name: Optional[str] = None) -> None:
+        """name отмечает доставку в событиях, поэтому не должно меняться между перезапусками"""
+        name = name or hook.__name__
+        if name == INVALIDATE_STEP or name in self.hooks:
+            raise ValueError(f"Outbox hook name {name!r} is already taken")
+        self.hooks[name] = hook
+
+    def retry_delay(self, attempts: int) -> float:
+        """Пауза после attempts неудачных попыток"""
+        return min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+
+    async def publish(self, rows: list) -> tuple[dict[int, set[str]], Optional[Exception]]:
+        """Шаги доставки для событий, которые их ещё не прошли; сбой шага не мешает остальным.
+        Возвращает пройденные шаги по id события и последнюю ошибку"""
+        done = {row.id: set(row.delivered or ()) for row in rows}
+        error = None
+        for name in (INVALIDATE_STEP, *self.hooks):
+            pending = [row for row in rows if name not in done[row.id]]
+            if not pending:
+                continue
+            try:
+                if name == INVALIDATE_STEP:
+                    await invalidate(*{tag for row in pending for tag in row.payload.get("tags", ())}, strict=True)
+                else:
+                    await self.hooks[name]([event_message(row) for row in pending])
+            except Exception as e:
+                logger.exception("Outbox step %r failed for %d events", name, len(pending))
+                error = e
+                continue
+            for row in pending:
+                done[row.id].add(name)
+        return done, error
+
+    async def relay_batch(self, engine: AsyncEngine) -> int:
+        """Одна пачка из событий, срок попытки которых наступил; возвращает число доставленных полностью"""
+        now = datetime.now(timezone.utc)
+        async with engine.begin() as conn:
+            rows = (await conn.execute(_batch_stmt(self.batch_size), {"now": now})).all()
+            if not rows:
+                return 0
+            done, error = await self.publish(rows)
+            steps = {INVALIDATE_STEP, *self.hooks}
+            delivered = [row.id for row in rows if steps <= done[row.id]]
+            failed = [row for row in rows if not steps <= done[row.id]]
+            exhausted = [row for row in failed if row.attempts + 1 >= self.max_attempts]
+            retried = [row for row in failed if row.attempts + 1 < self.max_attempts]
+            if exhausted:
+                logger.error("Outbox events moved to outbox_dead after %d attempts: %s",
+                             self.max_attempts, [row.id for row in exhausted])
+                await conn.execute(insert(dead_table), [
+                    {"id": row.id, "event": row.event, "short_code": row.short_code, "payload": row.payload,
+                     "attempts": row.attempts + 1, "delivered": sorted(done[row.id]), "error": repr(error),
+                     "created_at": row.created_at, "failed_at": now}
+                    for row in exhausted
+                ])
+            if retried:
+                await conn.execute(_retry_stmt, [
+                    {"event_id": row.id, "n_attempts": row.attempts + 1, "steps": sorted(done[row.id]),
+                     "next_at": now + timedelta(seconds=self.retry_delay(row.attempts + 1))}
+                    for row in retried
+                ])
+            removed = delivered + [row.id for row in exhausted]
+            if removed:
+                await conn.execute(delete(outbox_table).where(outbox_table.c.id.in_(removed)))
+        return len(delivered)
+
+    async def drain(self, engine: AsyncEngine) -> int:
+        """Пачки подряд, пока таблица не опустеет или доставка не сорвётся"""
+        total = 0
+        while True:
+            delivered = await self.relay_batch(engine)
+            total += delivered
+            if delivered < self.batch_size:
+                return total
+
+    async def run(self, engine: AsyncEngine, interval: float = OUTBOX_RELAY_INTERVAL) -> None:
+        """Фоновый цикл (lifespan): события, не доставленные сразу, и записанные вне API (Celery)"""
+        while True:
+            try:
+                await self.drain(engine)
+            except Exception:
+                logger.exception("Outbox relay failed")
+            await asyncio.sleep(interval)
+
+
+outbox_relay = OutboxRelay()
+
+
+def stream_hook(redis, key: str, maxlen: int = 100000) -> Hook:
+    """Пачка событий в поток Redis (аналитика) одним конвейером"""
+    async def publish(messages: list[dict]) -> None:
+        await execute_batched(redis, [
+            ("xadd", key, {"event": json.dumps(message, default=str)}, "*", maxlen, True) for message in messages
+        ])
+
+    return publish
+
+
+def webhook_hook(url: str, timeout: float = 5.0, transport=None) -> Hook:
+    """Пачка событий одним POST; ответ не 2xx - повтор пачки"""
+    async def publish(messages: list[dict]) -> None:
+        import httpx
+
+        async with httpx.AsyncClient(timeout=timeout, transport=transport) as http:
+            response = await http.post(url, json={"events": messages})
+            response.raise_for_status()
+
+    return publish
+
+
+async def _drain_after_response(engine: AsyncEngine) -> None:
+    try:
+        await outbox_relay.drain(engine)
+    except Exception:
+        # Событие осталось в таблице, его доставит фоновый цикл
+        logger.exception("Outbox drain after response failed")
+
+
+def schedule_drain(background_tasks, engine: Optional[AsyncEngine]) -> None:
+    """Доставка событий запроса сразу после отправки ответа"""
+    if background_tasks is not None and engine is not None:
+        background_tasks.add_task(_drain_after_response, engine)
@@ -0,0 +1,108 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from src.config import SQL_PROFILING_N_PLUS_ONE
+from src.sql_timing import add_query_observer
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class QueryProfile:
+    """SQL-запросы, выполненные в рамках одного HTTP-запроса (или блока кода)"""
+    n_plus_one_threshold: int = SQL_PROFILING_N_PLUS_ONE
+    # (нормализованный текст запроса, repr параметров, длительность в секундах)
+    queries: list[tuple[str, str, float]] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        return sum(duration for _, _, duration in self.queries)
+
+    @property
+    def duplicates(self) -> dict[str, int]:
+        """Полностью одинаковые запросы (текст и параметры), выполненные больше одного раза"""
+        counts = Counter((statement, params) for statement, params, _ in self.queries)
+        return {statement: n for (statement, _), n in counts.items() if n > 1}
+
+    @property
+    def n_plus_one(self) -> dict[str, int]:
+        """Один и тот же запрос с разными параметрами, повторённый не меньше порога раз"""
+        counts = Counter(statement for statement, _, _ in self.queries)
+        return {statement: n for statement, n in counts.items() if n >= self.n_plus_one_threshold}
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries"'
+
+    def report(self) -> str:
+        lines = [f"{self.count} queries, {self.total_time * 1000:.2f} ms"]
+        for statement, n in self.duplicates.items():
+            lines.append(f"  duplicate x{n}: {statement}")
+        for statement, n in self.n_plus_one.items():
+            lines.append(f"  possible N+1 x{n}: {statement}")
+        return "\n".join(lines)
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+
+def _record_query(statement, parameters, duration: float) -> None:
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.queries.append((_WHITESPACE.sub(" ", statement).strip(), repr(parameters), duration))
+
+
+def instrument_sqlalchemy() -> None:
+    add_query_observer(_record_query)
+
+
+@contextmanager
+def profile_queries(n_plus_one_threshold: int = SQL_PROFILING_N_PLUS_ONE) -> Iterator[QueryProfile]:
+    """Собирает все SQL-запросы, выполненные внутри блока (в текущем контексте)"""
+    instrument_sqlalchemy()
+    profile = QueryProfile(n_plus_one_threshold=n_plus_one_threshold)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+class QueryProfilerMiddleware:
+    """Профилирование SQL по запросам (только для разработки, включается SQL_PROFILING=1).
+
+    Добавляет заголовок Server-Timing, пишет сводку в debug-лог и предупреждает о N+1.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", profile.server_timing().encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        label = f'{scope["method"]} {scope["path"]}'
+        logger.debug("%s: %s", label, profile.report())
+        for statement, n in profile.n_plus_one.items():
+            logger.warning("Possible N+1 in %s: %d x %s", label, n, statement)
@@ -0,0 +1,105 @@
+import uuid
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.manager import current_active_user
+from src.database import get_async_session, User, Project, dialect_insert
+from src.outbox import schedule_drain
+from src.sharding import link_engines
+from src.projects.schemas import ProjectCreate, ProjectUpdate, ProjectResponse
+from src.projects.service import get_project, projects_table, rename_project, delete_project
+
+
+router = APIRouter(
+    prefix="/projects",
+    tags=["Projects"]
+)
+
+
+async def _get_own_project(db: AsyncSession, user: User, name: str) -> Project:
+    project = await get_project(db, user.id, name)
+    if project is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    return project
+
+
+def _project_exists() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Project already exists"
+    )
+
+
+@router.get("", response_model=list[ProjectResponse])
+async def list_projects(
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user),
+):
+    """Проекты пользователя (диапазон по индексу (user_id, name))"""
+    result = await db.execute(
+        select(Project).where(Project.user_id == user.id).order_by(Project.name)
+    )
+    return result.scalars().all()
+
+
+@router.post("", status_code=status.HTTP_201_CREATED, response_model=ProjectResponse)
+async def create_project(
+        data: ProjectCreate,
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user),
+):
+    """Создание проекта (ON CONFLICT - без гонки между проверкой и вставкой)"""
+    result = await db.execute(
+        dialect_insert(db)(projects_table)
+        .values(id=uuid.uuid4(), user_id=user.id, name=data.name)
+        .on_conflict_do_nothing(index_elements=[projects_table.c.user_id, projects_table.c.name])
+    )
+    if not result.rowcount:
+        raise _project_exists()
+    await db.commit()
+    return await get_project(db, user.id, data.name)
+
+
+@router.patch("/{project_name}", response_model=ProjectResponse)
+async def update_project(
+        project_name: str,
+        data: ProjectUpdate,
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user),
+        background_tasks: BackgroundTasks = None,
+):
+    """Переименование проекта (имя меняется и в ссылках проекта, кэш ссылок сбрасывает outbox).
+    Занятое имя даёт IntegrityError по уникальному индексу (user_id, name) - без гонки с проверкой"""
+    project = await _get_own_project(db, user, project_name)
+    try:
+        await rename_project(db, project, data.name)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise _project_exists()
+    await db.refresh(project)
+    for engine in link_engines(db.bind):
+        schedule_drain(background_tasks, engine)
+    return project
+
+
+@router.delete("/{project_name}")
+async def remove_project(
+        project_name: str,
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user),
+        background_tasks: BackgroundTasks = None,
+):
+    """Удаление проекта (ссылки сохраняются без проекта)"""
+    project = await _get_own_project(db, user, project_name)
+    await delete_project(db, project)
+    await db.commit()
+    for engine in link_engines(db.bind):
+        schedule_drain(background_tasks, engine)
+    return {"message": "Project deleted successfully"}
@@ -0,0 +1,21 @@
+import uuid
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class ProjectCreate(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+
+
+class ProjectUpdate(BaseModel):
+    name: str = Field(min_length=1, max_length=100)
+
+
+class ProjectResponse(BaseModel):
+    id: uuid.UUID
+    name: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
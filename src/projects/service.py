@@ -0,0 +1,81 @@
+import asyncio
+import uuid
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src import sharding
+from src.cache import link_tags, project_tag
+from src.database import Link, Project, ProjectStats, dialect_insert
+from src.outbox import LINK_UPDATED, add_event
+
+projects_table = Project.__table__
+
+
+def project_id_subquery(user_id, name: str):
+    """id проекта по (user_id, name) - поиск по уникальному индексу, без join"""
+    return (
+        select(Project.id)
+        .where(Project.user_id == user_id, Project.name == name)
+        .scalar_subquery()
+    )
+
+
+async def get_project(db, user_id, name: str) -> Project | None:
+    result = await db.execute(select(Project).where(Project.user_id == user_id, Project.name == name))
+    return result.scalar_one_or_none()
+
+
+async def get_or_create_project_id(db, user_id, name: str) -> uuid.UUID:
+    """id проекта пользователя; проект создаётся при первой ссылке (ON CONFLICT - без гонки)"""
+    await db.execute(
+        dialect_insert(db)(projects_table)
+        .values(id=uuid.uuid4(), user_id=user_id, name=name)
+        .on_conflict_do_nothing(index_elements=[projects_table.c.user_id, projects_table.c.name])
+    )
+    result = await db.execute(select(Project.id).where(Project.user_id == user_id, Project.name == name))
+    return result.scalar_one()
+
+
+def _link_events(db, links, project: Project, old_name: str) -> None:
+    """События изменения ссылок проекта в той же транзакции: ретранслятор сбросит их кэш
+    вместе с кэшем проекта под прежним именем"""
+    for link in links:
+        add_event(db, LINK_UPDATED, link, [*link_tags(link), project_tag(project.user_id, old_name)],
+                  previous_project=old_name)
+
+
+async def _update_links(db, project: Project, old_name: str, values: dict) -> None:
+    """Изменение ссылок проекта с событиями outbox. На шардах - на каждом шарде своей транзакцией,
+    события пишутся там же, где ссылки"""
+    stmt = (
+        update(Link).where(Link.project_id == project.id).values(values)
+        .returning(Link.short_code, Link.user_id, Link.project)
+    )
+    if sharding.shard_router is None:
+        _link_events(db, (await db.execute(stmt)).all(), project, old_name)
+        return
+
+    async def run(engine):
+        async with AsyncSession(engine) as shard_db:
+            _link_events(shard_db, (await shard_db.execute(stmt)).all(), project, old_name)
+            await shard_db.commit()
+
+    await asyncio.gather(*(run(engine) for engine in sharding.shard_router.engines.values()))
+
+
+async def rename_project(db, project: Project, name: str) -> None:
+    """Переименование вместе с денормализованным именем в ссылках (project_stats - по id проекта).
+    Занятое имя даёт IntegrityError на flush - до изменения ссылок на шардах"""
+    old_name = project.name
+    project.name = name
+    await db.flush()
+    await _update_links(db, project, old_name, {"project": name})
+
+
+async def delete_project(db, project: Project) -> None:
+    """Удаление проекта: ссылки остаются без проекта, счётчики проекта удаляются"""
+    await _update_links(db, project, project.name, {"project_id": None, "project": None})
+    # ON DELETE CASCADE есть не везде (SQLite без PRAGMA foreign_keys)
+    await db.execute(delete(ProjectStats).where(ProjectStats.project_id == project.id))
+    await db.delete(project)
@@ -0,0 +1,105 @@
+"""Общий клиент Redis приложения и конвейерные помощники.
+
+Все настройки - из config (REDIS_*): адрес, размер пула, таймауты, проверка соединений
+и режим (standalone, sentinel, cluster). Несколько команд к Redis на одном пути записи
+отправляются одним конвейером (execute_batched), а не по одной: задержка сети
+не умножается на число ключей.
+"""
+from itertools import islice
+from typing import Iterable, Optional
+
+from redis import asyncio as aioredis
+
+from src.config import (
+    CELERY_BROKER_URL, REDIS_CONNECT_TIMEOUT, REDIS_HEALTH_CHECK_INTERVAL, REDIS_MAX_CONNECTIONS, REDIS_MODE,
+    REDIS_SENTINEL_MASTER, REDIS_SENTINELS, REDIS_SOCKET_TIMEOUT, REDIS_URL,
+)
+
+PIPELINE_CHUNK = 1000
+
+
+def _sentinel_hosts() -> list[tuple[str, int]]:
+    hosts = []
+    for item in filter(None, (part.strip() for part in REDIS_SENTINELS.split(","))):
+        host, _, port = item.partition(":")
+        hosts.append((host, int(port or 26379)))
+    return hosts
+
+
+def create_redis(url: Optional[str] = None, mode: Optional[str] = None, **options):
+    """Клиент Redis с пулом и таймаутами из config; options переопределяют настройки"""
+    url = url or REDIS_URL
+    mode = mode or REDIS_MODE
+    options = {
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        "retry_on_timeout": True,
+        **options,
+    }
+    if mode == "cluster":
+        from redis.asyncio.cluster import RedisCluster
+        # Пулом каждого узла управляет сам RedisCluster
+        options.pop("health_check_interval")
+        options.pop("retry_on_timeout")
+        return RedisCluster.from_url(url, **options)
+    if mode == "sentinel":
+        from redis.asyncio.sentinel import Sentinel
+        sentinel = Sentinel(
+            _sentinel_hosts(),
+            socket_timeout=options["socket_timeout"],
+            sentinel_kwargs={"socket_timeout": options["socket_timeout"]},
+        )
+        return sentinel.master_for(REDIS_SENTINEL_MASTER, **options)
+    if mode != "standalone":
+        raise ValueError(f"Unknown REDIS_MODE: {mode}")
+    return aioredis.from_url(url, **options)
+
+
+def is_cluster(redis) -> bool:
+    from redis.asyncio.cluster import RedisCluster
+    return isinstance(redis, RedisCluster)
+
+
+async def cluster_node_client(redis):
+    """Отдельный клиент к одному узлу кластера - для команд без ключа, которых нет у RedisCluster
+    (pub/sub: сообщения кластер сам рассылает всем узлам). Закрывает вызывающий"""
+    await redis.initialize()
+    node = redis.get_default_node()
+    kwargs = {name: value for name, value in node.connection_kwargs.items() if name != "parser_class"}
+    return aioredis.Redis(connection_pool=aioredis.ConnectionPool(connection_class=node.connection_class, **kwargs))
+
+
+def celery_broker_options() -> dict:
+    """URL брокера Celery и transport options с теми же таймаутами.
+
+    Kombu не поддерживает Redis Cluster, поэтому в режиме cluster брокеру нужен
+    отдельный CELERY_BROKER_URL.
+    """
+    transport_options = {
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+    }
+    url = CELERY_BROKER_URL
+    if url is None and REDIS_MODE == "sentinel":
+        url = ";".join(f"sentinel://{host}:{port}" for host, port in _sentinel_hosts())
+        transport_options["master_name"] = REDIS_SENTINEL_MASTER
+    return {"broker": url or REDIS_URL, "broker_transport_options": transport_options}
+
+
+async def execute_batched(redis, commands: Iterable[tuple], chunk_size: int = PIPELINE_CHUNK) -> list:
+    """Команды (имя, *аргументы) конвейером без MULTI: один обмен с Redis на chunk_size команд.
+
+    Результаты - в порядке команд. В режиме cluster конвейер сам раскладывает команды по узлам.
+    """
+    results = []
+    commands = iter(commands)
+    while batch := list(islice(commands, chunk_size)):
+        async with redis.pipeline(transaction=False) as pipe:
+            for name, *args in batch:
+                getattr(pipe, name)(*args)
+            results.extend(await pipe.execute())
+    return results
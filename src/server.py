@@ -0,0 +1,95 @@
+"""Профили запуска ASGI-сервера (SERVER_PROFILE): настройки gunicorn/uvicorn в одном месте.
+
+- production - по воркеру на доступное ядро, uvloop + httptools обязательны, приложение
+  загружается в мастере до fork (--preload: код и импортированные модули общие по copy-on-write),
+  движок БД и клиент Redis создаются в каждом воркере в lifespan; max_requests с разбросом
+  перезапускает воркеры не одновременно (защита от утечек памяти);
+- default - прежний запуск: 4 воркера, цикл событий и HTTP-парсер на выбор uvicorn;
+- development - один процесс uvicorn с перезагрузкой при изменении кода (python -m src.main).
+
+Используется src/gunicorn_conf.py и src/main.py.
+"""
+import math
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+CGROUP_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+
+
+@dataclass(frozen=True)
+class ServerProfile:
+    name: str
+    workers: int
+    worker_class: str
+    loop: str = "auto"
+    http: str = "auto"
+    preload: bool = False
+    reload: bool = False
+    # Секунды ожидания следующего запроса на keep-alive соединении
+    keepalive: int = 2
+    # Очередь ещё не принятых соединений (listen backlog)
+    backlog: int = 2048
+    # Перезапуск воркера после max_requests + random(0, jitter) запросов (0 - никогда)
+    max_requests: int = 0
+    max_requests_jitter: int = 0
+    timeout: int = 30
+    graceful_timeout: int = 30
+
+
+def available_cpus(cgroup_cpu_max: Path = CGROUP_CPU_MAX) -> int:
+    """Ядра, доступные процессу: привязка к CPU и квота cgroup v2 (лимит CPU контейнера)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # нет sched_getaffinity (macOS, Windows)
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = cgroup_cpu_max.read_text().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def server_profile(name: Optional[str] = None) -> ServerProfile:
+    """Профиль по имени или SERVER_PROFILE; WEB_WORKERS задаёт число воркеров явно"""
+    name = name or os.getenv("SERVER_PROFILE", "production")
+    if name == "production":
+        return ServerProfile(
+            name=name,
+            workers=_env_int("WEB_WORKERS", available_cpus()),
+            worker_class="src.uvicorn_worker.TunedUvicornWorker",
+            loop="uvloop",
+            http="httptools",
+            preload=True,
+            keepalive=_env_int("WEB_KEEPALIVE", 5),
+            backlog=_env_int("WEB_BACKLOG", 2048),
+            max_requests=_env_int("WEB_MAX_REQUESTS", 10000),
+            max_requests_jitter=_env_int("WEB_MAX_REQUESTS_JITTER", 1000),
+            graceful_timeout=_env_int("WEB_GRACEFUL_TIMEOUT", 20),
+        )
+    if name == "default":
+        return ServerProfile(name=name, workers=_env_int("WEB_WORKERS", 4), worker_class="uvicorn.workers.UvicornWorker")
+    if name == "development":
+        return ServerProfile(name=name, workers=1, worker_class="uvicorn.workers.UvicornWorker", reload=True)
+    raise ValueError(f"Unknown server profile: {name}")
+
+
+def uvicorn_options(profile: ServerProfile) -> dict:
+    """Параметры uvicorn.run для запуска без gunicorn"""
+    return {
+        "loop": profile.loop,
+        "http": profile.http,
+        "reload": profile.reload,
+        "workers": None if profile.reload else profile.workers,
+        "timeout_keep_alive": profile.keepalive,
+        "backlog": profile.backlog,
+        "limit_max_requests": profile.max_requests or None,
+    }
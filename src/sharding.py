@@ -0,0 +1,382 @@
+"""Горизонтальное шардирование таблицы links по хэшу короткого кода (DB_SHARDS).
+
+Шарды перечисляются через пробел: "s0=sqlite+aiosqlite:///shard0.db s1=postgresql+asyncpg://.../db?schema=s1".
+Параметр schema - схема Postgres (schema_translate_map), так несколько шардов живут в одной базе.
+На шардах links, link_aliases (алиасы лежат рядом со своей ссылкой) и outbox (событие пишется в транзакции
+изменения ссылки, ретранслятор разбирает outbox каждого шарда). Пользователи, проекты и счётчики проектов
+остаются в основной БД, поэтому таблицы шарда создаются без внешних ключей на них:
+
+    python -m src.sharding --shards "<DB_SHARDS>"
+
+Код попадает на шард по consistent hashing (HashRing): при добавлении шарда переезжает примерно
+1/N ссылок. Новая ссылка пишется на шард своего кода; переименованная остаётся на прежнем шарде.
+Ссылка ищется сначала на шарде кода, затем на остальных параллельно (first, locate) - так находятся
+переименованные ссылки, алиасы и ссылки, ещё не перенесённые после смены DB_SHARDS. Изменения ссылки
+идут через link_session - сессию шарда, на котором она лежит. Выборки по пользователю выполняются
+на всех шардах параллельно и сливаются (merged). Уникальный индекс short_code действует в пределах
+шарда, занятость кода на остальных шардах проверяется перед записью.
+
+Решардинг на ходу: приложение перезапускается с новым DB_SHARDS, затем
+
+    python -m src.sharding --from "<прежний DB_SHARDS>" --shards "<новый DB_SHARDS>" --reshard
+
+переносит пачками по коду ссылки, лежащие не на своём шарде: копия на новый шард, удаление со старого.
+Пока копия есть на обоих, чтение находит любую из них, а изменения и переходы идут на шард кода (новый);
+то, что успело попасть на старый шард до появления копии, досчитывается на новом (_move).
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import heapq
+import itertools
+import logging
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+from sqlalchemy import MetaData, bindparam, delete, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from src.config import DB_SHARDS, SHARD_VNODES
+from src.database import Link, LinkAlias, OutboxDeadEvent, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+links_table = Link.__table__
+aliases_table = LinkAlias.__table__
+
+RESHARD_BATCH_SIZE = 1000
+
+_locate_stmt = select(links_table.c.id).where(links_table.c.short_code == bindparam("code"))
+
+
+def code_hash(code: str) -> int:
+    return int.from_bytes(hashlib.blake2b(code.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Кольцо consistent hashing: у каждого шарда vnodes точек, код принадлежит ближайшей по часовой"""
+
+    def __init__(self, shards: Iterable[str], vnodes: int = SHARD_VNODES):
+        self.shards = tuple(dict.fromkeys(shards))
+        if not self.shards:
+            raise ValueError("HashRing needs at least one shard")
+        points = sorted((code_hash(f"{shard}#{i}"), shard) for shard in self.shards for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def shard_for(self, code: str) -> str:
+        index = bisect.bisect(self._hashes, code_hash(code))
+        return self._owners[index % len(self._owners)]
+
+
+def parse_shards(spec: str) -> dict[str, str]:
+    """"name=url name=url" -> {name: url}"""
+    shards = {}
+    for item in spec.split():
+        name, sep, url = item.partition("=")
+        if not sep or not name or not url:
+            raise ValueError(f"Invalid shard definition: {item!r}, expected name=url")
+        shards[name] = url
+    return shards
+
+
+def create_shard_engine(url: str, **kwargs) -> AsyncEngine:
+    """Движок шарда; ?schema=... - таблицы шарда в этой схеме (Postgres)"""
+    url = make_url(url)
+    schema = url.query.get("schema")
+    engine = create_async_engine(url.difference_update_query(["schema"]), **kwargs)
+    if schema:
+        engine = engine.execution_options(schema_translate_map={None: schema})
+    return engine
+
+
+class ShardRouter:
+    """Движки шардов и маршрутизация запросов по коду ссылки"""
+
+    def __init__(self, engines: dict[str, AsyncEngine], ring: Optional[HashRing] = None):
+        self.engines = engines
+        self.ring = ring or HashRing(engines)
+        unknown = set(self.ring.shards) - set(engines)
+        if unknown:
+            raise ValueError(f"No engines for shards: {', '.join(sorted(unknown))}")
+
+    @classmethod
+    def from_spec(cls, spec: str, **engine_kwargs) -> "ShardRouter":
+        return cls({name: create_shard_engine(url, **engine_kwargs) for name, url in parse_shards(spec).items()})
+
+    def shard_for(self, code: str) -> str:
+        return self.ring.shard_for(code)
+
+    def engine_for(self, code: str) -> AsyncEngine:
+        return self.engines[self.shard_for(code)]
+
+    async def _all(self, engine: AsyncEngine, stmt, params) -> list:
+        async with engine.connect() as conn:
+            return (await conn.execute(stmt, params or {})).all()
+
+    async def _first(self, stmt, params: dict, code: str) -> tuple[Optional[str], Any]:
+        home = self.shard_for(code)
+        rows = await self._all(self.engines[home], stmt, params)
+        if rows:
+            return home, rows[0]
+        others = [name for name in self.engines if name != home]
+        for name, rows in zip(others, await asyncio.gather(
+            *(self._all(self.engines[name], stmt, params) for name in others)
+        )):
+            if rows:
+                return name, rows[0]
+        return None, None
+
+    async def first(self, stmt, params: dict, code: str):
+        """Первая строка с шарда кода, иначе - с остальных шардов (в порядке их перечисления)"""
+        return (await self._first(stmt, params, code))[1]
+
+    async def locate(self, code: str) -> str:
+        """Шард, на котором лежит ссылка с кодом code; если её нигде нет - шард кода по кольцу"""
+        name, _ = await self._first(_locate_stmt, {"code": code}, code)
+        return name or self.shard_for(code)
+
+    async def exists(self, stmt, params: Optional[dict] = None, skip: Optional[AsyncEngine] = None) -> bool:
+        """Вернул ли stmt строку хоть на одном шарде, кроме skip"""
+        engines = [engine for engine in self.engines.values() if engine is not skip]
+        return any(await asyncio.gather(*(self._all(engine, stmt, params) for engine in engines)))
+
+    async def fan_out(self, stmt, params: Optional[dict] = None) -> list[list]:
+        """Запрос на всех шардах параллельно, строки по шардам"""
+        return list(await asyncio.gather(*(self._all(engine, stmt, params) for engine in self.engines.values())))
+
+    async def merged(self, stmt, params: Optional[dict] = None, key: Optional[Callable[[Any], Any]] = None,
+                     reverse: bool = False, limit: Optional[int] = None,
+                     unique: Optional[Callable[[Any], Any]] = None) -> list:
+        """Строки всех шардов одним списком. С key каждый шард должен вернуть строки, уже упорядоченные
+        по нему (ORDER BY в stmt), и они сливаются без пересортировки; limit - после слияния.
+        unique - ключ строки, повторы которого отбрасываются (ссылка на двух шардах во время переноса)"""
+        results = await self.fan_out(stmt, params)
+        rows = heapq.merge(*results, key=key, reverse=reverse) if key is not None else itertools.chain(*results)
+        if unique is not None:
+            seen = set()
+            rows = (row for row in rows if not (unique(row) in seen or seen.add(unique(row))))
+        return list(itertools.islice(rows, limit))
+
+    async def execute_all(self, stmt, params=None) -> None:
+        """Запрос изменения на всех шардах (каждый в своей транзакции)"""
+        async def run(engine):
+            async with engine.begin() as conn:
+                await conn.execute(stmt, params)
+
+        await asyncio.gather(*(run(engine) for engine in self.engines.values()))
+
+    async def dispose(self) -> None:
+        for engine in self.engines.values():
+            await engine.dispose()
+
+
+# Включается init_shards в lifespan приложения, если задан DB_SHARDS
+shard_router: Optional[ShardRouter] = None
+
+
+def init_shards(spec: str = DB_SHARDS, **engine_kwargs) -> Optional[ShardRouter]:
+    global shard_router
+    if shard_router is None and spec:
+        shard_router = ShardRouter.from_spec(spec, **engine_kwargs)
+    return shard_router
+
+
+async def dispose_shards() -> None:
+    global shard_router
+    if shard_router is not None:
+        await shard_router.dispose()
+        shard_router = None
+
+
+def link_engines(engine: AsyncEngine) -> list[AsyncEngine]:
+    """Базы со ссылками и их событиями outbox: шарды или основная БД engine"""
+    return list(shard_router.engines.values()) if shard_router is not None else [engine]
+
+
+@asynccontextmanager
+async def link_session(db: AsyncSession, code: str, new: bool = False) -> AsyncIterator[AsyncSession]:
+    """Сессия для ссылки с кодом code: без шардов - сама db, иначе - сессия шарда, на котором лежит ссылка
+    (new - шард нового кода по кольцу). Счётчики проектов пишутся в db, фиксирует обе commit_link"""
+    if shard_router is None:
+        yield db
+        return
+    engine = shard_router.engine_for(code) if new else shard_router.engines[await shard_router.locate(code)]
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def commit_link(link_db: AsyncSession, db: AsyncSession) -> None:
+    """Фиксирует изменение ссылки, затем - счётчики проектов в основной БД. На шардах это две транзакции:
+    при сбое второй счётчики восстанавливает rebuild_project_stats"""
+    await link_db.commit()
+    if link_db is not db:
+        await db.commit()
+
+
+# Таблицы шарда: users и projects остаются в основной БД, поэтому внешних ключей на них у шарда нет
+SHARD_TABLES = (links_table, aliases_table, OutboxEvent.__table__, OutboxDeadEvent.__table__)
+
+
+def shard_metadata() -> MetaData:
+    """Копии SHARD_TABLES без внешних ключей на таблицы вне шарда (link_aliases -> links остаётся)"""
+    metadata = MetaData()
+    names = {table.name for table in SHARD_TABLES}
+    for table in SHARD_TABLES:
+        copy = table.to_metadata(metadata)
+        for constraint in list(copy.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.partition(".")[0] in names:
+                continue
+            copy.constraints.discard(constraint)
+            for fk in constraint.elements:
+                fk.parent.foreign_keys.discard(fk)
+                copy.foreign_keys.discard(fk)
+    return metadata
+
+
+async def create_shard_tables(engine: AsyncEngine) -> None:
+    """Создаёт таблицы шарда (существующие пропускаются - в основной БД их создаёт alembic)"""
+    async with engine.begin() as conn:
+        await conn.run_sync(shard_metadata().create_all)
+
+
+_batch_stmt = (
+    select(links_table.c.short_code)
+    .where(links_table.c.short_code > bindparam("after"))
+    .order_by(links_table.c.short_code)
+    .limit(bindparam("limit"))
+)
+_rows_stmt = select(links_table).where(links_table.c.short_code.in_(bindparam("codes", expanding=True)))
+_taken_stmt = _rows_stmt.with_only_columns(links_table.c.short_code)
+_aliases_stmt = select(aliases_table).where(aliases_table.c.link_id.in_(bindparam("ids", expanding=True)))
+_drop_aliases_stmt = (
+    delete(aliases_table)
+    .where(aliases_table.c.link_id.in_(bindparam("ids", expanding=True)))
+    .returning(*aliases_table.c)
+)
+_clear_links_stmt = delete(links_table).where(links_table.c.id.in_(bindparam("ids", expanding=True)))
+_drop_links_stmt = (
+    delete(links_table)
+    .where(links_table.c.id.in_(bindparam("ids", expanding=True)))
+    .returning(*links_table.c)
+)
+# Изменения, попавшие на старый шард до появления копии: поля - как на старом шарде, переходы - досчитываются
+_changed_columns = [column.name for column in links_table.c if column.name not in ("id", "clicks")]
+_catch_up_stmt = (
+    update(links_table)
+    .where(links_table.c.id == bindparam("link_id"))
+    .values(**{name: bindparam(f"new_{name}") for name in _changed_columns},
+            clicks=links_table.c.clicks + bindparam("late_clicks"))
+)
+
+
+async def _move(source: AsyncEngine, target: AsyncEngine, codes: list[str]) -> int:
+    """Переносит ссылки с кодами codes (вместе с алиасами) с source на target, возвращает число перенесённых.
+    Код, занятый на target другой ссылкой, остаётся на source (в лог)"""
+    async with source.connect() as conn:
+        rows = (await conn.execute(_rows_stmt, {"codes": codes})).all()
+        ids = [row.id for row in rows]
+        aliases = (await conn.execute(_aliases_stmt, {"ids": ids})).all() if ids else []
+    if not rows:
+        return 0
+    async with target.begin() as conn:
+        # Копия, оставшаяся от прерванного переноса, заменяется: до удаления главная - на старом шарде
+        await conn.execute(delete(aliases_table).where(aliases_table.c.link_id.in_(ids)))
+        await conn.execute(_clear_links_stmt, {"ids": ids})
+        taken = set((await conn.execute(_taken_stmt, {"codes": codes})).scalars())
+        if taken:
+            logger.error("Reshard: codes already taken on the target shard, left in place: %s", sorted(taken))
+            rows = [row for row in rows if row.short_code not in taken]
+            ids = [row.id for row in rows]
+            aliases = [alias for alias in aliases if alias.link_id in ids]
+            if not rows:
+                return 0
+        await conn.execute(insert(links_table), [row._asdict() for row in rows])
+        if aliases:
+            await conn.execute(insert(aliases_table), [alias._asdict() for alias in aliases])
+    async with source.begin() as conn:
+        source_aliases = (await conn.execute(_drop_aliases_stmt, {"ids": ids})).all()
+        removed = {row.id: row for row in (await conn.execute(_drop_links_stmt, {"ids": ids})).all()}
+    copied = {row.id: row for row in rows}
+    catch_up = [
+        {"link_id": link_id, "late_clicks": row.clicks - copied[link_id].clicks,
+         **{f"new_{name}": getattr(row, name) for name in _changed_columns}}
+        for link_id, row in removed.items() if row != copied[link_id]
+    ]
+    # Удалённые со старого шарда, пока шёл перенос
+    gone = [link_id for link_id in ids if link_id not in removed]
+    copied_aliases = {alias.short_code for alias in aliases}
+    late_aliases = [alias._asdict() for alias in source_aliases
+                    if alias.link_id in removed and alias.short_code not in copied_aliases]
+    if catch_up or gone or late_aliases:
+        async with target.begin() as conn:
+            if catch_up:
+                await conn.execute(_catch_up_stmt, catch_up)
+            if gone:
+                await conn.execute(delete(aliases_table).where(aliases_table.c.link_id.in_(gone)))
+                await conn.execute(_clear_links_stmt, {"ids": gone})
+            if late_aliases:
+                await conn.execute(insert(aliases_table), late_aliases)
+    return len(removed)
+
+
+async def reshard(router: ShardRouter, ring: Optional[HashRing] = None, batch_size: int = RESHARD_BATCH_SIZE) -> int:
+    """Переносит ссылки, чей шард по ring (по умолчанию - кольцо router) отличается от текущего;
+    возвращает число перенесённых. В router.engines должны быть и прежние, и новые шарды"""
+    ring = ring or router.ring
+    moved = 0
+    for name, engine in router.engines.items():
+        after = ""
+        while True:
+            async with engine.connect() as conn:
+                codes = (await conn.execute(_batch_stmt, {"after": after, "limit": batch_size})).scalars().all()
+            if not codes:
+                break
+            after = codes[-1]
+            by_target: dict[str, list] = {}
+            for code in codes:
+                target = ring.shard_for(code)
+                if target != name:
+                    by_target.setdefault(target, []).append(code)
+            for target, batch in by_target.items():
+                moved += await _move(engine, router.engines[target], batch)
+            logger.info("Reshard %s: up to %r, %d links moved", name, after, moved)
+    return moved
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.sharding", description="Создание таблиц на шардах и перенос ссылок по новому набору шардов",
+    )
+    parser.add_argument("--shards", default=DB_SHARDS, help="DB_SHARDS (новый - при переносе)")
+    parser.add_argument("--from", dest="source", default="", help="прежний DB_SHARDS (шарды, с которых переносить)")
+    parser.add_argument("--reshard", action="store_true", help="перенести ссылки на их шарды по --shards")
+    parser.add_argument("--batch-size", type=int, default=RESHARD_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    targets = parse_shards(args.shards)
+    urls = {**parse_shards(args.source), **targets}
+    router = ShardRouter({name: create_shard_engine(url) for name, url in urls.items()}, HashRing(targets))
+
+    async def run():
+        try:
+            for name in targets:
+                await create_shard_tables(router.engines[name])
+            if args.reshard:
+                return await reshard(router, batch_size=args.batch_size)
+        finally:
+            await router.dispose()
+
+    moved = asyncio.run(run())
+    print(f"Shard tables ready on {', '.join(targets)}")
+    if args.reshard:
+        print(f"Moved {moved} links")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
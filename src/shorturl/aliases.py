@@ -0,0 +1,33 @@
+from collections import defaultdict
+
+from sqlalchemy import delete, select
+
+from src.database import LinkAlias
+
+
+def code_taken_stmt(short_code: str):
+    """Есть ли алиас с таким кодом (коды ссылок защищает уникальный индекс links.short_code)"""
+    return select(LinkAlias.link_id).where(LinkAlias.short_code == short_code)
+
+
+async def alias_codes(db, link_id) -> list[str]:
+    result = await db.execute(select(LinkAlias.short_code).where(LinkAlias.link_id == link_id))
+    return list(result.scalars())
+
+
+async def drop_link_aliases(db, link_ids) -> dict:
+    """Удаляет алиасы ссылок (ON DELETE CASCADE не действует в SQLite без PRAGMA), возвращает их коды по ссылкам"""
+    if not link_ids:
+        return {}
+    result = await db.execute(
+        delete(LinkAlias).where(LinkAlias.link_id.in_(link_ids)).returning(LinkAlias.link_id, LinkAlias.short_code)
+    )
+    codes = defaultdict(list)
+    for link_id, short_code in result:
+        codes[link_id].append(short_code)
+    return dict(codes)
+
+
+async def drop_aliases(db, link_ids) -> list[str]:
+    """То же, коды всех удалённых алиасов одним списком (для инвалидации)"""
+    return [code for codes in (await drop_link_aliases(db, link_ids)).values() for code in codes]
@@ -0,0 +1,53 @@
+"""Ограничение частоты POST /links/{code}/beacon.
+
+Фиксированное окно: не больше BEACON_RATE_LIMIT маячков с одного адреса за BEACON_RATE_WINDOW секунд.
+Счётчики - в Redis кэша (INCR + EXPIRE одним конвейером), общие для воркеров; без Redis или при его
+ошибке - в памяти воркера.
+"""
+import logging
+import time
+from collections import Counter
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from redis.exceptions import RedisError
+
+from src.config import BEACON_RATE_LIMIT, BEACON_RATE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+RATE_KEY_PREFIX = "beacon-rate"
+
+
+class BeaconLimiter:
+    def __init__(self, limit: int = BEACON_RATE_LIMIT, window: int = BEACON_RATE_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._window_id = None
+        self._counts = Counter()
+
+    def _local(self, client: str, window_id: int) -> int:
+        if window_id != self._window_id:
+            self._window_id = window_id
+            self._counts.clear()
+        self._counts[client] += 1
+        return self._counts[client]
+
+    async def allow(self, client: str) -> bool:
+        """Засчитывает маячок с адреса client; False - лимит окна исчерпан (limit <= 0 - без лимита)"""
+        if self.limit <= 0:
+            return True
+        window_id = int(time.time() // self.window)
+        backend = FastAPICache.get_backend()
+        if isinstance(backend, RedisBackend):
+            key = f"{RATE_KEY_PREFIX}:{window_id}:{client}"
+            try:
+                async with backend.redis.pipeline(transaction=False) as pipe:
+                    count, _ = await pipe.incr(key).expire(key, self.window).execute()
+                return count <= self.limit
+            except RedisError as e:
+                logger.warning("Beacon rate limit falls back to worker memory: %s", e)
+        return self._local(client, window_id) <= self.limit
+
+
+beacon_limiter = BeaconLimiter()
@@ -0,0 +1,212 @@
+"""Переходы через Redis Stream (CLICK_STREAM=1): приём событий отдельно от обслуживания редиректов.
+
+Редирект только добавляет событие в поток (XADD {"c": код}, время перехода - в id записи);
+всплески оседают в потоке, а не в памяти воркеров API. Потребители группы CLICK_STREAM_GROUP
+(python -m src.shorturl.click_stream) читают события пачками, сводят их по кодам и пишут в БД
+тем же executemany, что и буфер воркера (clicks.apply_clicks), затем подтверждают (XACK).
+События упавшего потребителя через CLICK_STREAM_CLAIM_IDLE_MS забирает другой (XAUTOCLAIM).
+Доставка - не менее одного раза: при падении между записью в БД и XACK пачка будет учтена повторно.
+
+Если Redis недоступен, переход уходит в буфер воркера (click_buffer) - редирект не ломается.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.config import (
+    CLICK_STREAM_BATCH, CLICK_STREAM_BLOCK_MS, CLICK_STREAM_CLAIM_IDLE_MS, CLICK_STREAM_GROUP, CLICK_STREAM_KEY,
+    CLICK_STREAM_MAXLEN,
+)
+from src.metrics import CLICK_EVENTS, CLICK_STREAM_LAG, CLICK_STREAM_LAG_SECONDS, CLICK_STREAM_PENDING
+from src.shorturl.clicks import apply_clicks, click_buffer
+
+logger = logging.getLogger(__name__)
+
+
+def _entry_time(entry_id) -> datetime:
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    return datetime.fromtimestamp(int(entry_id.partition("-")[0]) / 1000, timezone.utc)
+
+
+class ClickStream:
+    """Запись переходов в поток; без клиента Redis (CLICK_STREAM выключен) - в click_buffer"""
+
+    def __init__(self, key: str = CLICK_STREAM_KEY, maxlen: int = CLICK_STREAM_MAXLEN):
+        self.key = key
+        self.maxlen = maxlen
+        self.redis = None
+
+    async def record(self, short_code: str) -> None:
+        if self.redis is None:
+            click_buffer.record(short_code)
+            return
+        try:
+            await self.redis.xadd(self.key, {"c": short_code}, maxlen=self.maxlen, approximate=True)
+        except RedisError as e:
+            logger.warning("Click stream is unavailable, buffering in worker: %s", e)
+            CLICK_EVENTS.labels("buffered").inc()
+            click_buffer.record(short_code)
+            return
+        CLICK_EVENTS.labels("queued").inc()
+
+
+click_stream = ClickStream()
+
+
+async def record_click(short_code: str) -> None:
+    """Учёт перехода из обработчиков редиректа"""
+    await click_stream.record(short_code)
+
+
+async def update_lag_metrics(redis, key: str = CLICK_STREAM_KEY, group: str = CLICK_STREAM_GROUP) -> Optional[int]:
+    """Отставание группы: число невыданных событий, возраст самого старого из них и неподтверждённые"""
+    try:
+        groups = await redis.xinfo_groups(key)
+    except ResponseError:  # потока ещё нет
+        return None
+    info = next((g for g in groups if g["name"] in (group, group.encode())), None)
+    if info is None:
+        return None
+    CLICK_STREAM_PENDING.set(info["pending"])
+    last = info["last-delivered-id"]
+    last = last.decode() if isinstance(last, bytes) else last
+    oldest = await redis.xrange(key, min=f"({last}", count=1)
+    lag_seconds = max(0.0, time.time() - _entry_time(oldest[0][0]).timestamp()) if oldest else 0.0
+    CLICK_STREAM_LAG_SECONDS.set(lag_seconds)
+    # lag есть в XINFO GROUPS начиная с Redis 7 (None - Redis не может его посчитать)
+    lag = info.get("lag")
+    if lag is not None:
+        CLICK_STREAM_LAG.set(lag)
+    return lag
+
+
+class ClickIngestor:
+    """Потребитель группы: пачки событий -> сводка по кодам -> БД -> XACK"""
+
+    def __init__(self, redis, engine: AsyncEngine, consumer: str, key: str = CLICK_STREAM_KEY,
+                 group: str = CLICK_STREAM_GROUP, batch_size: int = CLICK_STREAM_BATCH,
+                 block_ms: int = CLICK_STREAM_BLOCK_MS, claim_idle_ms: int = CLICK_STREAM_CLAIM_IDLE_MS):
+        self.redis = redis
+        self.engine = engine
+        self.consumer = consumer
+        self.key = key
+        self.group = group
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def apply(self, entries: list) -> int:
+        """Сводит события в БД и подтверждает их, возвращает число событий"""
+        if not entries:
+            return 0
+        counts: Counter = Counter()
+        last_clicked: dict[str, datetime] = {}
+        for entry_id, fields in entries:
+            # Пустая запись - удалена из потока (MAXLEN), пока была неподтверждённой
+            code = fields.get(b"c", fields.get("c")) if fields else None
+            if not code:
+                continue
+            code = code.decode() if isinstance(code, bytes) else code
+            clicked_at = _entry_time(entry_id)
+            counts[code] += 1
+            last_clicked[code] = max(last_clicked.get(code, clicked_at), clicked_at)
+        await apply_clicks(self.engine, counts, last_clicked)
+        await self.redis.xack(self.key, self.group, *(entry_id for entry_id, _ in entries))
+        CLICK_EVENTS.labels("ingested").inc(len(entries))
+        return len(entries)
+
+    async def reclaim(self) -> int:
+        """Забирает и сводит события, зависшие у упавших потребителей"""
+        applied = 0
+        start = "0-0"
+        while True:
+            result = await self.redis.xautoclaim(self.key, self.group, self.consumer, self.claim_idle_ms,
+                                                 start_id=start, count=self.batch_size)
+            start, entries = result[0], result[1]
+            applied += await self.apply(entries)
+            if not entries or start in (b"0-0", "0-0"):
+                return applied
+
+    async def read(self) -> int:
+        response = await self.redis.xreadgroup(self.group, self.consumer, {self.key: ">"},
+                                               count=self.batch_size, block=self.block_ms)
+        return sum([await self.apply(entries) for _, entries in response])
+
+    async def run(self) -> None:
+        await self.ensure_group()
+        last_claim = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_claim >= self.claim_idle_ms / 1000:
+                    last_claim = time.monotonic()
+                    await self.reclaim()
+                await self.read()
+                await update_lag_metrics(self.redis, self.key, self.group)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Неподтверждённые события останутся в PEL и будут забраны reclaim
+                logger.exception("Click ingestion failed")
+                await asyncio.sleep(1)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.shorturl.click_stream",
+                                     description="Потребитель потока переходов: сводит события в БД")
+    parser.add_argument("--consumer", default=f"{socket.gethostname()}-{os.getpid()}",
+                        help="имя потребителя в группе (уникальное для процесса)")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("CLICK_INGEST_METRICS_PORT", 0)))
+    args = parser.parse_args(argv)
+
+    from prometheus_client import start_http_server
+
+    from src.database import dispose_engine, init_engine
+    from src.metrics import instrument_sqlalchemy, metrics_registry
+    from src.redis_client import create_redis
+    from src.sharding import dispose_shards, init_shards
+
+    logging.basicConfig(level=logging.INFO)
+    if args.metrics_port:
+        start_http_server(args.metrics_port, registry=metrics_registry())
+    instrument_sqlalchemy()
+
+    async def run():
+        # XREADGROUP ждёт событий до CLICK_STREAM_BLOCK_MS - таймаут сокета должен быть больше
+        redis = create_redis(socket_timeout=CLICK_STREAM_BLOCK_MS / 1000 + 5)
+        engine = init_engine()
+        # Как и буфер воркера, сводка пишется на шарды, если задан DB_SHARDS
+        init_shards()
+        try:
+            await ClickIngestor(redis, engine, args.consumer).run()
+        finally:
+            await redis.close()
+            await dispose_shards()
+            await dispose_engine()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
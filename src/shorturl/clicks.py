@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src import sharding
+from src.database import Link
+from src.shorturl.project_stats import project_clicks_by_id_stmt, project_clicks_stmt
+
+logger = logging.getLogger(__name__)
+
+links_table = Link.__table__
+
+# Одно executemany-обновление на все накопленные коды
+_flush_stmt = (
+    update(links_table)
+    .where(links_table.c.short_code == bindparam("code"))
+    .values(clicks=links_table.c.clicks + bindparam("n"), last_clicked_at=bindparam("ts"))
+)
+_flush_returning_stmt = _flush_stmt.returning(links_table.c.short_code)
+_present_stmt = select(links_table.c.short_code).where(links_table.c.short_code.in_(bindparam("codes", expanding=True)))
+_owners_stmt = (
+    select(links_table.c.short_code, links_table.c.project_id)
+    .where(links_table.c.short_code.in_(bindparam("codes", expanding=True)))
+    .where(links_table.c.project_id.is_not(None))
+)
+
+
+async def _flush_home(engine: AsyncEngine, params: list[dict]) -> set[str]:
+    """Переходы ссылок, которые есть на шарде своего кода; возвращает их коды. Ссылка уходит с шарда
+    своего кода только при удалении, поэтому найденные коды обновляются одним executemany"""
+    if not params:
+        return set()
+    async with engine.begin() as conn:
+        present = set((await conn.execute(_present_stmt, {"codes": [p["code"] for p in params]})).scalars())
+        if present:
+            await conn.execute(_flush_stmt, [p for p in params if p["code"] in present])
+    return present
+
+
+async def _flush_each(engine: AsyncEngine, params: list[dict]) -> set[str]:
+    """То же на чужом шарде: reshard может забрать ссылку между проверкой и UPDATE, поэтому
+    каждый код обновляется отдельно и учитывается, только если UPDATE его нашёл"""
+    updated = set()
+    if params:
+        async with engine.begin() as conn:
+            for p in params:
+                if (await conn.execute(_flush_returning_stmt, p)).first() is not None:
+                    updated.add(p["code"])
+    return updated
+
+
+async def _flush_by_home(router, params: list[dict]) -> set[str]:
+    by_shard: dict[str, list[dict]] = {}
+    for p in params:
+        by_shard.setdefault(router.shard_for(p["code"]), []).append(p)
+    return set().union(*await asyncio.gather(
+        *(_flush_home(router.engines[name], batch) for name, batch in by_shard.items())
+    ))
+
+
+async def _flush_sharded(engine: AsyncEngine, router, params: list[dict]) -> None:
+    """Ссылки на шардах: каждый код обновляется на одном шарде - сначала на шарде кода, не найденные там
+    (переименованные, ещё не перенесённые) - на остальных, а не найденные и там - снова на шарде кода
+    (reshard успел перенести ссылку). Пока ссылка переносится, копия есть на обоих шардах, и переходы идут
+    только в новую. Счётчики проектов - в основной БД по id проекта"""
+    found = await _flush_by_home(router, params)
+    rest = [p for p in params if p["code"] not in found]
+    if rest:
+        found |= set().union(*await asyncio.gather(*(
+            _flush_each(shard, [p for p in rest if router.shard_for(p["code"]) != name])
+            for name, shard in router.engines.items()
+        )))
+        rest = [p for p in params if p["code"] not in found]
+    if rest:
+        await _flush_by_home(router, rest)
+    counts = {p["code"]: p["n"] for p in params}
+    owners = {row.short_code: row.project_id for row in await router.merged(_owners_stmt, {"codes": list(counts)})}
+    clicks = Counter()
+    for code, project_id in owners.items():
+        clicks[project_id] += counts[code]
+    if clicks:
+        async with engine.begin() as conn:
+            await conn.execute(project_clicks_by_id_stmt, [{"pid": pid, "n": n} for pid, n in clicks.items()])
+
+
+async def apply_clicks(engine: AsyncEngine, counts: Counter, last_clicked: dict[str, datetime]) -> int:
+    """Агрегированные переходы по кодам в БД: счётчики ссылок и проектов одним executemany;
+    общий для буфера воркера и потребителя потока переходов (click_stream.py)"""
+    params = [{"code": code, "n": n, "ts": last_clicked[code]} for code, n in counts.items()]
+    if not params:
+        return 0
+    if sharding.shard_router is not None:
+        await _flush_sharded(engine, sharding.shard_router, params)
+    else:
+        async with engine.begin() as conn:
+            await conn.execute(_flush_stmt, params)
+            await conn.execute(project_clicks_stmt, [{"code": p["code"], "n": p["n"]} for p in params])
+    return len(params)
+
+
+class ClickBuffer:
+    """Счётчик переходов в памяти воркера, периодически сбрасываемый в БД одним запросом"""
+
+    def __init__(self, flush_interval: float = 1.0, max_pending: int = 5000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._counts: Counter = Counter()
+        self._last_clicked: dict[str, datetime] = {}
+        self._engine: AsyncEngine | None = None
+        self._flushing: asyncio.Task | None = None
+
+    def record(self, short_code: str) -> None:
+        self._counts[short_code] += 1
+        self._last_clicked[short_code] = datetime.now(timezone.utc)
+        # Не ждём таймера, если буфер переполнен
+        if len(self._counts) >= self.max_pending and self._engine is not None and self._flushing is None:
+            self._flushing = asyncio.get_running_loop().create_task(self.flush(self._engine))
+            self._flushing.add_done_callback(lambda _: setattr(self, "_flushing", None))
+
+    @property
+    def pending(self) -> int:
+        return sum(self._counts.values())
+
+    async def flush(self, engine: AsyncEngine) -> int:
+        """Записывает накопленные переходы, возвращает число обновлённых кодов"""
+        if not self._counts:
+            return 0
+        counts, self._counts = self._counts, Counter()
+        last_clicked, self._last_clicked = self._last_clicked, {}
+        try:
+            return await apply_clicks(engine, counts, last_clicked)
+        except Exception:
+            # Возвращаем переходы в буфер, чтобы не потерять их при временной ошибке БД
+            self._counts.update(counts)
+            for code, ts in last_clicked.items():
+                self._last_clicked.setdefault(code, ts)
+            raise
+
+    async def run(self, engine: AsyncEngine) -> None:
+        """Фоновый цикл сброса (запускается в lifespan)"""
+        self._engine = engine
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                try:
+                    await self.flush(engine)
+                except Exception:
+                    logger.exception("Click flush failed")
+        finally:
+            await self.flush(engine)
+
+
+click_buffer = ClickBuffer()
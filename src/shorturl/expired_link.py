@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime
 from pydantic import BaseModel
 
@@ -10,8 +11,8 @@ class ExpiredLinkBase(BaseModel):
     project: str | None
 
 class ExpiredLinkResponse(ExpiredLinkBase):
-    id: int
-    user_id: int | None
+    id: uuid.UUID
+    user_id: uuid.UUID | None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        from_attributes = True
\ No newline at end of file
@@ -0,0 +1,125 @@
+from sqlalchemy import bindparam, literal_column, select, union_all
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match, Route
+
+from src import database, sharding
+from src.database import Link, LinkAlias
+from src.metrics import REDIRECTS
+from src.shorturl.click_stream import record_click
+from src.shorturl.redirect_cache import load_redirect, store_redirect, store_redirects
+from src.shorturl.redirect_policy import link_policy, redirect_location, redirect_response
+
+NOT_FOUND_BODY = b'{"detail":"Link not found or expired"}'
+
+links_table = Link.__table__
+aliases_table = LinkAlias.__table__
+
+_policy_columns = (links_table.c.redirect_code, links_table.c.cache_ttl, links_table.c.click_beacon)
+_resolve_columns = (links_table.c.short_code, links_table.c.original_url, links_table.c.is_active,
+                    links_table.c.expires_at, *_policy_columns)
+# Только нужные колонки, без ORM-гидрации объекта Link. Код ссылки и алиас - в одном запросе
+# (две выборки по уникальным индексам), основной код в приоритете
+_resolve_union = union_all(
+    select(*_resolve_columns, literal_column("0").label("via_alias"))
+    .where(links_table.c.short_code == bindparam("code")),
+    select(*_resolve_columns, literal_column("1").label("via_alias"))
+    .join_from(aliases_table, links_table, aliases_table.c.link_id == links_table.c.id)
+    .where(aliases_table.c.short_code == bindparam("code")),
+).subquery()
+_resolve_stmt = select(_resolve_union).order_by(_resolve_union.c.via_alias).limit(1)
+_popular_stmt = (
+    select(
+        links_table.c.short_code, links_table.c.original_url, links_table.c.expires_at, links_table.c.clicks,
+        *_policy_columns,
+    )
+    .where(links_table.c.is_active.is_(True))
+    .order_by(links_table.c.clicks.desc())
+    .limit(bindparam("limit"))
+)
+
+
+def _policy(row):
+    return link_policy(row.redirect_code, row.cache_ttl, row.expires_at, row.click_beacon)
+
+
+async def _redirect(location: str, policy, counted_code: str, cache_status: str) -> Response:
+    response, count_click = redirect_response(location, policy, counted_code, cache_status)
+    REDIRECTS.labels("found").inc()
+    if count_click:
+        await record_click(counted_code)
+    return response
+
+
+def _not_found(exists: bool) -> Response:
+    REDIRECTS.labels("expired" if exists else "not_found").inc()
+    return Response(NOT_FOUND_BODY, status_code=404, media_type="application/json")
+
+
+async def fast_redirect(request: Request) -> Response:
+    """Редирект по короткой ссылке без DI FastAPI, ORM и Pydantic.
+
+    Сначала компактная запись кэша (redirect_cache), затем одна выборка original_url/is_active
+    через пул соединений. Алиасы (прежние коды) разрешаются тем же запросом и кэшируются так же.
+    Отсутствующие и неактивные коды тоже кэшируются (ненадолго).
+    Переходы по основному коду уходят в поток Redis или буфер воркера (click_stream.record_click).
+    """
+    short_code = request.path_params["short_code"]
+
+    cached = await load_redirect(short_code)
+    if cached is not None:
+        if not cached.active:
+            return _not_found(cached.exists)
+        return await _redirect(cached.location, cached.policy, cached.target or short_code, "HIT")
+
+    if sharding.shard_router is not None:
+        row = await sharding.shard_router.first(_resolve_stmt, {"code": short_code}, short_code)
+    else:
+        engine = getattr(request.app.state, "engine", None) or database.get_engine()
+        async with engine.connect() as conn:
+            row = (await conn.execute(_resolve_stmt, {"code": short_code})).first()
+
+    if row is None or not row.is_active:
+        await store_redirect(short_code, None, exists=row is not None, active=False)
+        return _not_found(row is not None)
+
+    location = redirect_location(row.original_url)
+    target = row.short_code if row.via_alias else None
+    policy = _policy(row)
+    await store_redirect(short_code, location, row.expires_at, target=target, policy=policy)
+    return await _redirect(location, policy, row.short_code, "MISS")
+
+
+async def warm_redirect_cache(engine, limit: int) -> int:
+    """Прогрев кэша самыми посещаемыми ссылками: один запрос к БД (к каждому шарду) и конвейер в Redis"""
+    if sharding.shard_router is not None:
+        rows = await sharding.shard_router.merged(
+            _popular_stmt, {"limit": limit}, key=lambda row: row.clicks, reverse=True, limit=limit,
+            unique=lambda row: row.short_code,
+        )
+    else:
+        async with engine.connect() as conn:
+            rows = (await conn.execute(_popular_stmt, {"limit": limit})).all()
+    return await store_redirects(
+        (row.short_code, redirect_location(row.original_url), row.expires_at, None, _policy(row)) for row in rows
+    )
+
+
+class FastRedirectRoute(Route):
+    """Starlette-маршрут, который, как APIRoute, кладёт себя в scope["route"] (для метрик)"""
+
+    def matches(self, scope):
+        match, child_scope = super().matches(scope)
+        if match != Match.NONE:
+            child_scope["route"] = self
+        return match, child_scope
+
+
+def mount_fast_redirect(app, path: str = "/links/{short_code}") -> None:
+    """Ставит быстрый маршрут перед APIRoute редиректа (порядок относительно /links/search сохраняется)"""
+    routes = app.router.routes
+    index = next(
+        i for i, route in enumerate(routes)
+        if getattr(route, "path", None) == path and "GET" in (getattr(route, "methods", None) or ())
+    )
+    routes.insert(index, FastRedirectRoute(path, fast_redirect, methods=["GET"], name="fast_redirect"))
@@ -0,0 +1,85 @@
+"""Списки ссылок в JSON без ORM-объектов.
+
+Ручки выбирают только колонки схемы ответа (RowSerializer.columns), строки проверяются
+разом через TypeAdapter списка TypedDict с полями схемы и кодируются orjson - без
+экземпляров Pydantic-моделей и jsonable_encoder. Большие списки отдаются потоком кусками
+по STREAM_CHUNK_SIZE строк, тело целиком в памяти не собирается.
+Сжатие ответа - CompressionMiddleware (src/compression.py).
+"""
+from typing import Iterable, Iterator, Optional, Sequence
+
+import orjson
+from fastapi_cache.coder import Coder
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import null
+from starlette.responses import Response, StreamingResponse
+from typing_extensions import TypedDict
+
+STREAM_THRESHOLD = 1000
+# UTC как "Z", как у Pydantic в остальных ответах (по умолчанию orjson пишет "+00:00")
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+STREAM_CHUNK_SIZE = 500
+
+
+class JSONBytesResponse(Response):
+    """Ответ с уже закодированным JSON"""
+    media_type = "application/json"
+
+
+class RowSerializer:
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self.fields = list(model.model_fields)
+        row_type = TypedDict(f"{model.__name__}Row", {name: field.annotation for name, field in model.model_fields.items()})
+        self.adapter = TypeAdapter(list[row_type])
+
+    def columns(self, entity) -> list:
+        """Колонки для select(): поля схемы, которых нет в таблице, приходят как NULL"""
+        return [
+            getattr(entity, name).label(name) if hasattr(entity, name) else null().label(name)
+            for name in self.fields
+        ]
+
+    def dumps(self, rows: Iterable) -> bytes:
+        """rows - строки select(*columns(...)) или словари с полями схемы"""
+        return orjson.dumps(self.adapter.validate_python([
+            row if isinstance(row, dict) else dict(row._mapping) for row in rows
+        ]), option=ORJSON_OPTIONS)
+
+    def dumps_each(self, rows: Iterable) -> list[bytes]:
+        """То же, но каждая строка отдельным JSON-объектом (записи кэша по одной ссылке)"""
+        return [orjson.dumps(item, option=ORJSON_OPTIONS) for item in self.adapter.validate_python([
+            row if isinstance(row, dict) else dict(row._mapping) for row in rows
+        ])]
+
+    def iter_json(self, rows: Sequence, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        yield b"["
+        separator = b""
+        for start in range(0, len(rows), chunk_size):
+            # "[a,b]" -> "a,b": куски склеиваются через запятую
+            yield separator + self.dumps(rows[start:start + chunk_size])[1:-1]
+            separator = b","
+        yield b"]"
+
+    def response(self, rows: Sequence, stream_threshold: Optional[int] = STREAM_THRESHOLD) -> Response:
+        """Поток при len(rows) > stream_threshold, иначе тело одним куском (stream_threshold=None - всегда)"""
+        if stream_threshold is not None and len(rows) > stream_threshold:
+            return StreamingResponse(self.iter_json(rows), media_type=JSONBytesResponse.media_type)
+        return JSONBytesResponse(self.dumps(rows))
+
+
+class JSONBytesCoder(Coder):
+    """Coder для @cache над ручками, возвращающими JSONBytesResponse: в кэше лежит тело ответа,
+    при попадании оно отдаётся без декодирования и повторной сериализации"""
+
+    @classmethod
+    def encode(cls, value: Response) -> bytes:
+        return value.body
+
+    @classmethod
+    def decode(cls, value: bytes) -> Response:
+        return JSONBytesResponse(value, headers={"X-FastAPI-Cache": "HIT"})
+
+    @classmethod
+    def decode_as_type(cls, value: bytes, *, type_=None) -> Response:
+        return cls.decode(value)
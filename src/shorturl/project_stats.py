@@ -0,0 +1,108 @@
+from sqlalchemy import bindparam, case, delete, func, insert, literal, select, update
+
+from src import sharding
+from src.database import Link, Project, ProjectStats, dialect_insert
+
+links_table = Link.__table__
+projects_table = Project.__table__
+stats_table = ProjectStats.__table__
+
+_COUNTERS = ("total_links", "total_clicks", "active_links", "expired_links")
+
+# Переходы из ClickBuffer: проект ищется по короткому коду прямо в UPDATE (executemany)
+project_clicks_stmt = (
+    update(stats_table)
+    .where(
+        stats_table.c.project_id == select(links_table.c.project_id)
+        .where(links_table.c.short_code == bindparam("code")).scalar_subquery(),
+    )
+    .values(total_clicks=stats_table.c.total_clicks + bindparam("n"))
+)
+# То же, когда ссылки на шардах (src/sharding.py): проект уже известен
+project_clicks_by_id_stmt = (
+    update(stats_table)
+    .where(stats_table.c.project_id == bindparam("pid"))
+    .values(total_clicks=stats_table.c.total_clicks + bindparam("n"))
+)
+
+
+async def apply_delta(db, project_id, links: int = 0, clicks: int = 0, active: int = 0, expired: int = 0):
+    """Изменяет счётчики проекта одним UPSERT в текущей транзакции (сессия или соединение).
+
+    Ссылки без проекта в статистику проектов не попадают.
+    """
+    if project_id is None:
+        return
+    upsert = dialect_insert(db)(stats_table).values(
+        project_id=project_id, total_links=links, total_clicks=clicks, active_links=active, expired_links=expired,
+    )
+    await db.execute(upsert.on_conflict_do_update(
+        index_elements=[stats_table.c.project_id],
+        set_={name: stats_table.c[name] + upsert.excluded[name] for name in _COUNTERS},
+    ))
+
+
+def _is_active(link: Link) -> int:
+    # До flush is_active ещё None - в БД он станет True по умолчанию
+    return int(link.is_active is not False)
+
+
+async def link_created(db, link: Link):
+    await apply_delta(db, link.project_id, links=1, active=_is_active(link))
+
+
+async def link_removed(db, link: Link, expired: bool = False):
+    await apply_delta(
+        db, link.project_id,
+        links=-1, clicks=-(link.clicks or 0), active=-_is_active(link), expired=int(expired),
+    )
+
+
+async def rebuild_project_stats(conn, user_id=None) -> None:
+    """Пересчёт счётчиков по ссылкам (после массовой загрузки, минуя API); user_id - только одного пользователя"""
+    clear = delete(stats_table)
+    source = (
+        select(
+            links_table.c.project_id,
+            func.count(), func.coalesce(func.sum(links_table.c.clicks), 0),
+            func.sum(case((links_table.c.is_active.is_(True), 1), else_=0)), literal(0),
+        )
+        .where(links_table.c.project_id.is_not(None))
+        .group_by(links_table.c.project_id)
+    )
+    if user_id is not None:
+        clear = clear.where(stats_table.c.project_id.in_(
+            select(projects_table.c.id).where(projects_table.c.user_id == user_id)
+        ))
+        source = source.where(links_table.c.user_id == user_id)
+    await conn.execute(clear)
+    await conn.execute(insert(stats_table).from_select(["project_id", *_COUNTERS], source))
+
+
+async def get_project_stats(db, user_id, project: str, top: int = 10) -> dict | None:
+    """Счётчики из project_stats и top-N ссылок по индексу (user_id, project, clicks).
+    None - проекта нет; у проекта без ссылок строки счётчиков нет, счётчики нулевые"""
+    stats = (await db.execute(
+        select(projects_table.c.id, *(stats_table.c[name] for name in _COUNTERS))
+        .outerjoin(stats_table, stats_table.c.project_id == projects_table.c.id)
+        .where(projects_table.c.user_id == user_id, projects_table.c.name == project)
+    )).first()
+    if stats is None:
+        return None
+    top_stmt = (
+        select(links_table.c.short_code, links_table.c.original_url, links_table.c.clicks)
+        .where(links_table.c.user_id == user_id, links_table.c.project == project)
+        .order_by(links_table.c.clicks.desc())
+        .limit(top)
+    )
+    if sharding.shard_router is not None:
+        top_links = await sharding.shard_router.merged(
+            top_stmt, key=lambda row: row.clicks, reverse=True, limit=top, unique=lambda row: row.short_code,
+        )
+    else:
+        top_links = (await db.execute(top_stmt)).all()
+    return {
+        "project": project,
+        **{name: getattr(stats, name) or 0 for name in _COUNTERS},
+        "top_links": [row._asdict() for row in top_links],
+    }
@@ -0,0 +1,248 @@
+"""Компактная запись кэша редиректа вместо сериализованного ответа.
+
+Формат значения:
+
+    флаги (1 байт) | срок годности записи, unix-время (4 байта) | Location в UTF-8
+
+Флаги: EXISTS - ссылка есть в БД, ACTIVE - ссылка активна, ZSTD - Location сжат zstd
+(только если установлен zstandard и строка длинная), ALIAS - код является алиасом, и перед
+Location лежит основной код ссылки (1 байт длины + код; по нему считаются переходы),
+старшие 4 бита - номер общего префикса из PREFIXES, сам префикс в значении не хранится. Отрицательные записи
+(ссылки нет или она неактивна) хранятся без Location и живут недолго.
+
+У активной ссылки EXISTS подразумевается, поэтому ACTIVE без EXISTS означает, что сразу после
+заголовка лежит политика редиректа (src/shorturl/redirect_policy.py): байт (номер кода в
+REDIRECT_CODES, маячок, наличие полей) и при необходимости max-age и срок ссылки (по 4 байта).
+Записи с политикой по умолчанию (307 без кэширования) её не хранят.
+
+В Redis записи лежат в REDIRECT_CACHE_BUCKETS хэшах (корзина - crc32 кода, поле - код):
+маленький хэш хранится одним listpack без служебных структур на каждый ключ.
+Listpack сохраняется, пока значения не длиннее hash-max-listpack-value (в docker-compose
+поднято до 256). У полей хэша нет TTL, поэтому срок годности записан в значении,
+корзина живёт REDIRECT_CACHE_EXPIRE после последней записи, а просроченные поля
+время от времени вычищаются при записи. На других бэкендах (InMemoryBackend в тестах) -
+обычный ключ redirect_cache_key с тем же значением.
+Прочитанные из Redis записи на несколько секунд оседают в local_redirects воркера
+(см. src/invalidation.py).
+"""
+import logging
+import random
+import struct
+import time
+from datetime import datetime
+from typing import Iterable, NamedTuple, Optional
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+
+from src.cache import link_tag, redirect_bucket_key, redirect_cache_key, tag_key
+from src.invalidation import invalidation_bus, local_redirects
+from src.redis_client import execute_batched
+from src.shorturl.redirect_policy import DEFAULT_POLICY, REDIRECT_CODES, RedirectPolicy, to_epoch
+
+try:
+    import zstandard
+except ImportError:  # сжатие необязательно
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_CACHE_EXPIRE = 60
+NOT_FOUND_CACHE_EXPIRE = 10
+# Короткие URL после вычета префикса zstd не уменьшает
+ZSTD_MIN_SIZE = 200
+# Доля записей новых полей, после которых корзина чистится от просроченных
+PRUNE_PROBABILITY = 1 / 32
+
+EXISTS = 0x01
+ACTIVE = 0x02
+ZSTD = 0x04
+ALIAS = 0x08
+
+_header = struct.Struct(">BI")
+_uint = struct.Struct(">I")
+
+# Байт политики редиректа
+POLICY_BEACON = 0x04
+POLICY_MAX_AGE = 0x08
+POLICY_EXPIRES = 0x10
+
+# Номер префикса хранится в значениях кэша: только дописывать в конец (не больше 16 элементов)
+PREFIXES = (
+    "",
+    "https://",
+    "http://",
+    "https://www.",
+    "http://www.",
+    "https://www.youtube.com/watch?v=",
+    "https://youtu.be/",
+    "https://github.com/",
+    "https://docs.google.com/",
+    "https://drive.google.com/",
+    "https://t.me/",
+    "https://en.wikipedia.org/wiki/",
+    "https://ru.wikipedia.org/wiki/",
+    "https://www.google.com/",
+    "https://vk.com/",
+    "https://example.com/",
+)
+_longest_first = sorted(enumerate(PREFIXES), key=lambda item: len(item[1]), reverse=True)
+
+
+class CachedRedirect(NamedTuple):
+    location: Optional[str]
+    expires: int
+    exists: bool
+    active: bool
+    # Основной код ссылки, если запись сделана для алиаса
+    target: Optional[str] = None
+    policy: RedirectPolicy = DEFAULT_POLICY
+
+
+def _pack_policy(policy: RedirectPolicy) -> bytes:
+    flags = REDIRECT_CODES.index(policy.status) | (POLICY_BEACON if policy.beacon else 0)
+    tail = b""
+    if policy.max_age:
+        flags, tail = flags | POLICY_MAX_AGE, tail + _uint.pack(policy.max_age)
+    if policy.expires:
+        flags, tail = flags | POLICY_EXPIRES, tail + _uint.pack(policy.expires)
+    return bytes([flags]) + tail
+
+
+def _unpack_policy(data: bytes) -> tuple[RedirectPolicy, bytes]:
+    flags, offset = data[0], 1
+    max_age = expires = 0
+    if flags & POLICY_MAX_AGE:
+        (max_age,), offset = _uint.unpack_from(data, offset), offset + _uint.size
+    if flags & POLICY_EXPIRES:
+        (expires,), offset = _uint.unpack_from(data, offset), offset + _uint.size
+    return RedirectPolicy(REDIRECT_CODES[flags & 0x03], max_age, expires, bool(flags & POLICY_BEACON)), data[offset:]
+
+
+def pack(location: Optional[str], expires: int, exists: bool = True, active: bool = True,
+         target: Optional[str] = None, policy: RedirectPolicy = DEFAULT_POLICY) -> bytes:
+    flags = (EXISTS if exists else 0) | (ACTIVE if active else 0)
+    head = b""
+    if active and policy != DEFAULT_POLICY:
+        flags &= ~EXISTS
+        head = _pack_policy(policy)
+    if target:
+        flags |= ALIAS
+        # Длина в байтах UTF-8: код может быть не ASCII (до 50 символов - не больше 200 байт)
+        encoded = target.encode()
+        head += bytes([len(encoded)]) + encoded
+    body = b""
+    if location:
+        prefix_id, prefix = next(item for item in _longest_first if location.startswith(item[1]))
+        flags |= prefix_id << 4
+        body = location[len(prefix):].encode()
+        if zstandard is not None and len(body) >= ZSTD_MIN_SIZE:
+            compressed = zstandard.ZstdCompressor().compress(body)
+            if len(compressed) < len(body):
+                body, flags = compressed, flags | ZSTD
+    return _header.pack(flags, expires) + head + body
+
+
+def unpack(data: bytes) -> CachedRedirect:
+    flags, expires = _header.unpack_from(data)
+    body = data[_header.size:]
+    target = None
+    policy = DEFAULT_POLICY
+    if flags & ACTIVE and not flags & EXISTS:
+        policy, body = _unpack_policy(body)
+    if flags & ALIAS:
+        target, body = body[1:body[0] + 1].decode(), body[body[0] + 1:]
+    if flags & ZSTD:
+        if zstandard is None:
+            raise ValueError("Cached redirect is zstd-compressed, but zstandard is not installed")
+        body = zstandard.ZstdDecompressor().decompress(body)
+    location = PREFIXES[flags >> 4] + body.decode() if flags & ACTIVE else None
+    return CachedRedirect(location, expires, bool(flags & (EXISTS | ACTIVE)), bool(flags & ACTIVE), target, policy)
+
+
+async def load_redirect(short_code: str) -> Optional[CachedRedirect]:
+    """Запись из кэша или None (нет, просрочена, не читается). Ошибка кэша не роняет запрос"""
+    entry = local_redirects.get(short_code)
+    if entry is not None:
+        return entry
+    # Инвалидация, пришедшая во время чтения, не должна быть перезаписана прочитанным значением
+    version = invalidation_bus.version
+    backend = FastAPICache.get_backend()
+    try:
+        if isinstance(backend, RedisBackend):
+            data = await backend.redis.hget(redirect_bucket_key(short_code), short_code)
+        else:
+            data = await backend.get(redirect_cache_key(short_code))
+        entry = unpack(data) if data else None
+    except Exception:
+        logger.warning("Error reading cached redirect '%s'", short_code, exc_info=True)
+        return None
+    now = time.time()
+    if entry is None or entry.expires <= now:
+        return None
+    if invalidation_bus.version == version:
+        local_redirects.put(short_code, entry, entry.expires - now)
+    return entry
+
+
+async def store_redirect(
+        short_code: str,
+        location: Optional[str],
+        expires_at: Optional[datetime] = None,
+        exists: bool = True,
+        active: bool = True,
+        target: Optional[str] = None,
+        policy: RedirectPolicy = DEFAULT_POLICY,
+) -> None:
+    """Кэширует результат разрешения кода; запись не переживает срок действия ссылки expires_at.
+
+    target - основной код ссылки, если short_code - её алиас; policy - политика редиректа ссылки.
+    """
+    await store_redirects([(short_code, location, expires_at, target, policy)], exists=exists, active=active)
+
+
+async def store_redirects(
+        entries: Iterable[tuple[str, Optional[str], Optional[datetime], Optional[str], RedirectPolicy]],
+        exists: bool = True,
+        active: bool = True,
+) -> int:
+    """Пачка записей (код, Location, expires_at, target, policy) - в Redis одним конвейером. Возвращает число записанных"""
+    now = int(time.time())
+    items = []
+    for short_code, location, expires_at, target, policy in entries:
+        expires = now + (REDIRECT_CACHE_EXPIRE if active else NOT_FOUND_CACHE_EXPIRE)
+        if expires_at is not None:
+            expires = min(expires, to_epoch(expires_at))
+        if expires > now:
+            items.append((short_code, pack(location, expires, exists, active, target, policy), expires - now))
+    if not items:
+        return 0
+
+    backend = FastAPICache.get_backend()
+    try:
+        if isinstance(backend, RedisBackend):
+            writes = [("hset", redirect_bucket_key(code), code, data) for code, data, _ in items]
+            buckets = {bucket for _, bucket, *_ in writes}
+            results = await execute_batched(backend.redis, [
+                *writes, *(("expire", bucket, REDIRECT_CACHE_EXPIRE) for bucket in buckets),
+            ])
+            for bucket in {bucket for (_, bucket, *_), added in zip(writes, results) if added}:
+                if random.random() < PRUNE_PROBABILITY:
+                    await prune_bucket(backend.redis, bucket)
+        else:
+            for code, data, ttl in items:
+                key = redirect_cache_key(code)
+                await backend.set(key, data, ttl)
+                await tag_key(key, [link_tag(code)])
+    except Exception:
+        logger.warning("Error caching %d redirects", len(items), exc_info=True)
+        return 0
+    return len(items)
+
+
+async def prune_bucket(redis, bucket: str) -> int:
+    """Удаляет просроченные поля корзины. Возвращает число удалённых"""
+    now = time.time()
+    entries = await redis.hgetall(bucket)
+    stale = [code for code, data in entries.items() if _header.unpack_from(data)[1] <= now]
+    return await redis.hdel(bucket, *stale) if stale else 0
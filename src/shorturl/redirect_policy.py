@@ -0,0 +1,112 @@
+"""Политика редиректа ссылки: код ответа, кэширование браузером/CDN и учёт переходов маячком.
+
+Cache-Control: public, max-age=N, где N = min(cache_ttl ссылки, время до её expires_at) -
+закэшированный редирект не переживает ссылку. Без кэширования (N = 0) - no-store, и каждый
+переход доходит до сервера и считается. Для постоянных кодов (301/308) без cache_ttl берётся
+REDIRECT_PERMANENT_MAX_AGE: иначе браузер запомнил бы их навсегда.
+
+Кэшируемый редирект браузер повторяет сам, и эти переходы сервер не видит. В режиме маячка
+(click_beacon) вместо 3xx отдаётся крошечная HTML-страница с тем же Cache-Control: она
+отправляет navigator.sendBeacon на POST /links/{code}/beacon и переходит по ссылке, поэтому
+страница берётся из кэша, а переход всё равно считается (сервер при этом его не считает).
+Страница отдаётся только для http(s)-адресов (остальные - обычным 3xx, браузер по ним не перейдёт)
+и со строгим Content-Security-Policy: разрешены только её собственный скрипт и маячок на свой origin.
+"""
+import base64
+import hashlib
+import html
+import json
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+from urllib.parse import quote, urlsplit
+
+from starlette.responses import Response
+
+from src.config import REDIRECT_PERMANENT_MAX_AGE
+
+REDIRECT_CODES = (301, 302, 307, 308)
+PERMANENT_CODES = (301, 308)
+DEFAULT_REDIRECT_CODE = 307
+# Схемы адресов, для которых отдаётся страница маячка
+BEACON_SCHEMES = ("http", "https")
+
+
+class RedirectPolicy(NamedTuple):
+    status: int = DEFAULT_REDIRECT_CODE
+    # Сколько секунд ответ можно хранить в браузере и CDN
+    max_age: int = 0
+    # Окончание срока ссылки, unix-время (0 - бессрочная)
+    expires: int = 0
+    beacon: bool = False
+
+
+DEFAULT_POLICY = RedirectPolicy()
+
+
+def to_epoch(value: datetime) -> int:
+    # SQLite возвращает время без часового пояса, в БД оно в UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def redirect_location(url: str) -> str:
+    """Значение заголовка Location: то же экранирование, что и в starlette.responses.RedirectResponse"""
+    return quote(url, safe=":/%#?=@[]!$&'()*+,;")
+
+
+def link_policy(redirect_code: Optional[int], cache_ttl: Optional[int], expires_at: Optional[datetime],
+                click_beacon: bool = False) -> RedirectPolicy:
+    """Политика из колонок ссылки"""
+    status = redirect_code or DEFAULT_REDIRECT_CODE
+    if cache_ttl is None:
+        cache_ttl = REDIRECT_PERMANENT_MAX_AGE if status in PERMANENT_CODES else 0
+    if cache_ttl <= 0:
+        # Без кэширования срок ссылки в ответе не нужен, запись кэша остаётся короткой
+        return RedirectPolicy(status)
+    return RedirectPolicy(status, cache_ttl, to_epoch(expires_at) if expires_at is not None else 0, bool(click_beacon))
+
+
+def max_age(policy: RedirectPolicy, now: Optional[float] = None) -> int:
+    if policy.max_age <= 0:
+        return 0
+    if not policy.expires:
+        return policy.max_age
+    now = time.time() if now is None else now
+    return max(0, min(policy.max_age, int(policy.expires - now)))
+
+
+def _beacon_page(location: str, short_code: str) -> tuple[bytes, str]:
+    """Страница маячка и её Content-Security-Policy (скрипт разрешён по хэшу)"""
+    target = html.escape(location, quote=True)
+    script_target = json.dumps(location).replace("</", "<\\/")
+    beacon_url = json.dumps(f"/links/{quote(short_code, safe='')}/beacon")
+    script = f'navigator.sendBeacon&&navigator.sendBeacon({beacon_url});location.replace({script_target})'
+    digest = base64.b64encode(hashlib.sha256(script.encode()).digest()).decode()
+    csp = (f"default-src 'none'; script-src 'sha256-{digest}'; connect-src 'self'; "
+           "base-uri 'none'; form-action 'none'; frame-ancestors 'none'")
+    page = (
+        '<!doctype html><meta charset="utf-8"><title>Redirect</title>'
+        f'<script>{script}</script>'
+        f'<noscript><meta http-equiv="refresh" content="0;url={target}"></noscript>'
+        f'<a href="{target}">{target}</a>'
+    )
+    return page.encode(), csp
+
+
+def redirect_response(location: str, policy: RedirectPolicy, short_code: str,
+                      cache_status: str) -> tuple[Response, bool]:
+    """Ответ по политике и признак, что переход должен посчитать сервер (False - его посчитает маячок).
+    short_code - код, по которому считаются переходы"""
+    seconds = max_age(policy)
+    headers = {
+        "cache-control": f"public, max-age={seconds}" if seconds else "no-store",
+        "x-fastapi-cache": cache_status,
+    }
+    if policy.beacon and seconds and urlsplit(location).scheme.lower() in BEACON_SCHEMES:
+        page, headers["content-security-policy"] = _beacon_page(location, short_code)
+        headers["x-content-type-options"] = "nosniff"
+        return Response(page, media_type="text/html", headers=headers), False
+    headers["location"] = location
+    return Response(status_code=policy.status, headers=headers), True
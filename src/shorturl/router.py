@@ -1,19 +1,39 @@
-from typing import Union
+from typing import Optional, Union
 import asyncio
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
 from fastapi.responses import RedirectResponse
 from fastapi_cache.decorator import cache
-from sqlalchemy import select
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
 from sqlalchemy.sql import func
 from urllib.parse import unquote
 
-from src.database import get_async_session, User, Link, ExpiredLink
+from src.database import get_async_session, User, Link, LinkAlias, ExpiredLink
+from src import sharding
 from src.auth.manager import current_active_user
-from src.shorturl.schemas import LinkCreate, LinkResponse, LinkCodeUpdate, PublicLinkCreate
+from src.shorturl.schemas import (
+    LinkCreate, LinkResponse, LinkCodeUpdate, LinkStatsBatch, PublicLinkCreate, ProjectStatsResponse,
+    RedirectPolicyFields,
+)
+from src.shorturl.project_stats import get_project_stats, link_created, link_removed
+from src.projects.service import get_or_create_project_id, project_id_subquery
 from src.utils.short_code import generate_short_code
+from src.utils.url import url_hash
 from src.shorturl.expired_link import ExpiredLinkResponse
+from src.metrics import REDIRECTS
+from src.cache import (
+    cache_key, get_many, link_tag, link_tags, project_links_key_builder, search_key_builder, set_many,
+    stats_key_builder,
+)
+from src.outbox import LINK_CREATED, LINK_DELETED, LINK_UPDATED, add_event, schedule_drain
+from src.shorturl.click_stream import record_click
+from src.shorturl.redirect_cache import load_redirect, store_redirect
+from src.shorturl.redirect_policy import link_policy, redirect_location, redirect_response, to_epoch
+from src.shorturl.beacon import beacon_limiter
+from src.shorturl.aliases import alias_codes, code_taken_stmt, drop_aliases
+from src.shorturl.listing import JSONBytesCoder, JSONBytesResponse, RowSerializer
 
 
 router = APIRouter(
@@ -21,23 +41,91 @@ router = APIRouter(
     tags=["Links"]
 )
 
+# Списки ссылок сериализуются из строк без ORM-объектов (src/shorturl/listing.py)
+link_rows = RowSerializer(LinkResponse)
+expired_link_rows = RowSerializer(ExpiredLinkResponse)
+
+# Срок кэша статистики, как у GET /{short_code}/stats
+STATS_CACHE_EXPIRE = 30
+
+
+def _same_time(a: Optional[datetime], b: Optional[datetime]) -> bool:
+    if a is None or b is None:
+        return a is b
+    return to_epoch(a) == to_epoch(b)
+
+
+def _by_code(row) -> str:
+    return row.short_code
+
+
+async def _select_links(db: AsyncSession, query, **merge) -> list:
+    """Строки ссылок из основной БД или со всех шардов (merge - параметры ShardRouter.merged)"""
+    if sharding.shard_router is not None:
+        return await sharding.shard_router.merged(query, unique=_by_code, **merge)
+    return (await db.execute(query)).all()
+
+
+def _code_stmt(code: str):
+    return select(Link.id).where(Link.short_code == code).union_all(code_taken_stmt(code))
+
+
+async def _code_taken(db: AsyncSession, code: str) -> bool:
+    """Занят ли код ссылкой или алиасом (на шардах - на любом)"""
+    if sharding.shard_router is not None:
+        return await sharding.shard_router.first(_code_stmt(code), {}, code) is not None
+    return (await db.execute(_code_stmt(code))).first() is not None
+
+
+async def _taken_elsewhere(link_db: AsyncSession, code: str) -> bool:
+    """Занят ли код на других шардах: уникальный индекс links защищает только шард самой ссылки"""
+    if sharding.shard_router is None:
+        return False
+    return await sharding.shard_router.exists(_code_stmt(code), skip=link_db.bind)
+
+
+def _reusable(link, link_data: LinkCreate) -> bool:
+    """Ссылка на тот же URL подходит для reuse_existing, только если совпадает всё остальное, что запрошено"""
+    return (
+        link.project == link_data.project
+        and _same_time(link.expires_at, link_data.expires_at)
+        and (link.redirect_code, link.cache_ttl, link.click_beacon)
+        == (link_data.redirect_code, link_data.cache_ttl, link_data.click_beacon)
+    )
+
 
 @router.post("/shorten", status_code=status.HTTP_201_CREATED, response_model=LinkResponse)
 async def create_short_url(
     link_data: Union[LinkCreate, PublicLinkCreate],
     db: AsyncSession = Depends(get_async_session),
     user: User = Depends(current_active_user),
+    background_tasks: BackgroundTasks = None,
 ):
-    """Создание короткой ссылки"""
+    """Создание короткой ссылки.
+
+    reuse_existing - вернуть (с кодом 200) активную ссылку пользователя на тот же канонический URL
+    с теми же проектом, сроком и политикой редиректа: поиск по индексу (user_id, url_hash), а не по original_url.
+    """
     # Проверяем, есть ли поле custom_alias в переданных данных
     has_custom_alias = hasattr(link_data, 'custom_alias') and link_data.custom_alias is not None
+    destination_hash = url_hash(str(link_data.original_url))
+
+    if getattr(link_data, 'reuse_existing', False) and not has_custom_alias:
+        candidates = await _select_links(
+            db,
+            select(*link_rows.columns(Link))
+            .where(Link.user_id == user.id, Link.url_hash == destination_hash, Link.is_active.is_(True))
+            .where((Link.expires_at.is_(None)) | (Link.expires_at > datetime.now(timezone.utc)))
+            .order_by(Link.created_at),
+            key=lambda row: row.created_at,
+        )
+        existing = next((row for row in candidates if _reusable(row, link_data)), None)
+        if existing is not None:
+            return JSONBytesResponse(link_rows.dumps_each([existing])[0], status_code=status.HTTP_200_OK)
 
     # Обработка кастомного алиаса
     if has_custom_alias:
-        existing_link = await db.execute(
-            select(Link).where(Link.short_code == link_data.custom_alias)
-        )
-        if existing_link.scalars().first():
+        if await _code_taken(db, link_data.custom_alias):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Custom alias already exists"
@@ -51,51 +139,193 @@ async def create_short_url(
     # Создаем ссылку
     link = Link(
         original_url=str(link_data.original_url),
+        url_hash=destination_hash,
         short_code=short_code,
         expires_at=link_data.expires_at,
         user_id=user.id,
         is_custom=is_custom,
         project=link_data.project
     )
-
-    db.add(link)
-    await db.commit()
-    await db.refresh(link)
+    if isinstance(link_data, RedirectPolicyFields):
+        link.redirect_code = link_data.redirect_code
+        link.cache_ttl = link_data.cache_ttl
+        link.click_beacon = link_data.click_beacon
+    if link.project:
+        link.project_id = await get_or_create_project_id(db, user.id, link.project)
+
+    async with sharding.link_session(db, short_code, new=True) as link_db:
+        link_db.add(link)
+        await link_created(db, link)
+        add_event(link_db, LINK_CREATED, link, link_tags(link))
+        await sharding.commit_link(link_db, db)
+        await link_db.refresh(link)
+    schedule_drain(background_tasks, link_db.bind)
     return link
 
 
+@router.get("/search", response_model=list[LinkResponse])
+@cache(expire=60, key_builder=search_key_builder, coder=JSONBytesCoder)
+async def search_links(
+        original_url: str,
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user),
+):
+    """Поиск ссылки по оригинальному URL"""
+    decoded_url = unquote(original_url)  # Декодирование URL
+
+    links = await _select_links(db, select(*link_rows.columns(Link)).where(
+        Link.original_url.ilike(f"%{decoded_url}%"),
+        Link.user_id == user.id
+    ))
+
+    if not links:
+        raise HTTPException(
+            status_code=404,
+            detail="No links found for the provided URL"
+        )
+
+    # Тело кладётся в кэш целиком, поэтому без потоковой отдачи
+    return link_rows.response(links, stream_threshold=None)
+
+
+def _link_not_found(exists: bool) -> HTTPException:
+    REDIRECTS.labels("expired" if exists else "not_found").inc()
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Link not found or expired"
+    )
+
+
 @router.get("/{short_code}")
-@cache(expire=60)
 async def redirect_to_original(
     short_code: str,
     db: AsyncSession = Depends(get_async_session),
 ):
     """Получение оригинального URL по короткой ссылке"""
-    result = await db.execute(select(Link).where(Link.short_code == short_code))
-    link = result.scalar_one_or_none()
+    # В кэше компактная запись (src/shorturl/redirect_cache.py), а не сериализованный ответ
+    cached = await load_redirect(short_code)
+    if cached is not None:
+        if not cached.active:
+            raise _link_not_found(cached.exists)
+        REDIRECTS.labels("found").inc()
+        response, count_click = redirect_response(cached.location, cached.policy, cached.target or short_code, "HIT")
+        if count_click:
+            await record_click(cached.target or short_code)
+        return response
+
+    # Код ссылки или её алиас, основной код в приоритете
+    stmt = (
+        select(
+            Link.short_code, Link.original_url, Link.is_active, Link.expires_at,
+            Link.redirect_code, Link.cache_ttl, Link.click_beacon,
+        )
+        .where(or_(Link.short_code == short_code, Link.id.in_(code_taken_stmt(short_code))))
+        .order_by(Link.short_code != short_code)
+        .limit(1)
+    )
+    if sharding.shard_router is not None:
+        link = await sharding.shard_router.first(stmt, {}, short_code)
+    else:
+        link = (await db.execute(stmt)).first()
 
     if not link or not link.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Link not found or expired"
-        )
+        await store_redirect(short_code, None, exists=link is not None, active=False)
+        raise _link_not_found(link is not None)
+
+    REDIRECTS.labels("found").inc()
+    # Экранирование Location - как в RedirectResponse
+    location = RedirectResponse(url=link.original_url).headers["location"]
+    policy = link_policy(link.redirect_code, link.cache_ttl, link.expires_at, link.click_beacon)
+    response, count_click = redirect_response(location, policy, link.short_code, "MISS")
+    if count_click:
+        # Как и в быстром пути: счётчики обновит сброс буфера или потребитель потока переходов
+        await record_click(link.short_code)
+    target = link.short_code if link.short_code != short_code else None
+    await store_redirect(short_code, location, link.expires_at, target=target, policy=policy)
+    return response
+
+
+async def _beacon_enabled(short_code: str, db: AsyncSession) -> bool:
+    """Включён ли маячок у активной ссылки с основным кодом short_code: по кэшу редиректа, иначе по БД
+    (результат кладётся в кэш, как при редиректе)"""
+    cached = await load_redirect(short_code)
+    if cached is not None:
+        return cached.active and cached.target is None and cached.policy.beacon
+    stmt = select(
+        Link.original_url, Link.is_active, Link.expires_at, Link.redirect_code, Link.cache_ttl, Link.click_beacon,
+    ).where(Link.short_code == short_code)
+    if sharding.shard_router is not None:
+        row = await sharding.shard_router.first(stmt, {}, short_code)
+    else:
+        row = (await db.execute(stmt)).first()
+    if row is None or not row.is_active:
+        await store_redirect(short_code, None, exists=row is not None, active=False)
+        return False
+    policy = link_policy(row.redirect_code, row.cache_ttl, row.expires_at, row.click_beacon)
+    await store_redirect(short_code, redirect_location(row.original_url), row.expires_at, policy=policy)
+    return policy.beacon
 
-    link.clicks += 1
-    link.last_clicked_at = datetime.now(timezone.utc)
-    await db.commit()
-    return RedirectResponse(url=link.original_url)
+
+@router.post("/{short_code}/beacon", status_code=status.HTTP_204_NO_CONTENT)
+async def click_beacon(
+    short_code: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_session),
+):
+    """Переход по кэшируемому редиректу в режиме маячка (navigator.sendBeacon со страницы редиректа).
+    Принимается только для ссылки с маячком в политике и не чаще BEACON_RATE_LIMIT с адреса
+    (src/shorturl/beacon.py), иначе накрутить переходы можно было бы по любому коду"""
+    if not await beacon_limiter.allow(request.client.host if request.client else ""):
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many beacons")
+    if not await _beacon_enabled(short_code, db):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Link not found or expired")
+    await record_click(short_code)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"cache-control": "no-store"})
+
+
+@router.post("/stats/batch", response_model=list[LinkResponse])
+async def get_links_stats_batch(
+        batch: LinkStatsBatch,
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user),
+):
+    """Статистика по многим ссылкам пользователя одним запросом (для дашборда вместо GET /stats на каждую).
+
+    Возвращаются ссылки пользователя в порядке кодов, чужие и несуществующие коды пропускаются.
+    Кэш по ссылке читается одним конвейером, промахи выбираются одним запросом IN и кладутся
+    в кэш тоже одним конвейером; запись кэша - готовый JSON ссылки (пустая - кода у пользователя нет),
+    ответ склеивается без сериализации.
+    """
+    codes = list(dict.fromkeys(batch.short_codes))
+    keys = [cache_key("stats-item", user.id, code) for code in codes]
+    items = dict(zip(codes, await get_many(keys)))
+    misses = [code for code, item in items.items() if item is None]
+    if misses:
+        rows = await _select_links(
+            db, select(*link_rows.columns(Link)).where(Link.short_code.in_(misses), Link.user_id == user.id),
+        )
+        filled = dict.fromkeys(misses, b"")
+        filled.update(zip([row.short_code for row in rows], link_rows.dumps_each(rows)))
+        await set_many(
+            [(cache_key("stats-item", user.id, code), item, [link_tag(code)]) for code, item in filled.items()],
+            STATS_CACHE_EXPIRE,
+        )
+        items.update(filled)
+    body = b"[" + b",".join(item for item in items.values() if item) + b"]"
+    return JSONBytesResponse(body, headers={"X-FastAPI-Cache": "MISS" if misses else "HIT"})
 
 
 @router.get("/{short_code}/stats", response_model=LinkResponse)
-@cache(expire=30)
+@cache(expire=STATS_CACHE_EXPIRE, key_builder=stats_key_builder)
 async def get_link_stats(
         short_code: str,
         db: AsyncSession = Depends(get_async_session),
         user: User = Depends(current_active_user),
 ):
     """Статистика по ссылке (Отображает оригинальный URL, возвращает дату создания, количество переходов, дату последнего использовани)"""
-    result = await db.execute(select(Link).where(Link.short_code == short_code))
-    link = result.scalar_one_or_none()
+    async with sharding.link_session(db, short_code) as link_db:
+        result = await link_db.execute(select(Link).where(Link.short_code == short_code))
+        link = result.scalar_one_or_none()
 
     if not link:
         raise HTTPException(
@@ -117,114 +347,167 @@ async def update_link(
         short_code: str,
         new_code: LinkCodeUpdate,
         db: AsyncSession = Depends(get_async_session),
-        user: User = Depends(current_active_user)
+        user: User = Depends(current_active_user),
+        background_tasks: BackgroundTasks = None,
 ):
-    """Редактирование коротких ссылок"""
-    # Находим исходную ссылку
-    result = await db.execute(select(Link).where(Link.short_code == short_code))
-    link = result.scalar_one_or_none()
+    """Редактирование коротких ссылок.
+
+    Смена кода - один UPDATE по уникальному индексу short_code: занятый код даёт IntegrityError,
+    без гонки между проверкой и записью. keep_alias оставляет прежний код в link_aliases.
+    """
+    new = new_code.short_code
+    owned = (Link.short_code == short_code) & (Link.user_id == user.id)
+    duplicate = HTTPException(status_code=400, detail="This short code already exists")
+    # Ссылка остаётся на своём шарде и под новым кодом (её находит поиск по остальным шардам)
+    async with sharding.link_session(db, short_code) as link_db:
+        try:
+            if new != short_code:
+                # Возврат к собственному прежнему коду: алиас уступает место ссылке
+                await link_db.execute(
+                    delete(LinkAlias)
+                    .where(LinkAlias.short_code == new, LinkAlias.link_id.in_(select(Link.id).where(owned)))
+                )
+            result = await link_db.execute(update(Link).where(owned).values(short_code=new).returning(Link))
+            link = result.scalar_one_or_none()
+            if link is not None and new != short_code:
+                # Коды алиасов уникальным индексом links не защищены
+                if (await link_db.execute(code_taken_stmt(new))).first() or await _taken_elsewhere(link_db, new):
+                    raise duplicate
+                if new_code.keep_alias:
+                    link_db.add(LinkAlias(short_code=short_code, link_id=link.id))
+            if link is not None:
+                # Записи алиасов в кэше указывают на прежний основной код
+                aliases = await alias_codes(link_db, link.id)
+                add_event(link_db, LINK_UPDATED, link,
+                          [link_tag(short_code), *link_tags(link), *map(link_tag, aliases)], previous_code=short_code)
+            await link_db.commit()
+        except IntegrityError:
+            raise duplicate
+
+        if link is None:
+            # Отличаем отсутствующую ссылку от чужой только на пути ошибки
+            owner = await link_db.execute(select(Link.user_id).where(Link.short_code == short_code))
+            if owner.first() is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Link with this short code not found"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to update this link"
+            )
 
-    if not link:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Link with this short code not found"
-        )
+        await link_db.refresh(link)
+    schedule_drain(background_tasks, link_db.bind)
+    return link
 
-    # Проверка права доступа
-    if link.user_id != user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to update this link"
-        )
 
-    # Проверка на дубликат
-    if link.short_code != new_code.short_code:  # если код действительно меняется
-        existing = await db.execute(select(Link).where(Link.short_code == new_code.short_code))
-        if existing.scalar_one_or_none():
-            raise HTTPException(status_code=400, detail="This short code already exists")
-
-    # Обновление ссылки
-    link.short_code = new_code.short_code
-    link.updated_at = datetime.now(timezone.utc)
-    await db.commit()
-    await db.refresh(link)
+@router.patch("/{short_code}/redirect", response_model=LinkResponse)
+async def update_redirect_policy(
+        short_code: str,
+        policy: RedirectPolicyFields,
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user),
+        background_tasks: BackgroundTasks = None,
+):
+    """Код редиректа, кэширование браузером/CDN и маячок. Уже закэшированные браузерами
+    редиректы живут до конца своего max-age"""
+    async with sharding.link_session(db, short_code) as link_db:
+        result = await link_db.execute(
+            update(Link)
+            .where(Link.short_code == short_code, Link.user_id == user.id)
+            .values(**policy.model_dump())
+            .returning(Link)
+        )
+        link = result.scalar_one_or_none()
+        if link is None:
+            owner = await link_db.execute(select(Link.user_id).where(Link.short_code == short_code))
+            if owner.first() is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Link with this short code not found"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to update this link"
+            )
+        aliases = await alias_codes(link_db, link.id)
+        add_event(link_db, LINK_UPDATED, link, [*link_tags(link), *map(link_tag, aliases)])
+        await link_db.commit()
+    schedule_drain(background_tasks, link_db.bind)
     return link
 
 
 @router.delete("/{short_code}")
 async def delete_link(
         short_code: str,
-        request: Request,
         db: AsyncSession = Depends(get_async_session),
-        user: User = Depends(current_active_user)
+        user: User = Depends(current_active_user),
+        background_tasks: BackgroundTasks = None,
 ):
     """Удаление информации по короткой ссылке"""
-    result = await db.execute(select(Link).where(Link.short_code == short_code))
-    link = result.scalar_one_or_none()
-
-    if not link:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Link not found"
-        )
+    async with sharding.link_session(db, short_code) as link_db:
+        result = await link_db.execute(select(Link).where(Link.short_code == short_code))
+        link = result.scalar_one_or_none()
 
-    if link.user_id and link.user_id != user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to delete this link"
-        )
+        if not link:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Link not found"
+            )
 
-    await db.delete(link)
-    await db.commit()
+        if link.user_id and link.user_id != user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to delete this link"
+            )
 
-    await request.app.state.redis.delete(f"shorturl:{short_code}")
-    await request.app.state.redis.delete(f"shorturl:{short_code}:stats")
+        stale_tags = link_tags(link) + [link_tag(code) for code in await drop_aliases(link_db, [link.id])]
+        await link_removed(db, link)
+        add_event(link_db, LINK_DELETED, link, stale_tags)
+        await link_db.delete(link)
+        await sharding.commit_link(link_db, db)
+    schedule_drain(background_tasks, link_db.bind)
 
     return {"message": "Link deleted successfully"}
 
 
-@router.get("/search")
-@cache(expire=60)
-async def search_links(
-        original_url: str,
-        db: AsyncSession = Depends(get_async_session),
-        user: User = Depends(current_active_user),
-):
-    """Поиск ссылки по оригинальному URL"""
-    decoded_url = unquote(original_url)  # Декодирование URL
-
-    result = await db.execute(
-        select(Link).where(
-            Link.original_url.ilike(f"%{decoded_url}%"),
-            Link.user_id == user.id
-        )
-    )
-    links = result.scalars().all()
-
-    if not links:
-        raise HTTPException(
-            status_code=404,
-            detail="No links found for the provided URL"
-        )
-
-    print(f"Found {len(links)} links for URL: {decoded_url}")
-    return links if links else []
-
-
 @router.get("/projects/{project_name}", response_model=list[LinkResponse])
-@cache(expire=60)
+@cache(expire=60, key_builder=project_links_key_builder, coder=JSONBytesCoder)
 async def get_project_links(
     project_name: str,
     db: AsyncSession = Depends(get_async_session),
     user: User = Depends(current_active_user),
 ):
     """Получение всех ссылок проекта"""
-    result = await db.execute(
-        select(Link)
-        .where(Link.project == project_name)
-        .where(Link.user_id == user.id)
-    )
-    return result.scalars().all()
+    # Диапазон по индексу (user_id, project_id, created_at)
+    query = select(*link_rows.columns(Link)).where(Link.user_id == user.id).order_by(Link.created_at)
+    if sharding.shard_router is not None:
+        # Проекты в основной БД: id проекта берётся там, ссылки - со всех шардов по порядку created_at
+        project_id = (await db.execute(select(project_id_subquery(user.id, project_name)))).scalar()
+        rows = await sharding.shard_router.merged(
+            query.where(Link.project_id == project_id), key=lambda row: row.created_at, unique=_by_code,
+        ) if project_id is not None else []
+    else:
+        rows = (await db.execute(query.where(Link.project_id == project_id_subquery(user.id, project_name)))).all()
+    return link_rows.response(rows, stream_threshold=None)
+
+
+@router.get("/projects/{project_name}/stats", response_model=ProjectStatsResponse)
+async def get_project_stats_handler(
+    project_name: str,
+    top: int = 10,
+    db: AsyncSession = Depends(get_async_session),
+    user: User = Depends(current_active_user),
+):
+    """Сводная статистика проекта: счётчики из project_stats и top-N ссылок по переходам"""
+    stats = await get_project_stats(db, user.id, project_name, top=min(max(top, 1), 100))
+    if stats is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    return stats
 
 @router.get("/expired/", response_model=list[ExpiredLinkResponse])
 async def get_expired_links(
@@ -233,23 +516,26 @@ async def get_expired_links(
 ):
     """Получение истории истекших ссылок"""
     result = await db.execute(
-        select(ExpiredLink)
+        select(*expired_link_rows.columns(ExpiredLink))
         .where(ExpiredLink.user_id == user.id)
     )
-    return result.scalars().all()
+    return expired_link_rows.response(result.all())
 
 
 @router.post("/public/", response_model=LinkResponse)
 async def create_public_short_url(
         link_data: PublicLinkCreate,
         db: AsyncSession = Depends(get_async_session),
+        background_tasks: BackgroundTasks = None,
 ):
     """Создание короткой ссылки без аутентификации"""
     # Ограничение количества ссылок для анонимов
-    existing_links = await db.execute(
-        select(func.count()).where(Link.user_id.is_(None))
-    )
-    if existing_links.scalar() >= 100:
+    anonymous = select(func.count()).where(Link.user_id.is_(None))
+    if sharding.shard_router is not None:
+        existing_links = sum(rows[0][0] for rows in await sharding.shard_router.fan_out(anonymous))
+    else:
+        existing_links = (await db.execute(anonymous)).scalar()
+    if existing_links >= 100:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Maximum number of anonymous links reached"
@@ -267,6 +553,7 @@ async def create_public_short_url(
 
     link = Link(
         original_url=str(link_data.original_url),
+        url_hash=url_hash(str(link_data.original_url)),
         short_code=short_code,
         expires_at=link_data.expires_at,
         user_id=None,
@@ -274,7 +561,11 @@ async def create_public_short_url(
         project=link_data.project
     )
 
-    db.add(link)
-    await db.commit()
-    await db.refresh(link)
+    async with sharding.link_session(db, short_code, new=True) as link_db:
+        link_db.add(link)
+        # Код мог быть закэширован как отсутствующий
+        add_event(link_db, LINK_CREATED, link, link_tags(link))
+        await link_db.commit()
+        await link_db.refresh(link)
+    schedule_drain(background_tasks, link_db.bind)
     return link
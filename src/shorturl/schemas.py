@@ -1,9 +1,23 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 
+from src.config import STATS_BATCH_MAX_CODES
 
-class LinkBase(BaseModel):
+RedirectCode = Literal[301, 302, 307, 308]
+
+
+class RedirectPolicyFields(BaseModel):
+    """Политика редиректа (src/shorturl/redirect_policy.py)"""
+    redirect_code: RedirectCode = 307
+    # Секунды кэширования редиректа браузером/CDN (не дольше срока ссылки); None - 0 для 302/307
+    # и REDIRECT_PERMANENT_MAX_AGE для 301/308
+    cache_ttl: Optional[int] = Field(None, ge=0)
+    # Считать переходы маячком со страницы, когда редирект кэшируется
+    click_beacon: bool = False
+
+
+class LinkBase(RedirectPolicyFields):
     original_url: str
     username: str
     custom_alias: Optional[str] = Field(None, max_length=50)
@@ -12,7 +26,8 @@ class LinkBase(BaseModel):
 
 
 class LinkCreate(LinkBase):
-    pass
+    # Вернуть существующую активную ссылку пользователя на тот же URL вместо новой
+    reuse_existing: bool = False
 
 
 class PublicLinkCreate(BaseModel):
@@ -29,10 +44,32 @@ class LinkUpdate(BaseModel):
 
 class LinkCodeUpdate(BaseModel):
     short_code: str = Field(min_length=3, max_length=32)
+    # Прежний код продолжает перенаправлять на ссылку
+    keep_alias: bool = False
+
+
+class LinkStatsBatch(BaseModel):
+    short_codes: list[str] = Field(min_length=1, max_length=STATS_BATCH_MAX_CODES)
+
+
+class ProjectTopLink(BaseModel):
+    short_code: str
+    original_url: str
+    clicks: int
+
+
+class ProjectStatsResponse(BaseModel):
+    project: str
+    total_links: int
+    total_clicks: int
+    active_links: int
+    expired_links: int
+    top_links: list[ProjectTopLink]
 
 
 class LinkResponse(LinkBase):
     original_url: str
+    username: Optional[str] = None
     short_code: str
     created_at: datetime
     clicks: int
@@ -0,0 +1,176 @@
+"""Снимок редиректов только для чтения: файл short_code -> Location, который читается через mmap.
+
+Формат (little-endian):
+    заголовок  magic "SURLSNAP", версия u32, число записей u32, время создания u64, размер файла u64
+    индекс     смещения записей u32, записи отсортированы по байтам кода (бинарный поиск)
+    записи     code_len u8, флаги u8, status u16, max_age u32, expires u32, location_len u16,
+               затем код и Location (уже экранированный, как в заголовке ответа)
+
+expires - окончание срока ссылки (0 - бессрочная): запись с истёкшим сроком не отдаётся, пока её не
+уберёт следующий снимок. Файл пишется рядом во временный и подменяется os.replace, поэтому
+читатели видят либо старый снимок целиком, либо новый. Страницы mmap общие для всех процессов,
+открывших файл: воркеры ничего не копируют в свою память. Доставлять снимок на узел нужно так же
+(копия рядом и mv/rename): перезапись открытого файла на месте ломает читателей (SIGBUS).
+"""
+import logging
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional, Union
+
+from src.shorturl.redirect_policy import RedirectPolicy
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SURLSNAP"
+VERSION = 1
+FLAG_BEACON = 0x01
+
+_header = struct.Struct("<8sIIQQ")
+_offset = struct.Struct("<I")
+_entry = struct.Struct("<BBHIIH")
+
+MAX_CODE_LENGTH = 0xFF
+MAX_LOCATION_LENGTH = 0xFFFF
+
+
+class SnapshotEntry(NamedTuple):
+    code: str
+    location: str
+    policy: RedirectPolicy
+    # Окончание срока ссылки, unix-время (0 - бессрочная)
+    expires: int = 0
+
+
+def _pack_entry(code: bytes, location: bytes, policy: RedirectPolicy, expires: int) -> bytes:
+    flags = FLAG_BEACON if policy.beacon else 0
+    return _entry.pack(len(code), flags, policy.status, policy.max_age, expires, len(location)) + code + location
+
+
+def write_snapshot(path: Union[str, Path], entries: Iterable[SnapshotEntry], created_at: Optional[int] = None) -> int:
+    """Записывает снимок атомарно, возвращает число записей.
+    При повторе кода остаётся первая запись; коды и адреса длиннее формата пропускаются"""
+    path = Path(path)
+    records = {}
+    skipped = 0
+    for entry in entries:
+        code, location = entry.code.encode(), entry.location.encode()
+        if len(code) > MAX_CODE_LENGTH or len(location) > MAX_LOCATION_LENGTH:
+            skipped += 1
+            continue
+        records.setdefault(code, _pack_entry(code, location, entry.policy, entry.expires))
+    if skipped:
+        logger.warning("Redirect snapshot: skipped %d entries that do not fit the format", skipped)
+
+    codes = sorted(records)
+    position = _header.size + _offset.size * len(codes)
+    offsets = []
+    for code in codes:
+        offsets.append(position)
+        position += len(records[code])
+    if position > 0xFFFFFFFF:
+        raise ValueError("Redirect snapshot exceeds 4 GiB")
+
+    created_at = int(time.time()) if created_at is None else created_at
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_header.pack(MAGIC, VERSION, len(codes), created_at, position))
+            f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            f.writelines(records[code] for code in codes)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return len(codes)
+
+
+class Snapshot:
+    """Открытый снимок. lookup читает прямо из отображённых страниц файла"""
+
+    def __init__(self, path: Union[str, Path]):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size < _header.size:
+                raise ValueError(f"Not a redirect snapshot: {path}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Файл, который действительно открыт (путь мог быть уже подменён новым снимком)
+        self.stamp = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        magic, version, self.count, self.created_at, size = _header.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION or size != len(self._mm):
+            self._mm.close()
+            raise ValueError(f"Not a redirect snapshot or truncated: {path}")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def lookup(self, code: str, now: Optional[float] = None) -> Optional[tuple[str, RedirectPolicy]]:
+        """(Location, политика) или None, если кода нет в снимке или срок ссылки истёк"""
+        key = code.encode()
+        mm = self._mm
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = _offset.unpack_from(mm, _header.size + _offset.size * mid)[0]
+            start = offset + _entry.size
+            candidate = mm[start:start + mm[offset]]
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                code_len, flags, status, max_age, expires, location_len = _entry.unpack_from(mm, offset)
+                if expires and expires <= (time.time() if now is None else now):
+                    return None
+                start += code_len
+                location = mm[start:start + location_len].decode()
+                # Как и link_policy: срок ссылки в политике нужен только кэшируемому ответу
+                return location, RedirectPolicy(status, max_age, expires if max_age else 0, bool(flags & FLAG_BEACON))
+        return None
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class SnapshotReader:
+    """Текущий снимок по пути и его горячая подмена: refresh открывает новый файл,
+    когда os.replace положил на место старого другой"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.snapshot: Optional[Snapshot] = None
+
+    def refresh(self) -> bool:
+        """Переоткрывает снимок, если файл сменился; True - подменён"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        current = self.snapshot
+        if current is not None and current.stamp == (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return False
+        try:
+            snapshot = Snapshot(self.path)
+        except (OSError, ValueError) as e:
+            logger.warning("Redirect snapshot %s was not loaded: %s", self.path, e)
+            return False
+        # Запросы в этом процессе обслуживаются в одном потоке цикла событий, и между lookup
+        # нет await: старый снимок можно закрыть сразу
+        self.snapshot = snapshot
+        if current is not None:
+            current.close()
+        logger.info("Redirect snapshot %s loaded: %d links", self.path, snapshot.count)
+        return True
+
+    def lookup(self, code: str, now: Optional[float] = None) -> Optional[tuple[str, RedirectPolicy]]:
+        snapshot = self.snapshot
+        return snapshot.lookup(code, now) if snapshot is not None else None
+
+    def close(self) -> None:
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
@@ -0,0 +1,80 @@
+"""Режим чтения: редиректы только из снимка (src/shorturl/snapshot.py), без БД, Redis и FastAPI.
+
+    REDIRECT_SNAPSHOT_PATH=/data/redirects.snapshot gunicorn src.snapshot_app:app --config python:src.gunicorn_conf
+
+Для edge/sidecar рядом с основным API: снимок выгружает задача redirect_snapshot
+(REDIRECT_SNAPSHOT_INTERVAL или POST /report/redirect-snapshot), файл доставляется на узел,
+а воркеры раз в SNAPSHOT_RELOAD_INTERVAL секунд проверяют, не подменён ли он. Политика
+редиректа та же, что в API; переходы здесь не считаются (маячок принимается и отбрасывается).
+Коды, созданные или изменённые после выгрузки, появятся со следующим снимком.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from src.config import REDIRECT_SNAPSHOT_PATH, SNAPSHOT_RELOAD_INTERVAL
+from src.shorturl.redirect_policy import redirect_response
+from src.shorturl.snapshot import SnapshotReader
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND_BODY = b'{"detail":"Link not found or expired"}'
+
+reader = SnapshotReader(REDIRECT_SNAPSHOT_PATH)
+
+
+async def snapshot_redirect(request: Request) -> Response:
+    short_code = request.path_params["short_code"]
+    found = reader.lookup(short_code)
+    if found is None:
+        return Response(NOT_FOUND_BODY, status_code=404, media_type="application/json")
+    location, policy = found
+    response, _ = redirect_response(location, policy, short_code, "SNAPSHOT")
+    return response
+
+
+async def snapshot_beacon(request: Request) -> Response:
+    return Response(status_code=204, headers={"cache-control": "no-store"})
+
+
+async def health(request: Request) -> Response:
+    snapshot = reader.snapshot
+    if snapshot is None:
+        return Response(b'{"status":"no snapshot"}', status_code=503, media_type="application/json")
+    return Response(f'{{"links":{snapshot.count},"created_at":{snapshot.created_at}}}'.encode(),
+                    media_type="application/json")
+
+
+async def _reload(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            reader.refresh()
+        except Exception:
+            logger.exception("Redirect snapshot reload failed")
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    # Снимок открывается в каждом воркере (после fork): страницы файла всё равно общие
+    if not reader.refresh():
+        logger.warning("Redirect snapshot %s is not available yet", reader.path)
+    task = asyncio.create_task(_reload(SNAPSHOT_RELOAD_INTERVAL))
+    yield
+    task.cancel()
+    reader.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/links/{short_code}", snapshot_redirect, methods=["GET"]),
+        Route("/links/{short_code}/beacon", snapshot_beacon, methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
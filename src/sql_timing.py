@@ -0,0 +1,33 @@
+"""Общая подписка на выполнение SQL всех движков: время каждого запроса передаётся наблюдателям
+(метрики Prometheus, профилировщик запросов), слушатели SQLAlchemy регистрируются один раз"""
+import time
+from typing import Any, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# (текст запроса, параметры, длительность в секундах)
+QueryObserver = Callable[[str, Any, float], None]
+
+_observers: list[QueryObserver] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_start_time")
+    if not started:  # подписка появилась во время выполнения запроса
+        return
+    duration = time.perf_counter() - started.pop()
+    for observer in _observers:
+        observer(statement, parameters, duration)
+
+
+def add_query_observer(observer: QueryObserver) -> None:
+    if observer not in _observers:
+        _observers.append(observer)
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
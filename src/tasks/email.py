@@ -0,0 +1,189 @@
+import logging
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+from functools import lru_cache
+from pathlib import Path
+from queue import Empty, LifoQueue
+from typing import Iterator
+
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+from src.config import (
+    SMTP_HOST, SMTP_PASSWORD, SMTP_POOL_SIZE, SMTP_PORT, SMTP_RATE_LIMIT, SMTP_USE_SSL, SMTP_USER,
+)
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+# Соединение, простаивавшее дольше, проверяется NOOP перед использованием
+IDLE_CHECK_SECONDS = 30
+
+_templates = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+)
+
+
+@lru_cache(maxsize=64)
+def get_template(name: str) -> Template:
+    """Шаблон компилируется один раз на процесс"""
+    return _templates.get_template(name)
+
+
+def render_email(template: str, to: str, subject: str, **context) -> EmailMessage:
+    email = EmailMessage()
+    email['Subject'] = subject
+    email['From'] = SMTP_USER
+    email['To'] = to
+    email.set_content(get_template(template).render(**context), subtype='html')
+    return email
+
+
+class RateLimiter:
+    """Token bucket: не больше rate писем в секунду, с запасом burst"""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class SMTPConnectionPool:
+    """Постоянные SMTP-соединения воркера: подключение и LOGIN один раз, а не на каждое письмо"""
+
+    def __init__(self, host: str, port: int, use_ssl: bool = True, user: str | None = None,
+                 password: str | None = None, max_size: int = 2, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self._idle: LifoQueue = LifoQueue(maxsize=max_size)
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = smtp_class(self.host, self.port, timeout=self.timeout)
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        return server
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def _close(self, server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def acquire(self) -> smtplib.SMTP:
+        while True:
+            try:
+                server, released_at = self._idle.get_nowait()
+            except Empty:
+                return self._connect()
+            if time.monotonic() - released_at < IDLE_CHECK_SECONDS or self._is_alive(server):
+                return server
+            self._close(server)
+
+    def release(self, server: smtplib.SMTP) -> None:
+        try:
+            self._idle.put_nowait((server, time.monotonic()))
+        except Exception:
+            self._close(server)
+
+    def discard(self, server: smtplib.SMTP) -> None:
+        self._close(server)
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        server = self.acquire()
+        try:
+            yield server
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self.discard(server)
+            raise
+        else:
+            self.release(server)
+
+    def close_all(self) -> None:
+        """Закрывает простаивающие соединения (при остановке или после fork воркера)"""
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except Empty:
+                return
+            self._close(server)
+
+
+smtp_pool = SMTPConnectionPool(
+    SMTP_HOST, SMTP_PORT, use_ssl=SMTP_USE_SSL, user=SMTP_USER, password=SMTP_PASSWORD, max_size=SMTP_POOL_SIZE,
+)
+rate_limiter = RateLimiter(SMTP_RATE_LIMIT)
+
+
+def _is_permanent(error: smtplib.SMTPResponseException | smtplib.SMTPRecipientsRefused) -> bool:
+    """Ответ 5xx: адрес или письмо отклонены окончательно, повтор не поможет"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return error.smtp_code >= 500
+
+
+def deliver(messages: list[EmailMessage], pool: SMTPConnectionPool = smtp_pool,
+            limiter: RateLimiter = rate_limiter) -> list[EmailMessage]:
+    """Отправляет пачку писем в одной SMTP-сессии. Возвращает письма, которые стоит отправить повторно.
+
+    Отказ по отдельному адресу не прерывает пачку: окончательный (5xx) пишется в лог и письмо
+    отбрасывается, временный (4xx) - письмо возвращается. При обрыве соединения оно пересоздаётся
+    один раз, а оставшиеся письма возвращаются как неотправленные.
+    """
+    failed: list[EmailMessage] = []
+    pending = list(messages)
+    reconnects = 0
+    while pending:
+        try:
+            with pool.connection() as server:
+                while pending:
+                    limiter.acquire()
+                    message = pending[0]
+                    try:
+                        server.send_message(message)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        if _is_permanent(e):
+                            logger.warning("Email to %s rejected, dropped: %s", message['To'], e)
+                        else:
+                            logger.warning("Email to %s deferred: %s", message['To'], e)
+                            failed.append(message)
+                    pending.pop(0)
+        except (smtplib.SMTPServerDisconnected, OSError) as e:
+            reconnects += 1
+            if reconnects > 1:
+                logger.error("SMTP connection lost, %d emails not sent: %s", len(pending), e)
+                failed.extend(pending)
+                break
+    return failed
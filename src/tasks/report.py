@@ -0,0 +1,147 @@
+import itertools
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from sqlalchemy import case, func, select
+
+from src import sharding
+from src.database import Link, User
+
+REPORT_CHUNK_SIZE = 500
+REPORT_TOP_LINKS = 5
+REPORT_PERIOD = timedelta(days=7)
+
+links = Link.__table__
+users = User.__table__
+
+
+def _top_links_stmt(user_ids, top: int):
+    ranked = (
+        select(
+            links.c.user_id, links.c.short_code, links.c.original_url, links.c.clicks,
+            func.row_number().over(
+                partition_by=links.c.user_id, order_by=(links.c.clicks.desc(), links.c.short_code),
+            ).label("rank"),
+        )
+        .where(links.c.user_id.in_(user_ids))
+        .subquery()
+    )
+    return (
+        select(ranked.c.user_id, ranked.c.short_code, ranked.c.original_url, ranked.c.clicks)
+        .where(ranked.c.rank <= top)
+        .order_by(ranked.c.user_id, ranked.c.rank)
+    )
+
+
+def _expiring_stmt(user_ids, now: datetime, until: datetime, top: int):
+    ranked = (
+        select(
+            links.c.user_id, links.c.short_code, links.c.expires_at,
+            func.row_number().over(partition_by=links.c.user_id, order_by=links.c.expires_at).label("rank"),
+        )
+        .where(
+            links.c.user_id.in_(user_ids),
+            links.c.is_active.is_(True),
+            links.c.expires_at > now,
+            links.c.expires_at <= until,
+        )
+        .subquery()
+    )
+    return (
+        select(ranked.c.user_id, ranked.c.short_code, ranked.c.expires_at)
+        .where(ranked.c.rank <= top)
+        .order_by(ranked.c.user_id, ranked.c.rank)
+    )
+
+
+async def _link_rows(db, stmt) -> list:
+    """Строки агрегата по ссылкам из основной БД или со всех шардов (сводятся в iter_weekly_reports)"""
+    if sharding.shard_router is not None:
+        return list(itertools.chain(*await sharding.shard_router.fan_out(stmt)))
+    return (await db.execute(stmt)).all()
+
+
+async def iter_weekly_reports(
+        db, now: datetime | None = None, chunk_size: int = REPORT_CHUNK_SIZE, top: int = REPORT_TOP_LINKS,
+) -> AsyncIterator[list[dict]]:
+    """Отчёты по пользователям, пачками по chunk_size.
+
+    На пачку - пять запросов (пользователи по ключу и четыре агрегата с GROUP BY / row_number),
+    число запросов не зависит ни от числа пользователей в пачке, ни от числа их ссылок.
+    Отчёт - JSON-совместимый словарь {"to": email, ...контекст шаблона} для send_email_batch.
+    Пользователи без ссылок пропускаются.
+    """
+    now = now or datetime.now(timezone.utc)
+    since, until = now - REPORT_PERIOD, now + REPORT_PERIOD
+    last_id = None
+    while True:
+        stmt = select(users.c.id, users.c.email, users.c.username).order_by(users.c.id).limit(chunk_size)
+        if last_id is not None:
+            stmt = stmt.where(users.c.id > last_id)
+        chunk = (await db.execute(stmt)).all()
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        user_ids = [row.id for row in chunk]
+
+        # На шардах у пользователя по строке с каждого шарда - счётчики складываются
+        totals: dict = {}
+        for row in await _link_rows(db, select(
+            links.c.user_id,
+            func.count().label("links"),
+            func.coalesce(func.sum(links.c.clicks), 0).label("clicks"),
+            func.sum(case((links.c.is_active.is_(True), 1), else_=0)).label("active"),
+            func.sum(case((links.c.created_at >= since, 1), else_=0)).label("new"),
+        ).where(links.c.user_id.in_(user_ids)).group_by(links.c.user_id)):
+            totals.setdefault(row.user_id, Counter()).update(
+                links=row.links, clicks=row.clicks, active=row.active, new=row.new,
+            )
+        if not totals:
+            continue
+
+        reports = {
+            user.id: {
+                "to": user.email,
+                "username": user.username,
+                "total_links": totals[user.id]["links"],
+                "total_clicks": totals[user.id]["clicks"],
+                "active_links": totals[user.id]["active"],
+                "new_links": totals[user.id]["new"],
+                "top_links": [],
+                "projects": [],
+                "expiring": [],
+            }
+            for user in chunk if user.id in totals
+        }
+        active_ids = list(reports)
+
+        # Топы с шардов пересортировываются и обрезаются заново
+        top_rows = await _link_rows(db, _top_links_stmt(active_ids, top))
+        for row in sorted(top_rows, key=lambda row: (-row.clicks, row.short_code)):
+            items = reports[row.user_id]["top_links"]
+            if len(items) < top:
+                items.append({"short_code": row.short_code, "original_url": row.original_url, "clicks": row.clicks})
+        projects: dict = {}
+        for row in await _link_rows(
+            db,
+            select(
+                links.c.user_id, links.c.project,
+                func.count().label("links"), func.coalesce(func.sum(links.c.clicks), 0).label("clicks"),
+            )
+            .where(links.c.user_id.in_(active_ids), links.c.project.is_not(None))
+            .group_by(links.c.user_id, links.c.project)
+            .order_by(links.c.user_id, func.sum(links.c.clicks).desc())
+        ):
+            projects.setdefault((row.user_id, row.project), Counter()).update(links=row.links, clicks=row.clicks)
+        for (user_id, project), counts in sorted(projects.items(), key=lambda item: -item[1]["clicks"]):
+            reports[user_id]["projects"].append(
+                {"project": project, "links": counts["links"], "clicks": counts["clicks"]}
+            )
+        expiring_rows = await _link_rows(db, _expiring_stmt(active_ids, now, until, top))
+        for row in sorted(expiring_rows, key=lambda row: row.expires_at):
+            items = reports[row.user_id]["expiring"]
+            if len(items) < top:
+                items.append({"short_code": row.short_code, "expires_at": row.expires_at.strftime("%d.%m.%Y %H:%M")})
+
+        yield list(reports.values())
@@ -3,15 +3,18 @@ from fastapi.security import OAuth2PasswordBearer
 from starlette import status
 
 from src.auth.manager import current_active_user
-from src.tasks.tasks import cleanup_expired_links, send_email
 from src.database import User
 
 router = APIRouter(prefix="/report", tags=["report"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/jwt/login")
 
+# Модуль задач (Celery, smtplib, jinja2) импортируется в обработчиках, а не при старте приложения
+
 
 @router.get("/send")
 def send_email_handler():
+    from src.tasks.tasks import send_email
+
     try:
         send_email.apply_async(args=['User'])
     except Exception as e:
@@ -38,5 +41,43 @@ async def trigger_cleanup_links(
             detail="Only admin users can trigger this task"
         )
 
+    from src.tasks.tasks import cleanup_expired_links
+
     cleanup_expired_links.delay()
     return {"message": "Cleanup task started"}
+
+
+@router.post("/weekly")
+async def trigger_weekly_reports(
+        token: str = Depends(oauth2_scheme),
+        user: User = Depends(current_active_user),
+):
+    """Рассылка еженедельных отчётов по ссылкам всем пользователям"""
+    if not user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can trigger this task"
+        )
+
+    from src.tasks.tasks import send_weekly_reports
+
+    send_weekly_reports.delay()
+    return {"message": "Weekly reports task started"}
+
+
+@router.post("/redirect-snapshot")
+async def trigger_redirect_snapshot(
+        token: str = Depends(oauth2_scheme),
+        user: User = Depends(current_active_user),
+):
+    """Выгрузка снимка редиректов для режима чтения (src/snapshot_app.py)"""
+    if not user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can trigger this task"
+        )
+
+    from src.tasks.tasks import redirect_snapshot
+
+    redirect_snapshot.delay()
+    return {"message": "Redirect snapshot task started"}
@@ -0,0 +1,49 @@
+"""Выгрузка активных ссылок и их алиасов в снимок редиректов (src/shorturl/snapshot.py)"""
+import time
+from pathlib import Path
+from typing import Union
+
+from sqlalchemy import literal_column, select, union_all
+
+from src import sharding
+from src.config import REDIRECT_SNAPSHOT_PATH
+from src.database import Link, LinkAlias, get_engine
+from src.shorturl.redirect_policy import link_policy, redirect_location, to_epoch
+from src.shorturl.snapshot import SnapshotEntry, write_snapshot
+
+links = Link.__table__
+aliases = LinkAlias.__table__
+
+_columns = (links.c.original_url, links.c.expires_at, links.c.redirect_code, links.c.cache_ttl, links.c.click_beacon)
+# Порядок веток UNION ALL не гарантирован (в Postgres они могут перемежаться), поэтому строка
+# помечена via_alias, а основные коды ставятся первыми при сборке: при совпадении с алиасом
+# в снимке остаётся ссылка (write_snapshot оставляет первую запись кода)
+_snapshot_stmt = union_all(
+    select(links.c.short_code.label("code"), *_columns, literal_column("0").label("via_alias"))
+    .where(links.c.is_active.is_(True)),
+    select(aliases.c.short_code.label("code"), *_columns, literal_column("1").label("via_alias"))
+    .join_from(aliases, links, aliases.c.link_id == links.c.id)
+    .where(links.c.is_active.is_(True)),
+)
+
+
+async def export_redirect_snapshot(path: Union[str, Path] = REDIRECT_SNAPSHOT_PATH, engine=None) -> int:
+    """Пишет снимок из БД (без engine при DB_SHARDS - со всех шардов по очереди), возвращает число кодов.
+    Ссылки с истёкшим сроком не попадают в снимок"""
+    if engine is None and sharding.shard_router is not None:
+        engines = list(sharding.shard_router.engines.values())
+    else:
+        engines = [engine or get_engine()]
+    now = time.time()
+    entries, alias_entries = [], []
+    for source in engines:
+        async with source.connect() as conn:
+            result = await conn.stream(_snapshot_stmt)
+            async for row in result:
+                expires = to_epoch(row.expires_at) if row.expires_at is not None else 0
+                if expires and expires <= now:
+                    continue
+                policy = link_policy(row.redirect_code, row.cache_ttl, row.expires_at, row.click_beacon)
+                entry = SnapshotEntry(row.code, redirect_location(row.original_url), policy, expires)
+                (alias_entries if row.via_alias else entries).append(entry)
+    return write_snapshot(path, entries + alias_entries, created_at=int(now))
@@ -1,44 +1,88 @@
-import smtplib
-from email.message import EmailMessage
 from celery import Celery
-from src.config import SMTP_PASSWORD, SMTP_USER, DEFAULT_UNUSED_LINK_DAYS
-from src.database import async_session_maker, Link
+from celery.signals import worker_process_init, worker_process_shutdown
+from src.config import SMTP_BATCH_SIZE, SMTP_USER, DEFAULT_UNUSED_LINK_DAYS, REDIRECT_SNAPSHOT_INTERVAL
+from src.database import async_session_maker, get_engine, Link
 from datetime import datetime, timedelta
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.metrics import instrument_celery
+from src.tasks.email import deliver, render_email, smtp_pool
+from src.tasks.report import iter_weekly_reports
+from src.shorturl.project_stats import link_removed
+from src.redis_client import celery_broker_options
+from src.cache import link_tag, link_tags
+from src.shorturl.aliases import drop_link_aliases
+from src.outbox import LINK_EXPIRED, add_event
+from src.sharding import commit_link, init_shards, link_engines
+from src.tasks.snapshot import export_redirect_snapshot
 
 
-SMTP_HOST = "smtp.gmail.com"
-SMTP_PORT = 465
+celery = Celery('tasks', **celery_broker_options())
+instrument_celery()
+if REDIRECT_SNAPSHOT_INTERVAL > 0:
+    celery.conf.beat_schedule = {
+        'redirect-snapshot': {'task': 'src.tasks.tasks.redirect_snapshot', 'schedule': REDIRECT_SNAPSHOT_INTERVAL},
+    }
 
 
-celery = Celery(
-    'tasks',
-    broker='redis://redis_app:5370/0'
-)
+@worker_process_init.connect
+@worker_process_shutdown.connect
+def _reset_smtp_pool(**kwargs):
+    """SMTP-соединения не должны переживать fork и остановку воркера"""
+    smtp_pool.close_all()
+
 
 def get_template_email(username: str):
-    email = EmailMessage()
-    email['Subject'] = 'Привет'
-    email['From'] = SMTP_USER
-    email['To'] = SMTP_USER
-    email.set_content(
-        '<div>'
-        f'<h1 style="color: red;">Здравствуйте, {username}</h1>'
-        '</div>',
-        subtype='html'
-    )
-    return email
+    return render_email('greeting.html', SMTP_USER, 'Привет', username=username)
 
 
 @celery.task(default_retry_delay=5, max_retries=3)
 def send_email(username: str):
     email = get_template_email(username)
-    with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-        print(server.login(SMTP_USER, SMTP_PASSWORD))
-        try:
-            server.send_message(email)
-        except:
-            send_email.retry()
+    if deliver([email]):
+        send_email.retry()
+
+
+@celery.task(bind=True, default_retry_delay=30, max_retries=3)
+def send_email_batch(self, recipients: list[dict], template: str, subject: str):
+    """Рассылка пачки писем в одной SMTP-сессии.
+
+    recipients - список {"to": адрес, **контекст шаблона}; повторяется только часть с временными
+    ошибками, окончательно отклонённые адреса отбрасываются (deliver пишет их в лог).
+    """
+    messages = [render_email(template, subject=subject, **r) for r in recipients]
+    failed = {message['To'] for message in deliver(messages)}
+    if failed:
+        raise self.retry(args=[[r for r in recipients if r['to'] in failed], template, subject])
+    return len(recipients)
+
+
+def enqueue_email_batches(recipients: list[dict], template: str, subject: str,
+                          batch_size: int = SMTP_BATCH_SIZE) -> int:
+    """Разбивает рассылку на задачи по batch_size писем, возвращает число задач"""
+    batches = 0
+    for start in range(0, len(recipients), batch_size):
+        send_email_batch.delay(recipients[start:start + batch_size], template, subject)
+        batches += 1
+    return batches
+
+
+async def async_send_weekly_reports():
+    """Считает отчёты агрегатными запросами и ставит письма в очередь пачками"""
+    batches = reports = 0
+    get_engine()
+    async with async_session_maker() as db:
+        async for chunk in iter_weekly_reports(db):
+            batches += enqueue_email_batches(chunk, 'weekly_report.html', 'Еженедельный отчёт по ссылкам')
+            reports += len(chunk)
+    return f"Queued {reports} reports in {batches} batches"
+
+
+@celery.task
+def send_weekly_reports():
+    """Celery задача еженедельного отчёта по ссылкам"""
+    import asyncio
+    return asyncio.get_event_loop().run_until_complete(async_send_weekly_reports())
 
 
 def sync_cleanup_expired_links():
@@ -46,28 +90,45 @@ def sync_cleanup_expired_links():
     import asyncio
     return asyncio.get_event_loop().run_until_complete(async_cleanup_expired_links())
 
-async def async_cleanup_expired_links():
-    """Асинхронная реализация очистки просроченных ссылок"""
-    async with async_session_maker() as db:
-        try:
-            # Получаем просроченные ссылки
-            expired_links = await db.execute(
-                select(Link).where(
-                    (Link.expires_at <= datetime.now()) |
-                    (
-                        (Link.last_clicked_at <= datetime.now() - timedelta(days=DEFAULT_UNUSED_LINK_DAYS)) &
-                        (Link.clicks == 0)
-                    )
-                )
+async def _cleanup_expired(link_db, db) -> int:
+    """Удаляет просроченные ссылки из link_db (основная БД или шард), счётчики проектов - в db"""
+    # Получаем просроченные ссылки
+    expired_links = await link_db.execute(
+        select(Link).where(
+            (Link.expires_at <= datetime.now()) |
+            (
+                (Link.last_clicked_at <= datetime.now() - timedelta(days=DEFAULT_UNUSED_LINK_DAYS)) &
+                (Link.clicks == 0)
             )
-            expired_links = expired_links.scalars().all()
+        )
+    )
+    expired_links = expired_links.scalars().all()
+
+    # Удаляем найденные ссылки; кэш сбросит ретранслятор outbox в API
+    aliases = await drop_link_aliases(link_db, [link.id for link in expired_links])
+    for link in expired_links:
+        add_event(link_db, LINK_EXPIRED, link, [*link_tags(link), *map(link_tag, aliases.get(link.id, ()))])
+        await link_removed(db, link, expired=True)
+        await link_db.delete(link)
+
+    await commit_link(link_db, db)
+    return len(expired_links)
 
-            # Удаляем найденные ссылки
-            for link in expired_links:
-                await db.delete(link)
 
-            await db.commit()
-            return f"Deleted {len(expired_links)} expired/unused links"
+async def async_cleanup_expired_links():
+    """Асинхронная реализация очистки просроченных ссылок (при DB_SHARDS - на каждом шарде)"""
+    engine = get_engine()
+    router = init_shards()
+    async with async_session_maker() as db:
+        try:
+            if router is None:
+                deleted = await _cleanup_expired(db, db)
+            else:
+                deleted = 0
+                for shard in link_engines(engine):
+                    async with AsyncSession(shard, expire_on_commit=False) as link_db:
+                        deleted += await _cleanup_expired(link_db, db)
+            return f"Deleted {deleted} expired/unused links"
         except Exception as e:
             await db.rollback()
             raise e
@@ -76,3 +137,12 @@ async def async_cleanup_expired_links():
 def cleanup_expired_links():
     """Celery задача для очистки просроченных ссылок"""
     return sync_cleanup_expired_links()
+
+
+@celery.task
+def redirect_snapshot():
+    """Celery задача выгрузки снимка редиректов для режима чтения"""
+    import asyncio
+    init_shards()
+    count = asyncio.get_event_loop().run_until_complete(export_redirect_snapshot())
+    return f"Exported {count} redirects to snapshot"
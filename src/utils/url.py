@@ -0,0 +1,31 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """Одинаковые по смыслу URL - одна строка: схема и хост в нижнем регистре,
+    без порта по умолчанию, пустой путь - "/". Путь, запрос и фрагмент не меняются.
+    Неразбираемый URL возвращается как есть (без пробелов по краям)"""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    netloc = f"[{host}]" if ":" in host else host
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username + (f":{parts.password}" if parts.password is not None else "")
+        netloc = f"{userinfo}@{netloc}"
+    path = parts.path or ("/" if netloc else "")
+    return urlunsplit((scheme, netloc, path, parts.query, parts.fragment))
+
+
+def url_hash(url: str) -> bytes:
+    """SHA-256 канонического URL (32 байта) для индекса (user_id, url_hash)"""
+    return hashlib.sha256(canonicalize_url(url).encode()).digest()
@@ -0,0 +1,7 @@
+from uvicorn.workers import UvicornWorker
+
+
+class TunedUvicornWorker(UvicornWorker):
+    """Воркер профиля production: uvloop и httptools без тихого отката на asyncio/h11
+    (если пакеты не установлены, воркер не стартует)"""
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
@@ -0,0 +1,10 @@
+"""
+Бенчмарки горячих путей API (редирект, сокращение, статистика, поиск).
+
+Приложение `src.main:app` запускается в том же процессе через ASGI,
+без внешних сервисов: SQLite + fakeredis по умолчанию, Postgres/Redis опционально.
+
+Запуск:
+    python -m tests.benchmark --size 10000 --requests 2000 --save
+    python -m tests.benchmark --compare tests/benchmark/results/<commit>.json
+"""
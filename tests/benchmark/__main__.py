@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from tests.benchmark.report import (
+    build_report, compare_reports, format_comparison, format_results, load_report, save_report,
+)
+
+SCENARIOS = ("redirect_hot", "redirect_cold", "redirect_miss", "shorten", "shorten_batch", "stats", "search")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmark", description="Бенчмарк горячих путей API")
+    parser.add_argument("--profile", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument("--db-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help="URL БД для профиля postgres (postgresql+asyncpg://...)")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL"),
+                        help="Настоящий Redis вместо fakeredis")
+    parser.add_argument("--size", type=int, default=1000, help="Количество ссылок в наборе данных")
+    parser.add_argument("--requests", type=int, default=500, help="Запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=20, help="Размер пачки для shorten_batch")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, dest="scenarios",
+                        help="Запустить только указанные сценарии (можно повторять)")
+    parser.add_argument("--save", nargs="?", const="", default=None,
+                        help="Сохранить JSON-бейзлайн (без пути - tests/benchmark/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Сравнить с сохранённым бейзлайном")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Допустимое ухудшение метрики (доля)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.profile == "postgres" and not args.db_url:
+        print("Профиль postgres требует --db-url или BENCH_DATABASE_URL", file=sys.stderr)
+        return 2
+
+    from tests.benchmark.harness import run_benchmark
+
+    results = asyncio.run(run_benchmark(
+        size=args.size,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        scenarios=args.scenarios,
+        db_url=args.db_url if args.profile == "postgres" else None,
+        redis_url=args.redis_url,
+        batch_size=args.batch_size,
+    ))
+    report = build_report(
+        results,
+        profile=args.profile,
+        size=args.size,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        redis="redis" if args.redis_url else "fakeredis",
+    )
+    print(format_results(results))
+
+    if args.save is not None:
+        path = save_report(report, Path(args.save) if args.save else None)
+        print(f"\nБейзлайн сохранён: {path}")
+
+    if args.compare:
+        rows = compare_reports(load_report(args.compare), report, args.threshold)
+        print(f"\nСравнение с {args.compare}:")
+        print(format_comparison(rows))
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import asyncio
+import os
+import secrets
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+os.environ.setdefault("TESTING", "1")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from fastapi_cache import FastAPICache
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from src.cache import TaggingRedisBackend
+from src.database import Base, Link, Project, ProjectStats, User, get_async_session
+from src.shorturl.project_stats import rebuild_project_stats
+from src.main import app
+from tests.benchmark.report import summarize
+
+BENCH_PASSWORD = "BenchPass123!"
+PROJECTS = 20
+DOMAINS = ("example.com", "docs.example.org", "shop.example.net", "news.example.io")
+HOT_SET = 10
+INSERT_CHUNK = 1000
+
+
+@dataclass
+class Scenario:
+    name: str
+    # Строит запрос по номеру итерации: (method, url, kwargs)
+    build: Callable[[int], tuple[str, str, dict]]
+    expected: tuple[int, ...]
+    setup: Optional[Callable[[], Awaitable[None]]] = None
+    warmup: bool = True
+    batch: int = 1
+
+
+class BenchEnv:
+    """Приложение в процессе: своя БД, кэш на fakeredis (или Redis) и авторизованный пользователь"""
+
+    def __init__(self, db_url: Optional[str] = None, redis_url: Optional[str] = None):
+        self._tmpdir = None
+        if db_url is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="shorturl-bench-")
+            db_url = f"sqlite+aiosqlite:///{Path(self._tmpdir.name) / 'bench.db'}"
+        self.db_url = db_url
+        self.redis_url = redis_url
+        self.run_id = secrets.token_hex(3)
+        self.engine: Optional[AsyncEngine] = None
+        self.client: Optional[AsyncClient] = None
+        self.headers: dict = {}
+        self.user_id = None
+        self.codes: list[str] = []
+
+    async def __aenter__(self) -> "BenchEnv":
+        self.engine = create_async_engine(self.db_url)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        session_maker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        async def override_get_db():
+            async with session_maker() as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = override_get_db
+        app.state.engine = self.engine
+
+        if self.redis_url:
+            from redis import asyncio as aioredis
+            redis = aioredis.from_url(self.redis_url)
+        else:
+            from fakeredis import aioredis as fake_aioredis
+            redis = fake_aioredis.FakeRedis()
+        FastAPICache.reset()
+        FastAPICache.init(TaggingRedisBackend(redis), prefix="fastapi-cache")
+        app.state.redis = redis
+
+        self.client = AsyncClient(
+            transport=ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench"
+        )
+        await self._login()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(Link).where(Link.user_id == self.user_id))
+            await conn.execute(delete(ProjectStats).where(ProjectStats.project_id.in_(
+                select(Project.id).where(Project.user_id == self.user_id)
+            )))
+            await conn.execute(delete(Project).where(Project.user_id == self.user_id))
+            await conn.execute(delete(User).where(User.id == self.user_id))
+        await self.client.aclose()
+        await app.state.redis.flushdb()
+        await app.state.redis.close()
+        await self.engine.dispose()
+        app.dependency_overrides.clear()
+        app.state.engine = None
+        FastAPICache.reset()
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+
+    async def _login(self) -> None:
+        email = f"bench-{self.run_id}@example.com"
+        reg = await self.client.post("/auth/register", json={
+            "email": email,
+            "username": f"bench-{self.run_id}",
+            "password": BENCH_PASSWORD,
+        })
+        reg.raise_for_status()
+        self.user_id = reg.json()["id"]
+        login = await self.client.post("/auth/jwt/login", data={"username": email, "password": BENCH_PASSWORD})
+        login.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    async def seed(self, size: int) -> None:
+        """Массовая вставка size ссылок текущего пользователя"""
+        import uuid
+        user_id = uuid.UUID(self.user_id)
+        self.codes = [f"b{self.run_id}{i:x}" for i in range(size)]
+        project_ids = [uuid.uuid4() for _ in range(PROJECTS)]
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(Project), [
+                {"id": project_id, "user_id": user_id, "name": f"project{i}"} for i, project_id in enumerate(project_ids)
+            ])
+            for start in range(0, size, INSERT_CHUNK):
+                rows = [
+                    {
+                        "id": uuid.uuid4(),
+                        "original_url": f"https://{DOMAINS[i % len(DOMAINS)]}/page/{i}",
+                        "short_code": self.codes[i],
+                        "user_id": user_id,
+                        "project": f"project{i % PROJECTS}",
+                        "project_id": project_ids[i % PROJECTS],
+                        "is_active": True,
+                        "is_custom": False,
+                        "clicks": 0,
+                    }
+                    for i in range(start, min(start + INSERT_CHUNK, size))
+                ]
+                await conn.execute(insert(Link), rows)
+            await rebuild_project_stats(conn, user_id)
+
+
+def build_scenarios(env: BenchEnv, batch_size: int = 20) -> list[Scenario]:
+    codes = env.codes
+    size = len(codes)
+    auth = {"headers": env.headers}
+    shorten_counter = iter(range(10 ** 9))
+
+    async def clear_cache():
+        # FastAPICache.clear() использует EVAL, которого нет в fakeredis
+        await app.state.redis.flushdb()
+
+    async def warm_hot_set():
+        for code in codes[:HOT_SET]:
+            await env.client.get(f"/links/{code}")
+
+    def shorten(i):
+        n = next(shorten_counter)
+        return "POST", "/links/shorten", {
+            "json": {"original_url": f"https://{DOMAINS[n % len(DOMAINS)]}/new/{env.run_id}/{n}", "username": "bench"},
+            **auth,
+        }
+
+    return [
+        Scenario(
+            "redirect_hot",
+            lambda i: ("GET", f"/links/{codes[i % HOT_SET]}", {}),
+            expected=(307,),
+            setup=warm_hot_set,
+        ),
+        Scenario(
+            "redirect_cold",
+            lambda i: ("GET", f"/links/{codes[(HOT_SET + i) % size]}", {}),
+            expected=(307,),
+            setup=clear_cache,
+            warmup=False,
+        ),
+        Scenario(
+            "redirect_miss",
+            lambda i: ("GET", f"/links/missing{env.run_id}{i}", {}),
+            expected=(404,),
+        ),
+        Scenario("shorten", shorten, expected=(201,)),
+        Scenario("shorten_batch", shorten, expected=(201,), batch=batch_size),
+        Scenario(
+            "stats",
+            lambda i: ("GET", f"/links/{codes[i % size]}/stats", auth),
+            expected=(200,),
+        ),
+        Scenario(
+            "search",
+            lambda i: ("GET", "/links/search", {"params": {"original_url": f"{DOMAINS[i % len(DOMAINS)]}/page/{i % size}"}, **auth}),
+            expected=(200,),
+        ),
+    ]
+
+
+async def _send(client: AsyncClient, scenario: Scenario, i: int) -> int:
+    method, url, kwargs = scenario.build(i)
+    response = await client.request(method, url, **kwargs)
+    return response.status_code
+
+
+async def run_scenario(env: BenchEnv, scenario: Scenario, requests: int, concurrency: int, warmup: int = 20) -> dict:
+    """Выполняет requests выборок с заданной конкурентностью и возвращает сводку"""
+    if scenario.setup is not None:
+        await scenario.setup()
+    if scenario.warmup:
+        for i in range(warmup):
+            await _send(env.client, scenario, i)
+
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            if scenario.batch > 1:
+                statuses = await asyncio.gather(
+                    *(_send(env.client, scenario, i * scenario.batch + j) for j in range(scenario.batch))
+                )
+            else:
+                statuses = [await _send(env.client, scenario, i)]
+            latencies.append(time.perf_counter() - start)
+            errors += sum(status not in scenario.expected for status in statuses)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(latencies, elapsed, errors, items=len(latencies) * scenario.batch)
+    if scenario.batch > 1:
+        stats["batch"] = scenario.batch
+    return stats
+
+
+async def run_benchmark(
+    size: int,
+    requests: int,
+    concurrency: int,
+    scenarios: Optional[list[str]] = None,
+    db_url: Optional[str] = None,
+    redis_url: Optional[str] = None,
+    batch_size: int = 20,
+) -> dict:
+    results = {}
+    async with BenchEnv(db_url=db_url, redis_url=redis_url) as env:
+        await env.seed(size)
+        for scenario in build_scenarios(env, batch_size=batch_size):
+            if scenarios and scenario.name not in scenarios:
+                continue
+            sample_count = max(1, requests // scenario.batch)
+            results[scenario.name] = await run_scenario(env, scenario, sample_count, concurrency)
+    return results
@@ -0,0 +1,141 @@
+"""Память Redis под кэш горячего набора редиректов в трёх форматах:
+
+- response - ответ RedirectResponse, сериализованный @cache (прежний медленный маршрут);
+- location - строка Location на отдельном ключе (прежний быстрый путь);
+- packed - компактные записи в хэшах-корзинах (src/shorturl/redirect_cache.py).
+
+    python -m tests.benchmark.memory --size 100000 --redis-url redis://localhost:6379/15
+
+С настоящим Redis считается прирост used_memory, то есть вместе со служебными структурами.
+Без --redis-url (fakeredis) - только байты ключей и значений: экономия на ~50-70 байтах
+служебных структур на каждый ключ, которую дают корзины, так не видна.
+Внимание: база Redis очищается (FLUSHDB).
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+from typing import Optional
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.coder import JsonCoder
+from starlette.responses import RedirectResponse
+
+from src.cache import TaggingRedisBackend, redirect_bucket_key, redirect_cache_key
+from src.shorturl.redirect_cache import REDIRECT_CACHE_EXPIRE, pack
+
+FORMATS = ("response", "location", "packed")
+URL_BASES = (
+    "https://example.com/",
+    "https://www.youtube.com/watch?v=",
+    "https://github.com/",
+    "https://docs.google.com/document/d/",
+    "https://news.example.org/",
+    "http://www.shop.example.ru/catalog/",
+)
+
+
+def hot_set(size: int, seed: int = 0) -> list[tuple[str, str]]:
+    """(код, Location) - коды как у generate_short_code, пути случайной длины"""
+    rnd = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits
+    return [
+        (
+            "".join(rnd.choices(alphabet, k=6)),
+            rnd.choice(URL_BASES) + "".join(rnd.choices(alphabet + "/-_", k=rnd.randint(8, 90))),
+        )
+        for _ in range(size)
+    ]
+
+
+async def _write(redis, fmt: str, links: list[tuple[str, str]], chunk: int = 1000) -> None:
+    expires = int(time.time()) + REDIRECT_CACHE_EXPIRE
+    for start in range(0, len(links), chunk):
+        async with redis.pipeline(transaction=False) as pipe:
+            for code, location in links[start:start + chunk]:
+                if fmt == "response":
+                    value = JsonCoder.encode(RedirectResponse(location))
+                    pipe.set(f"{FastAPICache.get_prefix()}:redirect-route:{code}", value, ex=REDIRECT_CACHE_EXPIRE)
+                elif fmt == "location":
+                    pipe.set(redirect_cache_key(code), location.encode(), ex=REDIRECT_CACHE_EXPIRE)
+                else:
+                    bucket = redirect_bucket_key(code)
+                    pipe.hset(bucket, code, pack(location, expires))
+                    pipe.expire(bucket, REDIRECT_CACHE_EXPIRE)
+            await pipe.execute()
+
+
+async def _payload_bytes(redis) -> tuple[int, int]:
+    keys = total = 0
+    async for key in redis.scan_iter():
+        keys += 1
+        total += len(key)
+        if await redis.type(key) == b"hash":
+            total += sum(len(field) + len(value) for field, value in (await redis.hgetall(key)).items())
+        else:
+            total += len(await redis.get(key))
+    return keys, total
+
+
+async def _used_memory(redis) -> int:
+    return (await redis.info("memory"))["used_memory"]
+
+
+async def measure_formats(redis, size: int, real_redis: bool = False) -> dict:
+    """{формат: {keys, bytes, per_link}} для горячего набора из size ссылок"""
+    links = hot_set(size)
+    results = {}
+    for fmt in FORMATS:
+        await redis.flushdb()
+        before = await _used_memory(redis) if real_redis else 0
+        await _write(redis, fmt, links)
+        keys, payload = await _payload_bytes(redis)
+        used = await _used_memory(redis) - before if real_redis else payload
+        results[fmt] = {"keys": keys, "bytes": used, "per_link": used / size}
+    await redis.flushdb()
+    return results
+
+
+def format_memory(results: dict) -> str:
+    base = results["response"]["bytes"]
+    header = f"{'format':<12}{'keys':>9}{'bytes':>14}{'B/link':>10}{'share':>9}"
+    lines = [header, "-" * len(header)]
+    for fmt, s in results.items():
+        lines.append(f"{fmt:<12}{s['keys']:>9}{s['bytes']:>14}{s['per_link']:>10.1f}{s['bytes'] / base:>9.0%}")
+    return "\n".join(lines)
+
+
+async def run(size: int, redis_url: Optional[str]) -> dict:
+    if redis_url:
+        from redis import asyncio as aioredis
+        redis = aioredis.from_url(redis_url)
+    else:
+        from fakeredis import aioredis as fake_aioredis
+        redis = fake_aioredis.FakeRedis()
+    FastAPICache.reset()
+    FastAPICache.init(TaggingRedisBackend(redis), prefix="fastapi-cache")
+    try:
+        return await measure_formats(redis, size, real_redis=bool(redis_url))
+    finally:
+        FastAPICache.reset()
+        await redis.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmark.memory",
+                                     description="Память Redis под кэш редиректов")
+    parser.add_argument("--size", type=int, default=100000, help="Ссылок в горячем наборе")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL"),
+                        help="Настоящий Redis (база будет очищена); без него - fakeredis")
+    args = parser.parse_args(argv)
+    results = asyncio.run(run(args.size, args.redis_url))
+    print("used_memory" if args.redis_url else "fakeredis: только байты ключей и значений")
+    print(format_memory(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import json
+import math
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Метрики, по которым сравниваются прогоны, и "хорошее" направление изменения
+COMPARED_METRICS = {
+    "p50_ms": "lower",
+    "p95_ms": "lower",
+    "p99_ms": "lower",
+    "rps": "higher",
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Перцентиль по методу ближайшего ранга"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0, items: Optional[int] = None) -> dict:
+    """Сводка по одному сценарию. Задержки в секундах, результат в миллисекундах.
+
+    items - число обработанных запросов, если одна выборка покрывает несколько (пакетные сценарии)
+    """
+    count = len(latencies)
+    items = count if items is None else items
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "rps": round(items / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_report(results: dict, **meta) -> dict:
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **meta,
+        },
+        "results": results,
+    }
+
+
+def save_report(report: dict, path: Optional[Path] = None) -> Path:
+    """Сохраняет JSON-бейзлайн (по умолчанию results/<commit>.json)"""
+    if path is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{report['meta']['commit']}.json"
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    return path
+
+
+def load_report(path: Path) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 0.1) -> list[dict]:
+    """Сравнивает два прогона. Регрессия - ухудшение метрики больше чем на threshold"""
+    rows = []
+    for scenario, current_stats in current["results"].items():
+        base_stats = baseline["results"].get(scenario)
+        if base_stats is None:
+            continue
+        for metric, better in COMPARED_METRICS.items():
+            old, new = base_stats[metric], current_stats[metric]
+            change = (new - old) / old if old else 0.0
+            worse = change > threshold if better == "lower" else change < -threshold
+            rows.append({
+                "scenario": scenario,
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change": round(change, 4),
+                "regression": worse,
+            })
+    return rows
+
+
+def format_results(results: dict) -> str:
+    header = f"{'scenario':<16}{'reqs':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+    lines = [header, "-" * len(header)]
+    for name, s in results.items():
+        lines.append(
+            f"{name:<16}{s['requests']:>7}{s['errors']:>6}"
+            f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['rps']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(rows: list[dict]) -> str:
+    lines = []
+    for row in rows:
+        mark = "REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['scenario']:<16}{row['metric']:<8}{row['baseline']:>10}{row['current']:>10}"
+            f"{row['change'] * 100:>+9.1f}%  {mark}"
+        )
+    return "\n".join(lines)
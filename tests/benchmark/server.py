@@ -0,0 +1,155 @@
+"""Сравнение профилей сервера (src/server.py): gunicorn с каждым профилем на свободном порту
+и одинаковая нагрузка по HTTP.
+
+    python -m tests.benchmark.server --profiles default production --requests 20000 --concurrency 64
+    python -m tests.benchmark.server --profiles production --workers 2 --path /links/missing
+
+По умолчанию запрашивается /unprotected-route - без БД и Redis, измеряется сам сервер
+(цикл событий, HTTP-парсер, число воркеров). Для каждого профиля печатаются p50/p95/p99,
+req/s, req/s на воркер и суммарная PSS-память мастера и воркеров (Linux): с --preload
+общие страницы делятся между процессами и PSS меньше. Нужны gunicorn, uvloop и httptools.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from src.server import server_profile
+from tests.benchmark.report import summarize
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(profile: str, port: int, workers: Optional[int] = None) -> subprocess.Popen:
+    env = dict(os.environ, SERVER_PROFILE=profile, PYTHONWARNINGS="ignore")
+    env.setdefault("TESTING", "1")
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    if workers:
+        env["WEB_WORKERS"] = str(workers)
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "src.main:app", "--config", "python:src.gunicorn_conf",
+         "--bind", f"127.0.0.1:{port}"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start in time")
+
+
+def _children(pid: int) -> list[int]:
+    children = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            children += [int(child) for child in (task / "children").read_text().split()]
+        except OSError:
+            pass
+    return children
+
+
+def process_tree_pss(pid: int) -> Optional[int]:
+    """Суммарная PSS процесса и его потомков в байтах (None вне Linux)"""
+    total = 0
+    for process in [pid, *_children(pid)]:
+        try:
+            rollup = Path(f"/proc/{process}/smaps_rollup").read_text()
+        except OSError:
+            return None
+        for line in rollup.splitlines():
+            if line.startswith("Pss:"):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+async def run_load(url: str, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    queue = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=10.0) as client:
+        async def worker():
+            nonlocal errors
+            for _ in queue:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(url)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, errors)
+
+
+def benchmark_profile(profile: str, path: str, requests: int, concurrency: int, workers: Optional[int]) -> dict:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    process = start_server(profile, port, workers)
+    try:
+        wait_ready(url, process)
+        # Прогрев: соединения и ленивые импорты в каждом воркере
+        asyncio.run(run_load(url, min(requests, 1000), concurrency))
+        result = asyncio.run(run_load(url, requests, concurrency))
+        result["pss_mb"] = round((process_tree_pss(process.pid) or 0) / 2**20, 1)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    result["workers"] = workers or server_profile(profile).workers
+    result["rps_per_worker"] = round(result["rps"] / result["workers"], 1)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmark.server",
+                                     description="Сравнение профилей gunicorn/uvicorn под одинаковой нагрузкой")
+    parser.add_argument("--profiles", nargs="+", default=["default", "production"])
+    parser.add_argument("--path", default="/unprotected-route")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, help="одинаковое число воркеров для всех профилей")
+    parser.add_argument("--json", type=Path, help="сохранить результаты в файл")
+    args = parser.parse_args(argv)
+
+    results = {
+        profile: benchmark_profile(profile, args.path, args.requests, args.concurrency, args.workers)
+        for profile in args.profiles
+    }
+    print(f"{'profile':<12} {'workers':>7} {'rps':>9} {'rps/worker':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} {'PSS MB':>8}")
+    for profile, r in results.items():
+        print(f"{profile:<12} {r['workers']:>7} {r['rps']:>9} {r['rps_per_worker']:>10} {r['p50_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['errors']:>6} {r['pss_mb']:>8}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
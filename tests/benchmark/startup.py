@@ -0,0 +1,171 @@
+"""Время старта воркера: импорт модуля приложения в чистом процессе, как при запуске gunicorn/uvicorn.
+
+    python -m tests.benchmark.startup --runs 5 --top 15
+    python -m tests.benchmark.startup --update-baseline
+
+Печатает медиану времени импорта и самые тяжёлые модули по данным `python -X importtime`
+(время с учётом вложенных импортов). Время сравнивается не с абсолютным порогом, а с замером,
+сохранённым в startup_baseline.json: делится на время импорта FLOOR_MODULES - зависимостей,
+которые приложение загружает при старте в любом случае (fastapi-users тянет bcrypt и остаётся
+большей частью времени), так что отношение почти не зависит от скорости машины.
+Завершается с кодом 1, если отношение выросло больше чем в --tolerance раз относительно
+сохранённого, или при импорте подтянулись модули, которые должны загружаться лениво (LAZY_MODULES).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+APP_MODULE = "src.main"
+# Сохранённый замер (--update-baseline) и допустимый рост отношения приложение/зависимости
+BASELINE_FILE = Path(__file__).with_name("startup_baseline.json")
+STARTUP_TOLERANCE = 1.2
+# Нижняя граница: без них приложение не стартует, их время не зависит от нашего кода
+FLOOR_MODULES = ("fastapi", "sqlalchemy.ext.asyncio", "fastapi_users", "fastapi_cache", "redis.asyncio")
+# Нужны только задачам и их обработчикам, не обслуживанию запросов
+LAZY_MODULES = ("celery", "kombu", "smtplib")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+from src import database
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [name for name in {lazy!r} if name in sys.modules],
+    "engine": database.engine is not None,
+}}))
+"""
+
+_FLOOR_PROBE = """
+import time
+started = time.perf_counter()
+import {modules}
+print(time.perf_counter() - started)
+"""
+
+
+@dataclass
+class ImportEntry:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass
+class BootSample:
+    elapsed: float
+    loaded: list[str]
+    engine: bool
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("TESTING", "1")
+    env["PYTHONWARNINGS"] = "ignore"
+    return env
+
+
+def parse_importtime(stderr: str) -> list[ImportEntry]:
+    """Строки вида "import time:  self [us] | cumulative | module" из вывода -X importtime"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        entries.append(ImportEntry(parts[2].strip(), int(parts[0]), int(parts[1])))
+    return entries
+
+
+def import_profile(module: str = APP_MODULE) -> list[ImportEntry]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), cwd=ROOT, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def boot_sample(module: str = APP_MODULE) -> BootSample:
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+        capture_output=True, text=True, env=_env(), cwd=ROOT, check=True,
+    )
+    return BootSample(**json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def boot_time(module: str = APP_MODULE, runs: int = 3) -> tuple[float, BootSample]:
+    """Медиана времени импорта по runs процессам и последний замер"""
+    samples = [boot_sample(module) for _ in range(runs)]
+    return statistics.median(s.elapsed for s in samples), samples[-1]
+
+
+def floor_time(runs: int = 3) -> float:
+    """Медиана времени импорта FLOOR_MODULES в чистом процессе"""
+    def sample() -> float:
+        result = subprocess.run(
+            [sys.executable, "-c", _FLOOR_PROBE.format(modules=", ".join(FLOOR_MODULES))],
+            capture_output=True, text=True, env=_env(), cwd=ROOT, check=True,
+        )
+        return float(result.stdout.strip().splitlines()[-1])
+
+    return statistics.median(sample() for _ in range(runs))
+
+
+def load_baseline() -> dict:
+    return json.loads(BASELINE_FILE.read_text())
+
+
+def startup_ratio(module: str = APP_MODULE, runs: int = 3) -> tuple[float, float, float, BootSample]:
+    """(отношение, время приложения, время зависимостей, последний замер приложения)"""
+    median, sample = boot_time(module, runs)
+    floor = floor_time(runs)
+    return median / floor, median, floor, sample
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmark.startup",
+                                     description="Время импорта приложения и самые тяжёлые модули")
+    parser.add_argument("--module", default=APP_MODULE)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--tolerance", type=float, default=STARTUP_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="сохранить замер как новую точку отсчёта")
+    args = parser.parse_args(argv)
+
+    ratio, median, floor, sample = startup_ratio(args.module, args.runs)
+    if args.update_baseline:
+        BASELINE_FILE.write_text(json.dumps(
+            {"module": args.module, "app": round(median, 3), "floor": round(floor, 3), "ratio": round(ratio, 3)}, indent=2,
+        ) + "\n")
+    baseline = load_baseline()
+    limit = baseline["ratio"] * args.tolerance
+    entries = import_profile(args.module)
+    print(f"{args.module}: median {median * 1000:.0f} ms over {args.runs} runs, dependencies {floor * 1000:.0f} ms")
+    print(f"ratio {ratio:.2f} (baseline {baseline['ratio']:.2f}, limit {limit:.2f})")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for entry in sorted(entries, key=lambda e: e.cumulative_us, reverse=True)[:args.top]:
+        print(f"{entry.cumulative_us / 1000:14.1f} {entry.self_us / 1000:9.1f}  {entry.module}")
+
+    failed = False
+    if ratio > limit:
+        print(f"Startup regressed: {ratio:.2f} > {limit:.2f} x dependency import time")
+        failed = True
+    if sample.loaded:
+        print(f"Lazy modules imported at startup: {', '.join(sample.loaded)}")
+        failed = True
+    if sample.engine:
+        print("Database engine created at import time")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
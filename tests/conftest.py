@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+
+import pytest
+
+from src.profiling import profile_queries
+
+
+@pytest.fixture
+def query_budget():
+    """Бюджет SQL-запросов на блок кода:
+
+        with query_budget(2):
+            await client.get("/links/abc/stats")
+    """
+    @contextmanager
+    def budget(max_queries: int, allow_n_plus_one: bool = False):
+        with profile_queries() as profile:
+            yield profile
+        assert profile.count <= max_queries, f"Query budget exceeded ({max_queries}):\n{profile.report()}"
+        if not allow_n_plus_one:
+            assert not profile.n_plus_one, f"Possible N+1:\n{profile.report()}"
+
+    return budget
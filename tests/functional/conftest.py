@@ -1,11 +1,14 @@
 import os
+import uuid
+
 import pytest
 import pytest_asyncio
-from httpx import AsyncClient
+from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.pool import NullPool
 
-from src.database import Base, get_async_session
+from src.auth import auth
+from src.database import Base, Link, User, get_async_session
 from src.main import app
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.inmemory import InMemoryBackend
@@ -13,22 +16,19 @@ from fastapi_cache.backends.inmemory import InMemoryBackend
 
 os.environ["TESTING"] = "1"
 
-TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
-
 
-@pytest.fixture(scope="session")
-def event_loop():
-    import asyncio
-    loop = asyncio.new_event_loop()
-    yield loop
-    loop.close()
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch):
+    """Секрет JWT для тестов: без SECRET_KEY в окружении вход падает на подписи токена."""
+    if not auth.SECRET:
+        monkeypatch.setattr(auth, "SECRET", "test-secret")
 
 
-@pytest_asyncio.fixture(scope="session")
-async def test_engine():
-    """Создание тестовой БД."""
+@pytest_asyncio.fixture
+async def test_engine(tmp_path):
+    """Создание тестовой БД: своя на каждый тест, иначе пользователи из прошлых тестов мешают регистрации."""
     engine = create_async_engine(
-        TEST_DATABASE_URL,
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
         poolclass=NullPool,
         echo=False
     )
@@ -38,9 +38,6 @@ async def test_engine():
 
     yield engine
 
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
     await engine.dispose()
 
 
@@ -62,12 +59,15 @@ async def client(test_session: AsyncSession):
         yield test_session
 
     app.dependency_overrides[get_async_session] = override_get_db
+    # Быстрый маршрут редиректа работает с движком напрямую, минуя get_async_session
+    app.state.engine = test_session.bind
     FastAPICache.init(InMemoryBackend())
 
-    async with AsyncClient(app=app, base_url="http://test") as ac:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
         yield ac
 
     app.dependency_overrides.clear()
+    app.state.engine = None
     FastAPICache.reset()
 
 
@@ -122,3 +122,27 @@ async def another_auth_client(client):
 
 
 
+
+
+@pytest_asyncio.fixture
+async def db(test_session):
+    """Сессия для прямых вызовов обработчиков (кэш - в памяти, как у клиента)."""
+    FastAPICache.init(InMemoryBackend())
+    yield test_session
+    FastAPICache.reset()
+
+
+@pytest_asyncio.fixture
+async def user(db):
+    user = User(id=uuid.uuid4(), email="owner@example.com", username="owner", hashed_password="x")
+    db.add(user)
+    await db.commit()
+    return user
+
+
+@pytest_asyncio.fixture
+async def link(db, user):
+    link = Link(short_code="abc123", original_url="https://example.com/", user_id=user.id)
+    db.add(link)
+    await db.commit()
+    return link
\ No newline at end of file
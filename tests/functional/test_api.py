@@ -22,6 +22,14 @@ async def test_nonexistent_redirect(client):
     assert response.status_code == 404
 
 
+@pytest.mark.asyncio
+async def test_redirect_query_budget(client, query_budget):
+    """Редирект выполняет не больше одного SQL-запроса"""
+    with query_budget(1):
+        response = await client.get("/links/missing-budget", follow_redirects=False)
+    assert response.status_code == 404
+
+
 async def test_duplicate_url_creation(auth_client):
     test_data = {
         "original_url": "https://example.com",
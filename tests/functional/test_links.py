@@ -1,9 +1,12 @@
+import orjson
 import pytest
 from datetime import datetime, timedelta
 from fastapi import status, HTTPException
 from requests import Request
 
 from src.database import Link, User, ExpiredLink
+from src.projects.service import get_or_create_project_id
+from src.shorturl.clicks import click_buffer
 from src.shorturl.router import redirect_to_original, create_short_url, get_link_stats, update_link, delete_link, \
     search_links, get_project_links, get_expired_links, create_public_short_url
 from src.shorturl.schemas import LinkResponse, LinkCreate, LinkCodeUpdate, PublicLinkCreate
@@ -244,13 +247,11 @@ async def test_create_short_url_without_custom_alias(db, user):
 
 async def test_redirect_to_original(db, link):
     response = await redirect_to_original(link.short_code, db)
-    assert response.status_code == 302
+    assert response.status_code == 307
     assert response.headers["location"] == link.original_url
 
-    # Проверка счетчика кликов
-    updated_link = await db.get(Link, link.id)
-    assert updated_link.clicks == 1
-    assert updated_link.last_clicked_at is not None
+    # Переход учтён в буфере воркера и попадёт в БД при его сбросе
+    assert click_buffer._counts[link.short_code] == 1
 
 
 async def test_get_link_stats(db, user, link):
@@ -291,33 +292,37 @@ async def test_delete_link(db, user, link, mock_redis):
 
 
 async def test_search_links(db, user):
-    link = Link(original_url="https://example.com/search", user_id=user.id)
+    link = Link(short_code="search", original_url="https://example.com/search", user_id=user.id)
     db.add(link)
     await db.commit()
 
-    response = await search_links("search", db, user)
+    response = orjson.loads((await search_links("search", db, user)).body)
     assert len(response) == 1
-    assert response[0].original_url == "https://example.com/search"
+    assert response[0]["original_url"] == "https://example.com/search"
 
 
 async def test_get_project_links(db, user):
-    link = Link(original_url="https://example.com", project="test", user_id=user.id)
+    # Ссылки проекта выбираются по project_id, одного имени проекта недостаточно
+    project_id = await get_or_create_project_id(db, user.id, "test")
+    link = Link(short_code="proj", original_url="https://example.com", project="test", project_id=project_id, user_id=user.id)
     db.add(link)
     await db.commit()
 
-    response = await get_project_links("test", db, user)
+    response = orjson.loads((await get_project_links(project_name="test", db=db, user=user)).body)
     assert len(response) == 1
-    assert response[0].project == "test"
+    assert response[0]["project"] == "test"
 
 
 async def test_get_expired_links(db, user):
-    expired_link = ExpiredLink(original_url="https://expired.com", short_code="expired", user_id=user.id)
+    expired_link = ExpiredLink(
+        original_url="https://expired.com", short_code="expired", created_at=datetime.utcnow(), user_id=user.id
+    )
     db.add(expired_link)
     await db.commit()
 
-    response = await get_expired_links(db, user)
+    response = orjson.loads((await get_expired_links(db, user)).body)
     assert len(response) == 1
-    assert response[0].short_code == "expired"
+    assert response[0]["short_code"] == "expired"
 
 
 async def test_create_public_short_url(db):
@@ -0,0 +1,10 @@
+"""
+Нагрузочные сценарии Locust на заранее наполненном наборе данных.
+
+1. Наполнение БД (N пользователей, M ссылок, массовые INSERT):
+    python -m tests.load.seed --users 1000 --links 1000000
+2. Запуск нагрузки:
+    PYTHONPATH=. locust -f tests/load/locustfile.py --host http://localhost:8000
+
+Редиректы распределены по закону Ципфа, прогон завершается с кодом 1 при нарушении SLO.
+"""
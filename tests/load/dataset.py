@@ -0,0 +1,47 @@
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+DATASET_PATH = Path(os.getenv("LOAD_DATASET", Path(__file__).parent / "dataset.json"))
+
+
+@dataclass
+class Dataset:
+    """Описание наполненного набора данных.
+
+    Почта, коды и проекты вычисляются по индексу, поэтому файл не хранит миллионы кодов.
+    Ссылка i принадлежит пользователю i % users, ранг популярности ссылки равен i.
+    """
+    run_id: str
+    users: int
+    links: int
+    projects: int
+    password: str
+
+    def email(self, user_index: int) -> str:
+        return f"load-{self.run_id}-{user_index}@example.com"
+
+    def username(self, user_index: int) -> str:
+        return f"load-{self.run_id}-{user_index}"
+
+    def code(self, link_index: int) -> str:
+        return f"{self.run_id}{link_index:x}"
+
+    def project(self, link_index: int) -> str:
+        return f"project{link_index % self.projects}"
+
+    def owner(self, link_index: int) -> int:
+        return link_index % self.users
+
+    def codes_of(self, user_index: int, limit: int = 100) -> list[str]:
+        """Коды ссылок пользователя (самые популярные первыми)"""
+        return [self.code(i) for i in range(user_index, self.links, self.users)[:limit]]
+
+    def save(self, path: Path = DATASET_PATH) -> Path:
+        path.write_text(json.dumps(asdict(self), indent=2))
+        return path
+
+    @classmethod
+    def load(cls, path: Path = DATASET_PATH) -> "Dataset":
+        return cls(**json.loads(Path(path).read_text()))
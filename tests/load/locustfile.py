@@ -0,0 +1,113 @@
+import itertools
+import logging
+import os
+import random
+
+from locust import HttpUser, between, events, task
+
+from tests.load.dataset import Dataset
+from tests.load.slo import check_slos
+from tests.load.zipf import ZipfSampler
+
+DATASET = Dataset.load()
+REDIRECTS = ZipfSampler(DATASET.links, s=float(os.getenv("LOAD_ZIPF_S", "1.1")))
+# Небольшой общий пул алиасов, за который конкурируют все создатели ссылок
+ALIAS_POOL = [f"{DATASET.run_id}-hot-{i}" for i in range(int(os.getenv("LOAD_ALIAS_POOL", "20")))]
+
+_user_indexes = itertools.count()
+
+
+class ClickerUser(HttpUser):
+    """Анонимные переходы по коротким ссылкам (распределение Ципфа)"""
+    weight = 8
+    wait_time = between(0.05, 0.5)
+
+    @task
+    def redirect(self):
+        code = DATASET.code(REDIRECTS.sample())
+        with self.client.get(f"/links/{code}", allow_redirects=False, name="/links/[code]",
+                             catch_response=True) as response:
+            if response.status_code != 307:
+                response.failure(f"Unexpected status {response.status_code}")
+
+
+class SeededUser(HttpUser):
+    """Пользователь из наполненного набора данных"""
+    abstract = True
+
+    def on_start(self):
+        self.user_index = next(_user_indexes) % DATASET.users
+        auth = self.client.post("/auth/jwt/login", data={
+            "username": DATASET.email(self.user_index),
+            "password": DATASET.password,
+        })
+        self.headers = {"Authorization": f"Bearer {auth.json()['access_token']}"}
+        self.codes = DATASET.codes_of(self.user_index)
+
+
+class CreatorUser(SeededUser):
+    """Создание ссылок, в том числе с конкурирующими кастомными алиасами"""
+    weight = 1
+    wait_time = between(0.5, 2)
+
+    @task(5)
+    def create_link(self):
+        self.client.post("/links/shorten", headers=self.headers, json={
+            "original_url": f"https://example.com/new/{random.randint(1, 10 ** 9)}",
+            "username": DATASET.username(self.user_index),
+            "project": DATASET.project(random.randrange(DATASET.projects)),
+        })
+
+    @task(1)
+    def create_custom_alias(self):
+        alias = random.choice(ALIAS_POOL)
+        with self.client.post("/links/shorten", headers=self.headers, name="/links/shorten [custom alias]",
+                              catch_response=True, json={
+                                  "original_url": "https://example.com/contended",
+                                  "username": DATASET.username(self.user_index),
+                                  "custom_alias": alias,
+                              }) as response:
+            # 400 - алиас уже занят другим пользователем, это ожидаемый исход конкуренции
+            if response.status_code == 400:
+                response.success()
+                return
+            if response.status_code != 201:
+                response.failure(f"Unexpected status {response.status_code}")
+                return
+        # Освобождаем алиас, чтобы конкуренция продолжалась весь прогон
+        self.client.delete(f"/links/{alias}", headers=self.headers, name="/links/[code] delete")
+
+
+class AnalystUser(SeededUser):
+    """Просмотр статистики, проектов и поиск"""
+    weight = 1
+    wait_time = between(1, 3)
+
+    @task(5)
+    def link_stats(self):
+        if self.codes:
+            self.client.get(f"/links/{random.choice(self.codes)}/stats", headers=self.headers,
+                            name="/links/[code]/stats")
+
+    @task(2)
+    def project_links(self):
+        project = DATASET.project(random.randrange(DATASET.projects))
+        self.client.get(f"/links/projects/{project}", headers=self.headers, name="/links/projects/[project]")
+
+    @task(1)
+    def search(self):
+        project = DATASET.project(random.randrange(DATASET.projects))
+        with self.client.get("/links/search", headers=self.headers, params={"original_url": f"/{project}/page/"},
+                             catch_response=True) as response:
+            if response.status_code == 404:
+                response.success()
+
+
+@events.quitting.add_listener
+def enforce_slos(environment, **kwargs):
+    """Прогон завершается с кодом 1, если какой-либо эндпоинт нарушил SLO"""
+    violations = check_slos(environment.stats.entries.values())
+    for violation in violations:
+        logging.error("SLO violated: %s", violation)
+    if violations:
+        environment.process_exit_code = 1
@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import math
+import secrets
+import time
+import uuid
+from pathlib import Path
+
+from fastapi_users.password import PasswordHelper
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.database import DATABASE_URL, Base, Link, Project, User
+from src.shorturl.project_stats import rebuild_project_stats
+from src.utils.url import url_hash
+from tests.load.dataset import DATASET_PATH, Dataset
+
+DEFAULT_PASSWORD = "LoadPass123!"
+DOMAINS = ("example.com", "docs.example.org", "shop.example.net", "news.example.io", "blog.example.dev")
+
+
+def user_id_for(dataset: Dataset, user_index: int) -> uuid.UUID:
+    """Детерминированный id пользователя, чтобы ссылки можно было вставлять без выборки users"""
+    return uuid.uuid5(uuid.NAMESPACE_URL, dataset.email(user_index))
+
+
+def project_id_for(dataset: Dataset, user_index: int, project: str) -> uuid.UUID:
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"{dataset.email(user_index)}/{project}")
+
+
+def project_pairs(dataset: Dataset) -> list[tuple[int, str]]:
+    """Пары (пользователь, проект), встречающиеся в ссылках: они повторяются с периодом НОК(users, projects)"""
+    period = min(dataset.links, math.lcm(dataset.users, dataset.projects))
+    return sorted({(dataset.owner(i), dataset.project(i)) for i in range(period)})
+
+
+def build_project_rows(dataset: Dataset, pairs: list[tuple[int, str]]) -> list[dict]:
+    return [
+        {"id": project_id_for(dataset, user, project), "user_id": user_id_for(dataset, user), "name": project}
+        for user, project in pairs
+    ]
+
+
+def build_user_rows(dataset: Dataset, start: int, stop: int, hashed_password: str) -> list[dict]:
+    return [
+        {
+            "id": user_id_for(dataset, i),
+            "email": dataset.email(i),
+            "username": dataset.username(i),
+            "hashed_password": hashed_password,
+            "is_active": True,
+            "is_superuser": False,
+            "is_verified": True,
+        }
+        for i in range(start, stop)
+    ]
+
+
+def link_url(dataset: Dataset, i: int) -> str:
+    return f"https://{DOMAINS[i % len(DOMAINS)]}/{dataset.project(i)}/page/{i}"
+
+
+def build_link_rows(dataset: Dataset, start: int, stop: int) -> list[dict]:
+    return [
+        {
+            "id": uuid.uuid4(),
+            "original_url": link_url(dataset, i),
+            "url_hash": url_hash(link_url(dataset, i)),
+            "short_code": dataset.code(i),
+            "user_id": user_id_for(dataset, dataset.owner(i)),
+            "project": dataset.project(i),
+            "project_id": project_id_for(dataset, dataset.owner(i), dataset.project(i)),
+            "is_active": True,
+            "is_custom": False,
+            "clicks": 0,
+        }
+        for i in range(start, stop)
+    ]
+
+
+async def bulk_insert(engine: AsyncEngine, table, total: int, chunk: int, build_rows) -> None:
+    started = time.perf_counter()
+    for start in range(0, total, chunk):
+        stop = min(start + chunk, total)
+        # Отдельная транзакция на пачку: без многочасовых транзакций на больших объёмах
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), build_rows(start, stop))
+        rate = stop / (time.perf_counter() - started)
+        print(f"{table.__tablename__}: {stop}/{total} ({rate:.0f} rows/s)")
+
+
+async def seed(dataset: Dataset, db_url: str, chunk: int = 5000, create_tables: bool = False) -> None:
+    engine = create_async_engine(db_url)
+    try:
+        if create_tables:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+        # Один хэш на всех пользователей: хэширование пароля - самая дорогая часть
+        hashed_password = PasswordHelper().hash(dataset.password)
+        await bulk_insert(
+            engine, User, dataset.users, chunk,
+            lambda start, stop: build_user_rows(dataset, start, stop, hashed_password),
+        )
+        pairs = project_pairs(dataset)
+        await bulk_insert(
+            engine, Project, len(pairs), chunk,
+            lambda start, stop: build_project_rows(dataset, pairs[start:stop]),
+        )
+        await bulk_insert(
+            engine, Link, dataset.links, chunk,
+            lambda start, stop: build_link_rows(dataset, start, stop),
+        )
+        async with engine.begin() as conn:
+            await rebuild_project_stats(conn)
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m tests.load.seed", description="Наполнение БД для нагрузочных тестов")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--links", type=int, default=100_000)
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--db-url", default=DATABASE_URL)
+    parser.add_argument("--chunk", type=int, default=5000, help="Строк на один INSERT")
+    parser.add_argument("--create-tables", action="store_true", help="Создать таблицы (для локальной SQLite)")
+    parser.add_argument("--output", type=Path, default=DATASET_PATH, help="Куда записать описание набора данных")
+    args = parser.parse_args(argv)
+
+    dataset = Dataset(
+        run_id=secrets.token_hex(2),
+        users=args.users,
+        links=args.links,
+        projects=args.projects,
+        password=args.password,
+    )
+    asyncio.run(seed(dataset, args.db_url, chunk=args.chunk, create_tables=args.create_tables))
+    print(f"Описание набора данных: {dataset.save(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
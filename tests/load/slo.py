@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class SLO:
+    p95_ms: float
+    p99_ms: float
+    max_fail_ratio: float = 0.01
+
+
+# Ключ - (method, name) запроса в статистике Locust
+SLOS = {
+    ("GET", "/links/[code]"): SLO(p95_ms=50, p99_ms=150),
+    ("POST", "/links/shorten"): SLO(p95_ms=150, p99_ms=400),
+    ("POST", "/links/shorten [custom alias]"): SLO(p95_ms=200, p99_ms=500),
+    ("GET", "/links/[code]/stats"): SLO(p95_ms=100, p99_ms=300),
+    ("GET", "/links/projects/[project]"): SLO(p95_ms=300, p99_ms=800),
+    ("GET", "/links/search"): SLO(p95_ms=500, p99_ms=1000),
+}
+
+
+def check_slos(entries, slos: dict = SLOS) -> list[str]:
+    """Проверяет записи статистики Locust (StatsEntry) и возвращает список нарушений"""
+    violations = []
+    for entry in entries:
+        slo = slos.get((entry.method, entry.name))
+        if slo is None or not entry.num_requests:
+            continue
+        p95 = entry.get_response_time_percentile(0.95)
+        p99 = entry.get_response_time_percentile(0.99)
+        label = f"{entry.method} {entry.name}"
+        if p95 > slo.p95_ms:
+            violations.append(f"{label}: p95 {p95:.0f} ms > {slo.p95_ms:.0f} ms")
+        if p99 > slo.p99_ms:
+            violations.append(f"{label}: p99 {p99:.0f} ms > {slo.p99_ms:.0f} ms")
+        if entry.fail_ratio > slo.max_fail_ratio:
+            violations.append(f"{label}: failures {entry.fail_ratio:.2%} > {slo.max_fail_ratio:.2%}")
+    return violations
@@ -0,0 +1,29 @@
+import bisect
+import itertools
+import random
+from typing import Optional
+
+
+class ZipfSampler:
+    """Выбор ранга 0..n-1 с вероятностью ~ 1 / (rank + 1) ** s.
+
+    Кумулятивные веса считаются один раз, выборка - бинарный поиск.
+    """
+
+    def __init__(self, n: int, s: float = 1.1, seed: Optional[int] = None):
+        if n <= 0:
+            raise ValueError(f"Invalid population size: {n}. Must be positive integer")
+        self.n = n
+        self.s = s
+        self._cdf = list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+        self._total = self._cdf[-1]
+        self._random = random.Random(seed)
+
+    def sample(self) -> int:
+        point = self._random.random() * self._total
+        return min(bisect.bisect_left(self._cdf, point), self.n - 1)
+
+    def share_of_top(self, k: int) -> float:
+        """Доля трафика, приходящаяся на k самых популярных элементов"""
+        k = min(k, self.n)
+        return self._cdf[k - 1] / self._total if k > 0 else 0.0
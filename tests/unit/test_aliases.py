@@ -0,0 +1,112 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.manager import current_active_user
+from src.cache import _local_tags
+from src.database import Base, Link, LinkAlias, User, get_async_session
+from src.main import app
+from src.shorturl.clicks import click_buffer
+
+OWNER = uuid.UUID(int=1)
+OTHER = uuid.UUID(int=2)
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'aliases.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": OWNER, "email": "owner@example.com", "username": "owner", "hashed_password": "x"},
+            {"id": OTHER, "email": "other@example.com", "username": "other", "hashed_password": "x"},
+        ])
+        await conn.execute(insert(Link), [
+            {"original_url": "https://example.com/a", "short_code": "alpha", "user_id": OWNER},
+            {"original_url": "https://example.com/b", "short_code": "beta", "user_id": OWNER},
+            {"original_url": "https://example.com/c", "short_code": "gamma", "user_id": OTHER},
+        ])
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(engine):
+    FastAPICache.reset()
+    InMemoryBackend._store.clear()
+    _local_tags.clear()
+    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_active_user] = lambda: User(id=OWNER, email="owner@example.com")
+    app.state.engine = engine
+    click_buffer._counts.clear()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    click_buffer._counts.clear()
+    app.dependency_overrides.clear()
+    app.state.engine = None
+    FastAPICache.reset()
+
+
+@pytest.mark.asyncio
+async def test_rename_keeps_old_code_as_alias(client):
+    # Прежний код уже закэширован как основной
+    assert (await client.get("/links/alpha", follow_redirects=False)).status_code == 307
+
+    renamed = await client.put("/links/alpha", json={"short_code": "alpha2", "keep_alias": True})
+    assert renamed.status_code == 200
+    assert renamed.json()["short_code"] == "alpha2"
+
+    for _ in range(2):  # промах и попадание в кэш
+        response = await client.get("/links/alpha", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"] == "https://example.com/a"
+    # Переходы по алиасу считаются для основного кода
+    assert click_buffer._counts == {"alpha": 1, "alpha2": 2}
+
+    # Возврат к прежнему коду убирает алиас
+    back = await client.put("/links/alpha2", json={"short_code": "alpha"})
+    assert back.status_code == 200
+    assert (await client.get("/links/alpha2", follow_redirects=False)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_rename_conflicts_and_permissions(client, engine):
+    assert (await client.put("/links/alpha", json={"short_code": "beta"})).status_code == 400
+    assert (await client.put("/links/gamma", json={"short_code": "gamma2"})).status_code == 403
+    assert (await client.put("/links/missing", json={"short_code": "other"})).status_code == 404
+
+    assert (await client.put("/links/beta", json={"short_code": "beta2", "keep_alias": True})).status_code == 200
+    # Код, занятый алиасом, недоступен ни для переименования, ни для новой ссылки
+    assert (await client.put("/links/alpha", json={"short_code": "beta"})).status_code == 400
+    created = await client.post("/links/shorten", json={
+        "original_url": "https://example.com/new", "custom_alias": "beta", "username": "owner",
+    })
+    assert created.status_code == 400
+
+    async with engine.connect() as conn:
+        codes = (await conn.execute(select(Link.short_code).order_by(Link.short_code))).scalars().all()
+    assert codes == ["alpha", "beta2", "gamma"]
+
+
+@pytest.mark.asyncio
+async def test_delete_removes_aliases(client, engine):
+    await client.put("/links/beta", json={"short_code": "beta2", "keep_alias": True})
+    assert (await client.get("/links/beta", follow_redirects=False)).status_code == 307
+
+    assert (await client.delete("/links/beta2")).status_code == 200
+    assert (await client.get("/links/beta", follow_redirects=False)).status_code == 404
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(LinkAlias))).all() == []
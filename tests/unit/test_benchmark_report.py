@@ -0,0 +1,38 @@
+import pytest
+from tests.benchmark.report import percentile, summarize, compare_reports, save_report, load_report
+
+
+def test_percentile_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 95) == 95.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize():
+    stats = summarize([0.001, 0.002, 0.003, 0.004], elapsed=2.0, errors=1)
+    assert stats["requests"] == 4
+    assert stats["errors"] == 1
+    assert stats["p50_ms"] == pytest.approx(2.0)
+    assert stats["rps"] == 2.0
+
+    # Пакетный сценарий: одна выборка = несколько запросов
+    assert summarize([0.01, 0.02], elapsed=1.0, items=40)["rps"] == 40.0
+
+
+def test_compare_reports_detects_regression():
+    baseline = {"results": {"redirect_hot": {"p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "rps": 1000}}}
+    current = {"results": {"redirect_hot": {"p50_ms": 10.5, "p95_ms": 30, "p99_ms": 30, "rps": 800}}}
+
+    rows = {row["metric"]: row for row in compare_reports(baseline, current, threshold=0.1)}
+    assert not rows["p50_ms"]["regression"]
+    assert rows["p95_ms"]["regression"]
+    assert not rows["p99_ms"]["regression"]
+    assert rows["rps"]["regression"]
+
+
+def test_save_and_load_report(tmp_path):
+    report = {"meta": {"commit": "abc"}, "results": {"stats": {"p50_ms": 1.0}}}
+    path = save_report(report, tmp_path / "baseline.json")
+    assert load_report(path) == report
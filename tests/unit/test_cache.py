@@ -0,0 +1,131 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis as fake_aioredis
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.manager import current_active_user
+from src.cache import TaggingRedisBackend, _local_tags, cache_key, invalidate, tag_key
+from src.database import Base, User, get_async_session
+from src.main import app
+
+USER_ID = uuid.UUID(int=1)
+
+
+@pytest_asyncio.fixture(params=["memory", "redis"])
+async def backend(request):
+    FastAPICache.reset()
+    if request.param == "redis":
+        redis = fake_aioredis.FakeRedis()
+        FastAPICache.init(TaggingRedisBackend(redis), prefix="fastapi-cache")
+        yield FastAPICache.get_backend()
+        await redis.close()
+    else:
+        InMemoryBackend._store.clear()
+        _local_tags.clear()
+        FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+        yield FastAPICache.get_backend()
+    FastAPICache.reset()
+
+
+@pytest_asyncio.fixture
+async def client(tmp_path, backend):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'cache.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": USER_ID, "email": "owner@example.com", "username": "owner", "hashed_password": "x"},
+        ])
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_active_user] = lambda: User(id=USER_ID, email="owner@example.com")
+    app.state.engine = engine
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides.clear()
+    app.state.engine = None
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_by_tag(backend):
+    key = cache_key("stats", USER_ID, "abc")
+    await backend.set(key, b"cached", 60)
+    await tag_key(key, ["link:abc", f"user:{USER_ID}"])
+
+    assert await invalidate("link:abc") == 1
+    assert await backend.get(key) is None
+    # Повторная инвалидация и неизвестные теги безопасны
+    assert await invalidate("link:abc", f"user:{USER_ID}", "link:missing") == 0
+
+
+@pytest.mark.asyncio
+async def test_tags_written_only_on_cache_miss(client, backend):
+    if not isinstance(backend, TaggingRedisBackend):
+        pytest.skip("теги в памяти процесса пишутся без обмена с Redis")
+    await client.post("/links/shorten", json={
+        "original_url": "https://example.com/page", "custom_alias": "docs1", "username": "owner",
+    })
+    tag_set = cache_key("tag", f"user:{USER_ID}")
+    assert (await client.get("/links/search", params={"original_url": "example.com"})).status_code == 200
+    assert await backend.redis.scard(tag_set) == 1
+
+    # Попадание не пишет теги заново
+    await backend.redis.delete(tag_set)
+    hit = await client.get("/links/search", params={"original_url": "example.com"})
+    assert hit.headers["x-fastapi-cache"] == "HIT"
+    assert not await backend.redis.exists(tag_set)
+
+
+def test_cache_key_is_unambiguous():
+    FastAPICache.reset()
+    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    try:
+        assert cache_key("project", "u", "a:b") != cache_key("project", "u:a", "b")
+    finally:
+        FastAPICache.reset()
+
+
+async def cached_views(client):
+    return [
+        await client.get("/links/docs1/stats"),
+        await client.get("/links/projects/docs"),
+        await client.get("/links/search", params={"original_url": "example.com"}),
+        await client.get("/links/docs1", follow_redirects=False),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rename_and_delete_invalidate_dependent_entries(client):
+    created = await client.post("/links/shorten", json={
+        "original_url": "https://example.com/page", "custom_alias": "docs1", "username": "owner", "project": "docs",
+    })
+    assert created.status_code == 201
+
+    await cached_views(client)
+    again = await cached_views(client)
+    assert [r.headers.get("x-fastapi-cache") for r in again] == ["HIT"] * 4
+
+    renamed = await client.put("/links/docs1", json={"short_code": "docs2"})
+    assert renamed.status_code == 200
+
+    stats, project, search, redirect = await cached_views(client)
+    assert stats.status_code == 404
+    assert redirect.status_code == 404
+    assert [link["short_code"] for link in project.json()] == ["docs2"]
+    assert [link["short_code"] for link in search.json()] == ["docs2"]
+
+    assert (await client.get("/links/docs2", follow_redirects=False)).status_code == 307
+    assert (await client.delete("/links/docs2")).status_code == 200
+    assert (await client.get("/links/docs2", follow_redirects=False)).status_code == 404
+    assert (await client.get("/links/projects/docs")).json() == []
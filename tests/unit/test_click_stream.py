@@ -0,0 +1,98 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis as fake_aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database import Base, Link, Project, ProjectStats
+from src.shorturl.click_stream import ClickIngestor, ClickStream, update_lag_metrics
+from src.shorturl.clicks import click_buffer
+
+OWNER = uuid.uuid4()
+PROJECT_ID = uuid.UUID(int=7)
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'clicks.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Link), [
+            {"original_url": "https://example.com/a", "short_code": "sa", "user_id": OWNER, "project": "p",
+             "project_id": PROJECT_ID},
+            {"original_url": "https://example.com/b", "short_code": "sb", "user_id": None, "project": None,
+             "project_id": None},
+        ])
+        await conn.execute(insert(Project), [{"id": PROJECT_ID, "user_id": OWNER, "name": "p"}])
+        await conn.execute(insert(ProjectStats), [{"project_id": PROJECT_ID}])
+    yield engine
+    await engine.dispose()
+
+
+async def _clicks(engine) -> dict:
+    async with engine.connect() as conn:
+        rows = (await conn.execute(select(Link.short_code, Link.clicks, Link.last_clicked_at))).all()
+        project = (await conn.execute(select(ProjectStats.total_clicks))).scalar()
+    assert all(row.last_clicked_at is not None for row in rows if row.clicks)
+    return {"project": project, **{row.short_code: row.clicks for row in rows}}
+
+
+class BrokenRedis:
+    async def xadd(self, *args, **kwargs):
+        raise RedisConnectionError("down")
+
+
+@pytest.mark.asyncio
+async def test_record_to_stream_or_buffer():
+    click_buffer._counts.clear()
+    stream = ClickStream(key="clicks")
+    await stream.record("sa")
+    assert click_buffer._counts["sa"] == 1
+
+    stream.redis = redis = fake_aioredis.FakeRedis()
+    await stream.record("sa")
+    entries = await redis.xrange("clicks")
+    assert [fields for _, fields in entries] == [{b"c": b"sa"}]
+
+    # Без Redis переход не теряется
+    stream.redis = BrokenRedis()
+    await stream.record("sb")
+    assert click_buffer._counts == {"sa": 1, "sb": 1}
+    click_buffer._counts.clear()
+
+
+@pytest.mark.asyncio
+async def test_ingest_batches_and_lag(engine):
+    redis = fake_aioredis.FakeRedis()
+    ingestor = ClickIngestor(redis, engine, "c1", key="clicks", group="g", batch_size=100, block_ms=10)
+    await ingestor.ensure_group()
+    await ingestor.ensure_group()
+    for code in ["sa", "sb", "sa", "sa", "unknown"]:
+        await redis.xadd("clicks", {"c": code})
+    assert await update_lag_metrics(redis, "clicks", "g") == 5
+
+    assert await ingestor.read() == 5
+    assert await _clicks(engine) == {"project": 3, "sa": 3, "sb": 1}
+    assert (await redis.xpending("clicks", "g"))["pending"] == 0
+    assert await update_lag_metrics(redis, "clicks", "g") == 0
+    assert await ingestor.read() == 0
+
+
+@pytest.mark.asyncio
+async def test_reclaim_after_consumer_crash(engine):
+    redis = fake_aioredis.FakeRedis()
+    crashed = ClickIngestor(redis, engine, "crashed", key="clicks", group="g")
+    await crashed.ensure_group()
+    for _ in range(3):
+        await redis.xadd("clicks", {"c": "sb"})
+    # Потребитель получил события и упал до записи в БД
+    await redis.xreadgroup("g", "crashed", {"clicks": ">"}, count=10)
+    assert (await redis.xpending("clicks", "g"))["pending"] == 3
+
+    survivor = ClickIngestor(redis, engine, "survivor", key="clicks", group="g", claim_idle_ms=0, batch_size=2)
+    assert await survivor.reclaim() == 3
+    assert (await _clicks(engine))["sb"] == 3
+    assert (await redis.xpending("clicks", "g"))["pending"] == 0
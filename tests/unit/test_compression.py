@@ -0,0 +1,63 @@
+import gzip
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from src import compression
+from src.compression import CompressionMiddleware, choose_encoding
+
+BIG = "x" * 5000
+
+
+def make_app():
+    async def big(request):
+        return PlainTextResponse(BIG)
+
+    async def small(request):
+        return PlainTextResponse("ok")
+
+    async def stream(request):
+        async def chunks():
+            for _ in range(3):
+                yield BIG
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    app = Starlette(routes=[Route("/big", big), Route("/small", small), Route("/stream", stream)])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return app
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("br;q=0, gzip") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") == "br"
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("br, gzip;q=0.5") == "gzip"
+    assert choose_encoding("br") is None
+
+
+@pytest.mark.asyncio
+async def test_gzip_whole_and_streamed_responses():
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test") as client:
+        for path, expected in (("/big", BIG), ("/stream", BIG * 3)):
+            response = await client.get(path, headers={"Accept-Encoding": "gzip"})
+            assert response.headers["content-encoding"] == "gzip"
+            assert "accept-encoding" in response.headers["vary"].lower()
+            assert response.text == expected  # httpx распаковывает gzip
+
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in small.headers
+        plain = await client.get("/big", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+
+
+def test_gzip_stream_chunks_are_decodable_incrementally():
+    compressor = compression._Gzip(6)
+    parts = [compressor.compress(b"a" * 2000), compressor.compress(b"b" * 2000), compressor.finish()]
+    assert all(parts[:2])
+    assert gzip.decompress(b"".join(parts)) == b"a" * 2000 + b"b" * 2000
@@ -0,0 +1,168 @@
+import socket
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from src.tasks.email import RateLimiter, SMTPConnectionPool, deliver, render_email
+
+
+class Recorder:
+    """Обработчик локального SMTP-сервера: запоминает письма и отклоняет адреса из rejected"""
+
+    def __init__(self, rejected=(), deferred=()):
+        self.messages = []
+        self.sessions = set()
+        self.rejected = set(rejected)
+        self.deferred = set(deferred)
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.rejected:
+            return "550 mailbox unavailable"
+        if address in self.deferred:
+            return "450 mailbox busy"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = Recorder(rejected={"bad@example.com"}, deferred={"busy@example.com"})
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield handler, controller
+    controller.stop()
+
+
+@pytest.fixture
+def pool(smtp_server):
+    _, controller = smtp_server
+    pool = SMTPConnectionPool(controller.hostname, controller.port, use_ssl=False)
+    yield pool
+    pool.close_all()
+
+
+def message(to):
+    return render_email("greeting.html", to, "Привет", username=to)
+
+
+def test_render_email_uses_template():
+    email = message("user@example.com")
+    assert email["To"] == "user@example.com"
+    assert "Здравствуйте, user@example.com" in email.get_content()
+
+
+def test_deliver_batch_in_one_session(smtp_server, pool):
+    handler, _ = smtp_server
+    failed = deliver([message(f"user{i}@example.com") for i in range(20)], pool, RateLimiter(0))
+
+    assert failed == []
+    assert len(handler.messages) == 20
+    assert len(handler.sessions) == 1
+
+
+def test_deliver_returns_deferred_and_keeps_session(smtp_server, pool):
+    handler, _ = smtp_server
+    failed = deliver([message("a@example.com"), message("bad@example.com"), message("busy@example.com"),
+                      message("b@example.com")], pool, RateLimiter(0))
+
+    # Окончательный отказ (550) не повторяется, временный (450) - возвращается
+    assert [m["To"] for m in failed] == ["busy@example.com"]
+    assert len(handler.messages) == 2
+
+
+def test_pool_reuses_connection(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+
+
+def test_pool_replaces_dead_connection(pool, monkeypatch):
+    with pool.connection() as first:
+        pass
+    first.close()
+    # Соединение простаивало дольше порога и не отвечает на NOOP
+    monkeypatch.setattr("src.tasks.email.IDLE_CHECK_SECONDS", -1)
+    with pool.connection() as second:
+        assert second.noop()[0] == 250
+    assert second is not first
+
+
+def test_deliver_gives_up_after_reconnect(smtp_server):
+    pool = SMTPConnectionPool("127.0.0.1", 1, use_ssl=False, timeout=1)
+    messages = [message("a@example.com"), message("b@example.com")]
+    assert deliver(messages, pool, RateLimiter(0)) == messages
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(rate=50, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    # Первый токен сразу, остальные пять - по 1/50 с
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.fixture
+def task_smtp(smtp_server, monkeypatch):
+    """Задачи Celery отправляют через общий пул воркера - направляем его на локальный сервер"""
+    from src.tasks.email import rate_limiter, smtp_pool
+
+    _, controller = smtp_server
+    for name, value in {"host": controller.hostname, "port": controller.port, "use_ssl": False,
+                        "user": None, "password": None}.items():
+        monkeypatch.setattr(smtp_pool, name, value)
+    monkeypatch.setattr(rate_limiter, "rate", 0)
+    # В пуле могли остаться соединения других тестов
+    smtp_pool.close_all()
+    yield smtp_server[0]
+    smtp_pool.close_all()
+
+
+def test_send_email_batch_retries_only_deferred(task_smtp, monkeypatch):
+    from celery.exceptions import Retry
+
+    from src.tasks.tasks import send_email_batch
+
+    retries = []
+
+    def retry(args=None, **kwargs):
+        retries.append(args)
+        return Retry()
+
+    monkeypatch.setattr(send_email_batch, "retry", retry)
+    recipients = [{"to": to, "username": to} for to in ("a@example.com", "bad@example.com", "busy@example.com")]
+    result = send_email_batch.apply(args=[recipients, "greeting.html", "Привет"])
+
+    assert isinstance(result.result, Retry)
+    assert retries == [[[{"to": "busy@example.com", "username": "busy@example.com"}], "greeting.html", "Привет"]]
+    assert [envelope.rcpt_tos for envelope in task_smtp.messages] == [["a@example.com"]]
+
+    # Без временных ошибок задача завершается, окончательные отказы не повторяются
+    result = send_email_batch.apply(args=[recipients[:2], "greeting.html", "Привет"])
+    assert result.successful() and result.result == 2
+    assert len(retries) == 1
+
+
+def test_enqueue_email_batches(task_smtp, monkeypatch):
+    from src.tasks.tasks import enqueue_email_batches, send_email_batch
+
+    monkeypatch.setattr(send_email_batch, "delay", lambda *args: send_email_batch.apply(args=args))
+    recipients = [{"to": f"user{i}@example.com", "username": f"user{i}"} for i in range(7)]
+
+    assert enqueue_email_batches(recipients, "greeting.html", "Привет", batch_size=3) == 3
+    assert sorted(to for envelope in task_smtp.messages for to in envelope.rcpt_tos) == sorted(r["to"] for r in recipients)
+    assert "Здравствуйте, user6" in task_smtp.messages[-1].content.decode()
@@ -0,0 +1,88 @@
+import pytest
+import pytest_asyncio
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database import Base, Link
+from src.main import app
+from src.shorturl.clicks import ClickBuffer, click_buffer
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'fast.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Link), [
+            {"original_url": "https://example.com/a b", "short_code": "fast01", "is_active": True},
+            {"original_url": "https://example.com/off", "short_code": "fast02", "is_active": False},
+        ])
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(engine):
+    app.state.engine = engine
+    InMemoryBackend._store.clear()
+    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.state.engine = None
+    FastAPICache.reset()
+
+
+@pytest.mark.asyncio
+async def test_fast_redirect_found_and_cached(client):
+    first = await client.get("/links/fast01", follow_redirects=False)
+    assert first.status_code == 307
+    assert first.headers["location"] == "https://example.com/a%20b"
+    assert first.headers["x-fastapi-cache"] == "MISS"
+
+    second = await client.get("/links/fast01", follow_redirects=False)
+    assert second.status_code == 307
+    assert second.headers["location"] == first.headers["location"]
+    assert second.headers["x-fastapi-cache"] == "HIT"
+
+
+@pytest.mark.asyncio
+async def test_fast_redirect_not_found_and_inactive(client):
+    for code in ("missing", "fast02"):
+        response = await client.get(f"/links/{code}", follow_redirects=False)
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Link not found or expired"}
+
+
+@pytest.mark.asyncio
+async def test_fast_redirect_does_not_shadow_search(client):
+    # /links/search объявлен раньше маршрута редиректа и требует авторизации
+    response = await client.get("/links/search", params={"original_url": "example"})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_click_buffer_flush(engine):
+    buffer = ClickBuffer()
+    for _ in range(3):
+        buffer.record("fast01")
+    buffer.record("fast02")
+    assert buffer.pending == 4
+
+    assert await buffer.flush(engine) == 2
+    assert buffer.pending == 0
+
+    async with engine.connect() as conn:
+        row = (await conn.execute(select(Link.clicks, Link.last_clicked_at).where(Link.short_code == "fast01"))).one()
+    assert row.clicks == 3
+    assert row.last_clicked_at is not None
+
+
+@pytest.mark.asyncio
+async def test_redirect_records_click(client, engine):
+    click_buffer._counts.clear()
+    await client.get("/links/fast01", follow_redirects=False)
+    assert click_buffer._counts["fast01"] == 1
+    click_buffer._counts.clear()
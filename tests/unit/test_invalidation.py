@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from fakeredis import FakeServer
+from fakeredis import aioredis as fake_aioredis
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+
+from src.cache import invalidate, link_tag
+from src.config import INVALIDATION_RESYNC_INTERVAL
+from src.invalidation import InvalidationBus, LocalCache, invalidation_bus, local_redirects, version_key
+from src.redis_client import cluster_node_client
+from src.shorturl.redirect_cache import load_redirect, store_redirect
+
+
+@pytest_asyncio.fixture
+async def redis():
+    FastAPICache.reset()
+    redis = fake_aioredis.FakeRedis()
+    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    yield redis
+    FastAPICache.reset()
+    await redis.close()
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_local_cache_lru_and_ttl():
+    local = LocalCache(maxsize=2, ttl=5)
+    local.put("a", 1)
+    assert local.get("a") is None  # без подписки на шину выключен
+
+    local.enabled = True
+    local.put("a", 1)
+    local.put("b", 2)
+    local.get("a")
+    local.put("c", 3)
+    assert (local.get("a"), local.get("b"), local.get("c")) == (1, None, 3)
+
+    local.put("d", 4, ttl=0)
+    assert local.get("d") is None
+
+
+def test_missed_version_clears_local_cache():
+    local = LocalCache(maxsize=10, ttl=5)
+    local.enabled = True
+    bus = InvalidationBus(local)
+    bus.version = 3
+    local.put("a", 1)
+    local.put("b", 2)
+
+    bus.apply({"v": 4, "codes": ["a"]})
+    assert (local.get("a"), local.get("b")) == (None, 2)
+
+    bus.apply({"v": 6, "codes": []})
+    assert len(local) == 0
+    assert bus.version == 6
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_subscribed_worker(redis):
+    invalidation_bus.resync_interval = 0.05
+    listener = asyncio.create_task(invalidation_bus.run(redis))
+    try:
+        await wait_for(lambda: local_redirects.enabled)
+        await store_redirect("bus01", "https://example.com/a")
+        await load_redirect("bus01")
+        assert local_redirects.get("bus01").location == "https://example.com/a"
+
+        await invalidate(link_tag("bus01"))
+        await wait_for(lambda: local_redirects.get("bus01") is None)
+        assert await load_redirect("bus01") is None
+
+        # Пропущенное сообщение обнаруживается сверкой со счётчиком версий
+        await store_redirect("bus02", "https://example.com/b")
+        await load_redirect("bus02")
+        await redis.incr(version_key())
+        await wait_for(lambda: len(local_redirects) == 0)
+    finally:
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+        invalidation_bus.resync_interval = INVALIDATION_RESYNC_INTERVAL
+        invalidation_bus.version = None
+    assert not local_redirects.enabled
+
+
+class FakeCluster(RedisCluster):
+    """RedisCluster поверх fakeredis: команды по ключам уходят в общий сервер, узлы не нужны"""
+
+    def __init__(self, server):
+        self.fake = fake_aioredis.FakeRedis(server=server)
+        self.commands = []
+
+    async def initialize(self):
+        return self
+
+    async def execute_command(self, *args, **kwargs):
+        self.commands.append((args[0], kwargs.pop("target_nodes", None)))
+        return await self.fake.execute_command(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_bus_in_cluster_mode(redis, monkeypatch):
+    server = FakeServer()
+    cluster = FakeCluster(server)
+    node_clients = []
+
+    async def node_client(redis):
+        node_clients.append(fake_aioredis.FakeRedis(server=server))
+        return node_clients[-1]
+
+    monkeypatch.setattr("src.invalidation.cluster_node_client", node_client)
+    bus = InvalidationBus(LocalCache(maxsize=10, ttl=5), resync_interval=0.05)
+    listener = asyncio.create_task(bus.run(cluster, retry_delay=0.01))
+    try:
+        await wait_for(lambda: bus.local.enabled)
+        bus.local.put("c1", 1)
+        bus.local.put("c2", 2)
+        assert await bus.publish(cluster, ["c1"]) == 1
+        await wait_for(lambda: bus.local.get("c1") is None)
+        assert bus.local.get("c2") == 2
+        assert ("PUBLISH", RedisCluster.DEFAULT_NODE) in cluster.commands
+    finally:
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+    assert len(node_clients) == 1
+
+
+@pytest.mark.asyncio
+async def test_cluster_node_client_targets_default_node():
+    cluster = RedisCluster(host="10.0.0.1", port=7000, password="pw")
+    cluster.nodes_manager.default_node = ClusterNode("10.0.0.2", 7001, password="pw")
+    cluster._initialize = False
+    client = await cluster_node_client(cluster)
+    kwargs = client.connection_pool.connection_kwargs
+    assert (kwargs["host"], kwargs["port"], kwargs["password"]) == ("10.0.0.2", 7001, "pw")
+    await client.close(close_connection_pool=True)
@@ -0,0 +1,77 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.responses import StreamingResponse
+
+from src.database import Base, ExpiredLink, Link
+from src.shorturl.expired_link import ExpiredLinkResponse
+from src.shorturl.listing import JSONBytesCoder, JSONBytesResponse, RowSerializer
+from src.shorturl.schemas import LinkResponse
+
+
+def link_row(i: int) -> dict:
+    return {
+        "original_url": f"https://example.com/{i}", "username": None, "custom_alias": None,
+        "expires_at": None, "project": "p", "short_code": f"c{i}", "created_at": datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc),
+        "clicks": i, "last_clicked_at": datetime(2025, 1, 2, 8, 30, 0, 1500, tzinfo=timezone(timedelta(hours=3))),
+        "is_active": True,
+        "redirect_code": 307, "cache_ttl": None, "click_beacon": False,
+    }
+
+
+def test_dumps_matches_pydantic_output():
+    serializer = RowSerializer(LinkResponse)
+    rows = [link_row(i) for i in range(3)]
+    expected = [orjson.loads(LinkResponse(**row).model_dump_json()) for row in rows]
+    assert orjson.loads(serializer.dumps(rows)) == expected
+    assert [orjson.loads(item) for item in serializer.dumps_each(rows)] == expected
+    assert expected[0]["created_at"] == "2025-01-01T12:00:00Z"
+
+
+def test_stream_is_one_json_array():
+    serializer = RowSerializer(LinkResponse)
+    rows = [link_row(i) for i in range(7)]
+    body = b"".join(serializer.iter_json(rows, chunk_size=3))
+    assert orjson.loads(body) == orjson.loads(serializer.dumps(rows))
+    assert b"".join(serializer.iter_json([])) == b"[]"
+
+    assert isinstance(serializer.response(rows, stream_threshold=5), StreamingResponse)
+    assert isinstance(serializer.response(rows, stream_threshold=None), JSONBytesResponse)
+
+
+def test_invalid_row_is_rejected():
+    row = link_row(1)
+    row["clicks"] = "many"
+    with pytest.raises(ValueError):
+        RowSerializer(LinkResponse).dumps([row])
+
+
+def test_coder_keeps_body_as_is():
+    body = b'[{"short_code":"c1"}]'
+    assert JSONBytesCoder.encode(JSONBytesResponse(body)) == body
+    assert JSONBytesCoder.decode_as_type(body, type_=list).body == body
+
+
+@pytest.mark.asyncio
+async def test_selects_only_schema_columns(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'listing.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Link), [{"original_url": "https://example.com/a", "short_code": "lst01"}])
+        await conn.execute(insert(ExpiredLink), [{
+            "original_url": "https://example.com/b", "short_code": "lst02",
+            "created_at": datetime(2025, 1, 1), "user_id": uuid.uuid4(),
+        }])
+        links = (await conn.execute(select(*RowSerializer(LinkResponse).columns(Link)))).all()
+        expired = (await conn.execute(select(*RowSerializer(ExpiredLinkResponse).columns(ExpiredLink)))).all()
+    await engine.dispose()
+
+    [link] = orjson.loads(RowSerializer(LinkResponse).dumps(links))
+    assert link["short_code"] == "lst01" and link["username"] is None and link["clicks"] == 0
+    [item] = orjson.loads(RowSerializer(ExpiredLinkResponse).dumps(expired))
+    assert item["short_code"] == "lst02"
+    assert uuid.UUID(item["user_id"]) and uuid.UUID(item["id"])
@@ -0,0 +1,70 @@
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+from tests.load.dataset import Dataset
+from tests.load.seed import build_link_rows, build_project_rows, build_user_rows, project_pairs, user_id_for
+from tests.load.slo import SLO, check_slos
+from tests.load.zipf import ZipfSampler
+
+
+@pytest.fixture
+def dataset():
+    return Dataset(run_id="ab12", users=10, links=1000, projects=5, password="secret")
+
+
+def test_zipf_sampler_is_skewed():
+    sampler = ZipfSampler(1000, s=1.1, seed=42)
+    counts = Counter(sampler.sample() for _ in range(20000))
+
+    assert all(0 <= rank < 1000 for rank in counts)
+    assert counts[0] > counts[9] > counts[99]
+    # Верхние 1% ссылок получают заметную долю трафика
+    assert sampler.share_of_top(10) > 0.3
+
+
+def test_zipf_sampler_invalid_size():
+    with pytest.raises(ValueError):
+        ZipfSampler(0)
+
+
+def test_dataset_codes_belong_to_owner(dataset):
+    codes = dataset.codes_of(3, limit=5)
+    assert codes == [dataset.code(i) for i in (3, 13, 23, 33, 43)]
+    assert len(set(dataset.code(i) for i in range(dataset.links))) == dataset.links
+
+
+def test_dataset_roundtrip(dataset, tmp_path):
+    path = dataset.save(tmp_path / "dataset.json")
+    assert Dataset.load(path) == dataset
+
+
+def test_seed_rows(dataset):
+    users = build_user_rows(dataset, 0, 10, "hash")
+    links = build_link_rows(dataset, 0, 20)
+
+    user_ids = {row["id"] for row in users}
+    assert len(user_ids) == 10
+    assert all(row["user_id"] in user_ids for row in links)
+    assert links[7]["user_id"] == user_id_for(dataset, 7)
+    assert links[7]["short_code"] == dataset.code(7)
+
+    projects = build_project_rows(dataset, project_pairs(dataset))
+    # users=10, projects=5: у пользователя u только проект u % 5
+    assert len(projects) == 10
+    assert {row["id"] for row in projects} >= {row["project_id"] for row in links}
+
+
+def test_check_slos():
+    def entry(method, name, p95, p99, fail_ratio=0.0):
+        percentiles = {0.95: p95, 0.99: p99}
+        return SimpleNamespace(method=method, name=name, num_requests=100, fail_ratio=fail_ratio,
+                               get_response_time_percentile=percentiles.get)
+
+    slos = {("GET", "/links/[code]"): SLO(p95_ms=50, p99_ms=100)}
+    assert check_slos([entry("GET", "/links/[code]", 40, 90)], slos) == []
+
+    violations = check_slos([entry("GET", "/links/[code]", 60, 90, fail_ratio=0.5)], slos)
+    assert len(violations) == 2
+    # Запросы без SLO не проверяются
+    assert check_slos([entry("GET", "/other", 1000, 1000)], slos) == []
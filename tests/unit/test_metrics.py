@@ -0,0 +1,52 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from src.main import app
+from src.metrics import _request_queries, instrument_sqlalchemy
+
+
+@pytest.fixture
+def test_client():
+    with TestClient(app) as client:
+        yield client
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_endpoint(test_client):
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert "text/plain" in response.headers["content-type"]
+    assert "http_request_duration_seconds" in response.text
+
+
+def test_request_latency_labelled_by_route_template(test_client):
+    before = sample("http_request_duration_seconds_count", method="GET", route="/unprotected-route", status="200")
+    test_client.get("/unprotected-route")
+    after = sample("http_request_duration_seconds_count", method="GET", route="/unprotected-route", status="200")
+    assert after == before + 1
+
+    # Неизвестные пути сводятся в одну серию
+    test_client.get("/nonexistent/123")
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") >= 1
+
+
+def test_sql_queries_counted_per_request():
+    instrument_sqlalchemy()
+    engine = create_engine("sqlite://")
+    before = sample("db_query_duration_seconds_count")
+
+    token = _request_queries.set([0])
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        assert _request_queries.get()[0] == 2
+    finally:
+        _request_queries.reset(token)
+
+    assert sample("db_query_duration_seconds_count") == before + 2
@@ -0,0 +1,77 @@
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from migrations import online
+
+
+@pytest.fixture
+def connection(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    with engine.connect() as conn:
+        conn.execute(sa.text("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)"))
+        conn.execute(sa.text("INSERT INTO items (id, value) VALUES " + ", ".join(f"({i}, NULL)" for i in range(1, 26))))
+        conn.commit()
+        yield conn
+    engine.dispose()
+
+
+def run(connection, fn):
+    """Как env.py: миграция в своей транзакции (transaction_per_migration)"""
+    context = MigrationContext.configure(connection, opts={"transaction_per_migration": True})
+    with Operations.context(context), context.begin_transaction(_per_migration=True):
+        result = fn()
+    connection.commit()
+    return result
+
+
+UPDATE_SQL = "UPDATE items SET value = id * 2 WHERE (:start IS NULL OR id > :start) AND id <= :end"
+
+
+def test_backfill_resumes_from_checkpoint(connection, monkeypatch):
+    class Interrupted(Exception):
+        pass
+
+    def interrupt(_):
+        raise Interrupted
+
+    monkeypatch.setattr(online.time, "sleep", interrupt)
+    with pytest.raises(Interrupted):
+        run(connection, lambda: online.backfill("items_value", "items", UPDATE_SQL, batch_size=10))
+
+    checkpoint = connection.execute(sa.text("SELECT last_key, rows FROM alembic_backfill_checkpoints")).one()
+    assert checkpoint == ("10", 10)
+    connection.rollback()
+
+    updated = run(connection, lambda: online.backfill("items_value", "items", UPDATE_SQL, batch_size=10, pause=0))
+    assert updated == 15
+    values = connection.execute(sa.text("SELECT id, value FROM items")).all()
+    assert all(value == id_ * 2 for id_, value in values)
+
+
+def test_backfill_where_limits_keys(connection):
+    connection.execute(sa.text("UPDATE items SET value = 0 WHERE id <= 20"))
+    connection.commit()
+    updated = run(connection, lambda: online.backfill(
+        "items_tail", "items", UPDATE_SQL + " AND value IS NULL", where="value IS NULL", batch_size=2, pause=0,
+    ))
+    assert updated == 5
+
+
+def test_backfill_computed_uses_python_values(connection):
+    updated = run(connection, lambda: online.backfill_computed(
+        "items_hash", "items", ["id"], lambda row: {"value": hash(str(row.id)) % 1000},
+        where="value IS NULL", batch_size=7, pause=0,
+    ))
+    assert updated == 25
+    values = connection.execute(sa.text("SELECT id, value FROM items")).all()
+    assert all(value == hash(str(id_)) % 1000 for id_, value in values)
+
+
+def test_create_index_falls_back_outside_postgres(connection):
+    run(connection, lambda: online.create_index_concurrently("ix_items_value", "items", ["value"]))
+    assert "ix_items_value" in {ix["name"] for ix in sa.inspect(connection).get_indexes("items")}
+
+    run(connection, lambda: online.drop_index_concurrently("ix_items_value", "items"))
+    assert sa.inspect(connection).get_indexes("items") == []
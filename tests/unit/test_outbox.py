@@ -0,0 +1,202 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis as fake_aioredis
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.manager import current_active_user
+from src.cache import _local_tags
+from src.database import Base, Link, OutboxDeadEvent, OutboxEvent, User, get_async_session
+from src.main import app
+from src.outbox import LINK_UPDATED, OutboxRelay, add_event, outbox_relay, stream_hook, webhook_hook
+
+OWNER = uuid.UUID(int=1)
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    # Ретранслятор сбрасывает кэш; без инициализированного кэша invalidate ничего не делает
+    FastAPICache.reset()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'outbox.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": OWNER, "email": "owner@example.com", "username": "owner", "hashed_password": "x"},
+        ])
+        await conn.execute(insert(Link), [
+            {"original_url": "https://example.com/a", "short_code": "alpha", "user_id": OWNER, "project": "p"},
+        ])
+    yield engine
+    await engine.dispose()
+
+
+async def _events(engine) -> list:
+    async with engine.connect() as conn:
+        return (await conn.execute(select(OutboxEvent).order_by(OutboxEvent.id))).all()
+
+
+async def _add_events(engine, n: int) -> None:
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as db:
+        link = (await db.execute(select(Link))).scalar_one()
+        for i in range(n):
+            add_event(db, LINK_UPDATED, link, ["link:alpha", None], step=i)
+        # Событие без фиксации транзакции не появляется
+        await db.rollback()
+        link = (await db.execute(select(Link))).scalar_one()
+        for i in range(n):
+            add_event(db, LINK_UPDATED, link, ["link:alpha", None], step=i)
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_in_batches(engine):
+    await _add_events(engine, 5)
+    events = await _events(engine)
+    assert len(events) == 5
+    assert events[0].payload == {"tags": ["link:alpha"], "user_id": str(OWNER), "project": "p", "step": 0}
+
+    redis = fake_aioredis.FakeRedis()
+    delivered = []
+
+    async def collect(messages):
+        delivered.append(messages)
+
+    relay = OutboxRelay(batch_size=2)
+    relay.add_hook(collect)
+    relay.add_hook(stream_hook(redis, "link-events"), "stream")
+    assert await relay.drain(engine) == 5
+    assert [len(batch) for batch in delivered] == [2, 2, 1]
+    assert [message["step"] for batch in delivered for message in batch] == [0, 1, 2, 3, 4]
+    assert delivered[0][0]["event"] == LINK_UPDATED and "tags" not in delivered[0][0]
+    entries = await redis.xrange("link-events")
+    assert [json.loads(fields[b"event"])["step"] for _, fields in entries] == [0, 1, 2, 3, 4]
+    assert await _events(engine) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_hook_is_retried_alone_then_dead_lettered(engine, monkeypatch):
+    await _add_events(engine, 2)
+    invalidated, collected, calls = [], [], []
+
+    async def record_invalidate(*tags, strict=False):
+        invalidated.append(sorted(tags))
+
+    async def collect(messages):
+        collected.append(len(messages))
+
+    async def broken(messages):
+        calls.append(len(messages))
+        raise RuntimeError("down")
+
+    monkeypatch.setattr("src.outbox.invalidate", record_invalidate)
+    relay = OutboxRelay(max_attempts=3, retry_base=0)
+    relay.add_hook(collect)
+    relay.add_hook(broken)
+    with pytest.raises(ValueError):
+        relay.add_hook(collect)
+    assert await relay.drain(engine) == 0
+    assert [(event.attempts, event.delivered) for event in await _events(engine)] == [(1, ["collect", "invalidate"])] * 2
+    # Повторяется только упавший обработчик: кэш и поток второй раз не трогаются
+    assert await relay.drain(engine) == 0
+    assert await relay.drain(engine) == 0
+    assert (invalidated, collected, calls) == ([["link:alpha"]], [2], [2, 2, 2])
+
+    assert await _events(engine) == []
+    async with engine.connect() as conn:
+        dead = (await conn.execute(select(OutboxDeadEvent).order_by(OutboxDeadEvent.id))).all()
+    assert [(event.attempts, event.delivered, event.payload["step"]) for event in dead] == [
+        (3, ["collect", "invalidate"], 0), (3, ["collect", "invalidate"], 1),
+    ]
+    assert "down" in dead[0].error and dead[0].created_at is not None
+
+
+@pytest.mark.asyncio
+async def test_retry_waits_for_backoff(engine):
+    await _add_events(engine, 2)
+    calls = []
+
+    async def flaky(messages):
+        calls.append(len(messages))
+        if len(calls) == 1:
+            raise RuntimeError("down")
+
+    relay = OutboxRelay(retry_base=60, retry_max=600)
+    assert [relay.retry_delay(n) for n in (1, 2, 3, 5, 20)] == [60, 120, 240, 600, 600]
+    relay.add_hook(flaky)
+    started = datetime.now(timezone.utc).replace(tzinfo=None)
+    assert await relay.drain(engine) == 0
+    events = await _events(engine)
+    assert all(timedelta(seconds=59) < event.next_attempt_at.replace(tzinfo=None) - started < timedelta(seconds=61)
+               for event in events)
+    # До срока пачка не выбирается, новые события при этом доставляются
+    await _add_events(engine, 1)
+    assert await relay.drain(engine) == 1
+    assert calls == [2, 1]
+
+    async with engine.begin() as conn:
+        await conn.execute(update(OutboxEvent).values(next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    assert await relay.drain(engine) == 2
+    assert calls == [2, 1, 2]
+    assert await _events(engine) == []
+
+
+@pytest.mark.asyncio
+async def test_webhook_hook():
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200 if len(requests) == 1 else 503)
+
+    hook = webhook_hook("http://hooks.test/links", transport=httpx.MockTransport(handler))
+    await hook([{"id": 1, "event": LINK_UPDATED}])
+    assert requests == [{"events": [{"id": 1, "event": LINK_UPDATED}]}]
+    with pytest.raises(httpx.HTTPStatusError):
+        await hook([{"id": 2, "event": LINK_UPDATED}])
+
+
+@pytest.mark.asyncio
+async def test_handler_event_drained_after_response(engine):
+    FastAPICache.reset()
+    InMemoryBackend._store.clear()
+    _local_tags.clear()
+    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    delivered = []
+
+    async def collect(messages):
+        delivered.extend(messages)
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_active_user] = lambda: User(id=OWNER, email="owner@example.com")
+    app.state.engine = engine
+    outbox_relay.hooks = {"collect": collect}
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            assert (await client.get("/links/alpha/stats")).json()["short_code"] == "alpha"
+            assert (await client.put("/links/alpha", json={"short_code": "alpha2"})).status_code == 200
+            # Кэш статистики по прежнему коду сброшен ретранслятором
+            assert (await client.get("/links/alpha/stats")).status_code == 404
+    finally:
+        outbox_relay.hooks = {}
+        app.dependency_overrides.clear()
+        app.state.engine = None
+        FastAPICache.reset()
+    assert [(event["event"], event["short_code"], event["previous_code"]) for event in delivered] == [
+        (LINK_UPDATED, "alpha2", "alpha"),
+    ]
+    assert await _events(engine) == []
@@ -0,0 +1,87 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from src.profiling import QueryProfilerMiddleware, profile_queries
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+def test_profile_counts_duplicates_and_n_plus_one(engine):
+    with profile_queries(n_plus_one_threshold=3) as profile:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 1"))
+            for i in range(3):
+                conn.execute(text("SELECT :i"), {"i": i})
+
+    assert profile.count == 5
+    assert profile.total_time > 0
+    assert profile.duplicates == {"SELECT 1": 2}
+    assert profile.n_plus_one == {"SELECT ?": 3}
+    assert "possible N+1 x3" in profile.report()
+
+
+def test_profiler_and_metrics_share_one_hook(engine):
+    from prometheus_client import REGISTRY
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from src import sql_timing
+    from src.metrics import instrument_sqlalchemy
+
+    instrument_sqlalchemy()
+    before = REGISTRY.get_sample_value("db_query_duration_seconds_count") or 0
+    with profile_queries() as profile:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    assert profile.count == 1
+    assert REGISTRY.get_sample_value("db_query_duration_seconds_count") == before + 1
+    assert event.contains(Engine, "before_cursor_execute", sql_timing._before_cursor_execute)
+    instrument_sqlalchemy()
+    assert len(sql_timing._observers) == len(set(sql_timing._observers))
+
+
+def test_queries_outside_profile_are_ignored(engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    with profile_queries() as profile:
+        pass
+    assert profile.count == 0
+
+
+def test_middleware_adds_server_timing(engine):
+    app = FastAPI()
+    app.add_middleware(QueryProfilerMiddleware)
+
+    @app.get("/items")
+    def items():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return []
+
+    with TestClient(app) as client:
+        response = client.get("/items")
+
+    assert response.status_code == 200
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert 'desc="2 queries"' in response.headers["server-timing"]
+
+
+def test_query_budget_fixture(engine, query_budget):
+    with query_budget(2):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    with pytest.raises(AssertionError, match="Query budget exceeded"):
+        with query_budget(1):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
@@ -0,0 +1,102 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.manager import current_active_user
+from src.database import Base, Link, ProjectStats, User, get_async_session
+from src.main import app
+from src.projects.service import get_or_create_project_id
+from src.shorturl.clicks import ClickBuffer
+from src.shorturl.project_stats import get_project_stats, link_created, link_removed
+
+USER_ID = uuid.UUID(int=1)
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'stats.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": USER_ID, "email": "owner@example.com", "username": "owner", "hashed_password": "x"},
+        ])
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def create_links(session_maker, count, project="docs"):
+    async with session_maker() as db:
+        project_id = await get_or_create_project_id(db, USER_ID, project)
+        for i in range(count):
+            link = Link(original_url=f"https://example.com/{i}", short_code=f"{project}{i}",
+                        user_id=USER_ID, project=project, project_id=project_id)
+            db.add(link)
+            await link_created(db, link)
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_create_click_delete(session_maker):
+    await create_links(session_maker, 3)
+    await create_links(session_maker, 1, project="blog")
+
+    buffer = ClickBuffer()
+    for _ in range(5):
+        buffer.record("docs1")
+    buffer.record("docs2")
+    buffer.record("blog0")
+    async with session_maker() as db:
+        await buffer.flush(db.bind)
+
+    async with session_maker() as db:
+        link = (await db.execute(select(Link).where(Link.short_code == "docs2"))).scalar_one()
+        await link_removed(db, link, expired=True)
+        await db.delete(link)
+        await db.commit()
+
+        stats = await get_project_stats(db, USER_ID, "docs", top=2)
+        assert stats["total_links"] == 2
+        assert stats["total_clicks"] == 5
+        assert stats["active_links"] == 2
+        assert stats["expired_links"] == 1
+        assert [link["short_code"] for link in stats["top_links"]] == ["docs1", "docs0"]
+
+        blog_id = await get_or_create_project_id(db, USER_ID, "blog")
+        blog = await db.get(ProjectStats, blog_id)
+        assert (blog.total_links, blog.total_clicks) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_project_stats_endpoint(session_maker, query_budget):
+    await create_links(session_maker, 4)
+
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_active_user] = lambda: User(id=USER_ID, email="owner@example.com")
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            # Счётчики - одна строка по первичному ключу, топ - по индексу, без GROUP BY
+            with query_budget(2):
+                response = await client.get("/links/projects/docs/stats", params={"top": 3})
+            missing = await client.get("/links/projects/unknown/stats")
+            # Проект без ссылок существует: нулевые счётчики, а не 404
+            assert (await client.post("/projects", json={"name": "empty"})).status_code == 201
+            empty = await client.get("/links/projects/empty/stats")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_links"] == 4
+    assert len(body["top_links"]) == 3
+    assert missing.status_code == 404
+    assert empty.status_code == 200
+    assert empty.json() == {"project": "empty", "total_links": 0, "total_clicks": 0, "active_links": 0,
+                            "expired_links": 0, "top_links": []}
@@ -0,0 +1,125 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.manager import current_active_user
+from src.database import Base, Link, OutboxEvent, ProjectStats, User, get_async_session
+from src.main import app
+from src.outbox import LINK_UPDATED, outbox_relay
+from src.projects.service import project_id_subquery
+
+USER_ID = uuid.UUID(int=1)
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'projects.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": USER_ID, "email": "owner@example.com", "username": "owner", "hashed_password": "x"},
+        ])
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(session_maker):
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_active_user] = lambda: User(id=USER_ID, email="owner@example.com")
+    FastAPICache.reset()
+    FastAPICache.init(InMemoryBackend())
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides.clear()
+    FastAPICache.reset()
+
+
+@pytest.mark.asyncio
+async def test_links_attach_to_projects(client, session_maker):
+    for i in range(3):
+        response = await client.post("/links/shorten", json={"original_url": f"https://example.com/{i}", "project": "docs"})
+        assert response.status_code == 201
+
+    projects = (await client.get("/projects")).json()
+    assert [p["name"] for p in projects] == ["docs"]
+
+    links = (await client.get("/links/projects/docs")).json()
+    assert len(links) == 3
+
+    async with session_maker() as db:
+        ids = (await db.execute(select(Link.project_id).distinct())).scalars().all()
+    assert ids == [uuid.UUID(projects[0]["id"])]
+
+
+@pytest.mark.asyncio
+async def test_project_crud(client, session_maker):
+    assert (await client.post("/projects", json={"name": "blog"})).status_code == 201
+    assert (await client.post("/projects", json={"name": "blog"})).status_code == 400
+    await client.post("/links/shorten", json={"original_url": "https://example.com/post", "project": "blog"})
+
+    renamed = await client.patch("/projects/blog", json={"name": "news"})
+    assert renamed.status_code == 200
+    assert (await client.get("/links/projects/news")).json()[0]["project"] == "news"
+    assert (await client.get("/links/projects/news/stats")).json()["total_links"] == 1
+
+    assert (await client.delete("/projects/news")).status_code == 200
+    assert (await client.get("/projects")).json() == []
+    assert (await client.delete("/projects/news")).status_code == 404
+    async with session_maker() as db:
+        link = (await db.execute(select(Link))).scalar_one()
+        assert (link.project, link.project_id) == (None, None)
+        assert (await db.execute(select(ProjectStats))).first() is None
+
+
+@pytest.mark.asyncio
+async def test_rename_and_delete_emit_link_events(client, session_maker):
+    assert (await client.post("/projects", json={"name": "news"})).status_code == 201
+    code = (await client.post("/links/shorten", json={"original_url": "https://example.com/a", "project": "blog"})).json()["short_code"]
+    delivered = []
+
+    async def collect(messages):
+        delivered.extend(messages)
+
+    outbox_relay.hooks = {"collect": collect}
+    try:
+        stats = await client.post("/links/stats/batch", json={"short_codes": [code]})
+        assert stats.json()[0]["project"] == "blog"
+        # Занятое имя - 400 по уникальному индексу, а не 500
+        assert (await client.patch("/projects/blog", json={"name": "news"})).status_code == 400
+        assert (await client.patch("/projects/blog", json={"name": "docs"})).status_code == 200
+        # Запись кэша статистики по коду сброшена событием ссылки
+        assert (await client.post("/links/stats/batch", json={"short_codes": [code]})).json()[0]["project"] == "docs"
+        assert (await client.delete("/projects/docs")).status_code == 200
+        assert (await client.post("/links/stats/batch", json={"short_codes": [code]})).json()[0]["project"] is None
+    finally:
+        outbox_relay.hooks = {}
+    updates = [(m["short_code"], m["project"], m["previous_project"]) for m in delivered if m["event"] == LINK_UPDATED]
+    assert updates == [(code, "docs", "blog"), (code, None, "docs")]
+    async with session_maker() as db:
+        assert (await db.execute(select(OutboxEvent))).first() is None
+
+
+@pytest.mark.asyncio
+async def test_project_links_use_index(session_maker):
+    stmt = (
+        select(Link)
+        .where(Link.user_id == USER_ID)
+        .where(Link.project_id == project_id_subquery(USER_ID, "docs"))
+        .order_by(Link.created_at)
+    )
+    async with session_maker() as db:
+        sql = str(stmt.compile(db.bind, compile_kwargs={"literal_binds": True}))
+        plan = " ".join(row[-1] for row in await db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert "ix_links_user_project_id_created" in plan
+    assert "uq_projects_user_name" in plan or "sqlite_autoindex_projects" in plan
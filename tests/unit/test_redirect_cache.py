@@ -0,0 +1,100 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis as fake_aioredis
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src import cache
+from src.cache import invalidate, link_tag, redirect_bucket_key
+from src.database import Base, Link
+from src.shorturl.fast_redirect import warm_redirect_cache
+from src.shorturl.redirect_cache import load_redirect, pack, prune_bucket, store_redirect, unpack
+from src.shorturl.redirect_policy import DEFAULT_POLICY
+from tests.benchmark.memory import measure_formats
+
+
+@pytest_asyncio.fixture
+async def redis():
+    FastAPICache.reset()
+    redis = fake_aioredis.FakeRedis()
+    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    yield redis
+    FastAPICache.reset()
+    await redis.close()
+
+
+def test_pack_strips_common_prefix():
+    data = pack("https://github.com/user/repo", 1700000000)
+    assert data[5:] == b"user/repo"
+    assert unpack(data) == ("https://github.com/user/repo", 1700000000, True, True, None, DEFAULT_POLICY)
+
+    assert unpack(pack("ftp://files/a", 1)).location == "ftp://files/a"
+    assert unpack(pack(None, 1, exists=True, active=False)) == (None, 1, True, False, None, DEFAULT_POLICY)
+    assert unpack(pack("https://t.me/x", 1, target="main01")) == ("https://t.me/x", 1, True, True, "main01", DEFAULT_POLICY)
+
+
+def test_pack_non_ascii_alias_target():
+    entry = unpack(pack("https://example.com/a", 1, target="ссылка"))
+    assert (entry.location, entry.target) == ("https://example.com/a", "ссылка")
+
+
+@pytest.mark.asyncio
+async def test_store_in_bucket_and_invalidate(redis):
+    await store_redirect("abc123", "https://example.com/page")
+    assert await redis.hexists(redirect_bucket_key("abc123"), "abc123")
+    assert (await load_redirect("abc123")).location == "https://example.com/page"
+
+    assert await invalidate(link_tag("abc123")) == 1
+    assert await load_redirect("abc123") is None
+
+
+@pytest.mark.asyncio
+async def test_entry_does_not_outlive_link(redis):
+    await store_redirect("gone", "https://example.com/", datetime.now(timezone.utc) - timedelta(seconds=1))
+    assert await load_redirect("gone") is None
+
+    soon = datetime.now(timezone.utc) + timedelta(seconds=5)
+    await store_redirect("soon", "https://example.com/", soon.replace(tzinfo=None))
+    assert (await load_redirect("soon")).expires == int(soon.timestamp())
+
+
+@pytest.mark.asyncio
+async def test_prune_bucket_removes_stale_fields(redis, monkeypatch):
+    monkeypatch.setattr(cache, "REDIRECT_CACHE_BUCKETS", 1)
+    bucket = redirect_bucket_key("fresh")
+    await redis.hset(bucket, "stale", pack("https://example.com/", int(time.time()) - 1))
+    await store_redirect("fresh", "https://example.com/")
+
+    assert await load_redirect("stale") is None
+    assert await prune_bucket(redis, bucket) == 1
+    assert await redis.hkeys(bucket) == [b"fresh"]
+
+
+@pytest.mark.asyncio
+async def test_packed_hot_set_is_smallest(redis, monkeypatch):
+    monkeypatch.setattr(cache, "REDIRECT_CACHE_BUCKETS", 4)
+    results = await measure_formats(redis, 400)
+    assert results["packed"]["keys"] == 4
+    assert results["packed"]["bytes"] < results["location"]["bytes"] < results["response"]["bytes"]
+
+
+@pytest.mark.asyncio
+async def test_warmup_caches_most_clicked_links(redis, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'warm.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Link), [
+            {"original_url": f"https://example.com/{i}", "short_code": f"warm{i}", "clicks": i, "is_active": i != 4}
+            for i in range(5)
+        ])
+
+    assert await warm_redirect_cache(engine, limit=2) == 2
+    assert (await load_redirect("warm3")).location == "https://example.com/3"
+    assert await load_redirect("warm2") is not None
+    assert await load_redirect("warm4") is None
+    await engine.dispose()
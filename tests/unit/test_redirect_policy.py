@@ -0,0 +1,169 @@
+import base64
+import hashlib
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from fastapi_cache import FastAPICache
+from fakeredis import aioredis as fake_aioredis
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.config import REDIRECT_PERMANENT_MAX_AGE
+from src.database import Base, Link, get_async_session
+from src.main import app
+from src.shorturl.beacon import BeaconLimiter, beacon_limiter
+from src.shorturl.clicks import click_buffer
+from src.shorturl.redirect_cache import pack, unpack
+from src.shorturl.redirect_policy import DEFAULT_POLICY, RedirectPolicy, link_policy, max_age
+
+
+def test_link_policy_and_max_age():
+    assert link_policy(None, None, None) == DEFAULT_POLICY
+    assert link_policy(302, 0, None, click_beacon=True) == RedirectPolicy(302)
+    assert link_policy(301, None, None).max_age == REDIRECT_PERMANENT_MAX_AGE
+
+    expires_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    policy = link_policy(308, 3600, expires_at, click_beacon=True)
+    deadline = expires_at.timestamp()
+    assert max_age(policy, now=deadline - 10000) == 3600
+    # Ответ не кэшируется дольше, чем живёт ссылка
+    assert max_age(policy, now=deadline - 100) == 100
+    assert max_age(policy, now=deadline + 1) == 0
+
+
+def test_policy_in_packed_entry():
+    policy = RedirectPolicy(301, 600, 1900000000, beacon=True)
+    entry = unpack(pack("https://github.com/a", 1700000000, target="main01", policy=policy))
+    assert (entry.location, entry.target, entry.policy, entry.exists) == ("https://github.com/a", "main01", policy, True)
+    # Запись с политикой по умолчанию не длиннее прежней
+    assert len(pack("https://github.com/a", 1, policy=DEFAULT_POLICY)) == 5 + len("a")
+    assert unpack(pack("https://github.com/a", 1, policy=RedirectPolicy(302))).policy == RedirectPolicy(302)
+
+
+@pytest_asyncio.fixture
+async def client(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'policy.db'}")
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=100)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Link), [
+            {"original_url": "https://example.com/p", "short_code": "perm01", "redirect_code": 301,
+             "cache_ttl": 3600, "expires_at": expires_at, "click_beacon": False},
+            {"original_url": "https://example.com/b", "short_code": "beac01", "redirect_code": 307,
+             "cache_ttl": 600, "expires_at": None, "click_beacon": True},
+            {"original_url": "https://example.com/t", "short_code": "temp01", "redirect_code": 307,
+             "cache_ttl": None, "expires_at": None, "click_beacon": False},
+            {"original_url": "JavaScript://example.com/%0Aalert(document.domain)", "short_code": "xss01", "redirect_code": 302,
+             "cache_ttl": 600, "expires_at": None, "click_beacon": True},
+        ])
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.state.engine = engine
+    InMemoryBackend._store.clear()
+    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    click_buffer._counts.clear()
+    beacon_limiter._counts.clear()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    click_buffer._counts.clear()
+    app.dependency_overrides.clear()
+    app.state.engine = None
+    FastAPICache.reset()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cacheable_permanent_redirect(client):
+    for cache_status in ("MISS", "HIT"):
+        response = await client.get("/links/perm01", follow_redirects=False)
+        assert response.status_code == 301
+        assert response.headers["x-fastapi-cache"] == cache_status
+        directive, seconds = response.headers["cache-control"].split("max-age=")
+        assert directive == "public, " and 0 < int(seconds) <= 100
+
+    default = await client.get("/links/temp01", follow_redirects=False)
+    assert (default.status_code, default.headers["cache-control"]) == (307, "no-store")
+    assert click_buffer._counts["perm01"] == 2
+
+
+@pytest.mark.asyncio
+async def test_beacon_counts_click_instead_of_server(client):
+    for _ in range(2):
+        page = await client.get("/links/beac01", follow_redirects=False)
+        assert page.status_code == 200
+        assert page.headers["cache-control"] == "public, max-age=600"
+        assert 'sendBeacon("/links/beac01/beacon")' in page.text
+        assert 'location.replace("https://example.com/b")' in page.text
+    assert click_buffer._counts["beac01"] == 0
+
+    beacon = await client.post("/links/beac01/beacon")
+    assert beacon.status_code == 204
+    assert click_buffer._counts["beac01"] == 1
+
+    # Встроенный скрипт разрешён только по хэшу, остальное запрещено
+    csp = page.headers["content-security-policy"]
+    assert "default-src 'none'" in csp and "connect-src 'self'" in csp
+    script = re.search(r"<script>(.*)</script>", page.text).group(1)
+    digest = base64.b64encode(hashlib.sha256(script.encode()).digest()).decode()
+    assert f"script-src 'sha256-{digest}'" in csp
+
+
+@pytest.mark.asyncio
+async def test_beacon_only_for_links_with_beacon(client, query_budget):
+    # Без перехода кэша нет: политика читается из БД и кладётся в кэш
+    with query_budget(1):
+        assert (await client.post("/links/beac01/beacon")).status_code == 204
+    with query_budget(0):
+        assert (await client.post("/links/beac01/beacon")).status_code == 204
+    for code in ("perm01", "temp01", "missing"):
+        assert (await client.post(f"/links/{code}/beacon")).status_code == 404
+    await client.get("/links/temp01", follow_redirects=False)
+    assert (await client.post("/links/temp01/beacon")).status_code == 404
+    assert click_buffer._counts["beac01"] == 2
+    assert click_buffer._counts["temp01"] == 1
+
+
+@pytest.mark.asyncio
+async def test_beacon_rate_limit(client, monkeypatch):
+    monkeypatch.setattr(beacon_limiter, "limit", 3)
+    statuses = [(await client.post("/links/beac01/beacon")).status_code for _ in range(5)]
+    assert statuses == [204, 204, 204, 429, 429]
+    assert click_buffer._counts["beac01"] == 3
+
+
+@pytest.mark.asyncio
+async def test_beacon_limiter_shared_in_redis():
+    redis = fake_aioredis.FakeRedis()
+    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    try:
+        # Два воркера с общим Redis делят один лимит
+        workers = [BeaconLimiter(limit=2, window=60), BeaconLimiter(limit=2, window=60)]
+        assert [await limiter.allow("10.0.0.1") for limiter in (*workers, *workers)] == [True, True, False, False]
+        assert await workers[0].allow("10.0.0.2")
+        key, = await redis.keys("beacon-rate:*:10.0.0.1")
+        assert 0 < await redis.ttl(key) <= 60
+    finally:
+        FastAPICache.reset()
+
+
+@pytest.mark.asyncio
+async def test_beacon_page_only_for_http_urls(client):
+    for cache_status in ("MISS", "HIT"):
+        response = await client.get("/links/xss01", follow_redirects=False)
+        # Адрес не попадает в страницу со скриптом - обычный редирект, по которому браузер не перейдёт
+        assert response.status_code == 302
+        assert response.headers["x-fastapi-cache"] == cache_status
+        assert response.headers["location"].startswith("JavaScript:")
+        assert "content-security-policy" not in response.headers and response.content == b""
+    assert click_buffer._counts["xss01"] == 2
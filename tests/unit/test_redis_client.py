@@ -0,0 +1,40 @@
+import pytest
+from fakeredis import aioredis as fake_aioredis
+
+from src import redis_client
+from src.redis_client import celery_broker_options, create_redis, execute_batched
+
+
+def test_create_redis_uses_pool_settings():
+    redis = create_redis("redis://localhost:6379/2", max_connections=7)
+    pool = redis.connection_pool
+    assert pool.max_connections == 7
+    assert pool.connection_kwargs["db"] == 2
+    assert pool.connection_kwargs["socket_timeout"] == redis_client.REDIS_SOCKET_TIMEOUT
+    assert pool.connection_kwargs["health_check_interval"] == redis_client.REDIS_HEALTH_CHECK_INTERVAL
+
+    with pytest.raises(ValueError):
+        create_redis(mode="replica")
+
+
+def test_sentinel_mode(monkeypatch):
+    monkeypatch.setattr(redis_client, "REDIS_SENTINELS", "s1:26379, s2")
+    monkeypatch.setattr(redis_client, "REDIS_MODE", "sentinel")
+    monkeypatch.setattr(redis_client, "CELERY_BROKER_URL", None)
+
+    redis = create_redis()
+    assert redis.connection_pool.service_name == redis_client.REDIS_SENTINEL_MASTER
+    assert redis.connection_pool.max_connections == redis_client.REDIS_MAX_CONNECTIONS
+
+    options = celery_broker_options()
+    assert options["broker"] == "sentinel://s1:26379;sentinel://s2:26379"
+    assert options["broker_transport_options"]["master_name"] == redis_client.REDIS_SENTINEL_MASTER
+
+
+@pytest.mark.asyncio
+async def test_execute_batched_keeps_order_across_chunks():
+    redis = fake_aioredis.FakeRedis()
+    commands = [("set", f"k{i}", i) for i in range(5)] + [("get", f"k{i}") for i in range(5)]
+    results = await execute_batched(redis, commands, chunk_size=3)
+    assert results == [True] * 5 + [str(i).encode() for i in range(5)]
+    await redis.close()
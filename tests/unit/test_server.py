@@ -0,0 +1,37 @@
+import pytest
+
+from src import server
+from src.server import available_cpus, server_profile, uvicorn_options
+
+
+def test_available_cpus_respects_cgroup_quota(tmp_path, monkeypatch):
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    cpu_max = tmp_path / "cpu.max"
+
+    cpu_max.write_text("150000 100000\n")
+    assert available_cpus(cpu_max) == 2
+    cpu_max.write_text("max 100000\n")
+    assert available_cpus(cpu_max) == 8
+    assert available_cpus(tmp_path / "missing") == 8
+
+
+def test_production_profile(monkeypatch):
+    monkeypatch.setattr(server, "available_cpus", lambda: 3)
+    monkeypatch.delenv("WEB_WORKERS", raising=False)
+    profile = server_profile("production")
+    assert profile.workers == 3
+    assert (profile.loop, profile.http, profile.preload) == ("uvloop", "httptools", True)
+    assert profile.max_requests > 0 and profile.max_requests_jitter > 0
+
+    monkeypatch.setenv("WEB_WORKERS", "5")
+    assert server_profile("production").workers == 5
+
+
+def test_development_profile_for_uvicorn_run(monkeypatch):
+    monkeypatch.setenv("SERVER_PROFILE", "development")
+    options = uvicorn_options(server_profile())
+    assert options["reload"] is True and options["workers"] is None
+    assert options["limit_max_requests"] is None
+
+    with pytest.raises(ValueError):
+        server_profile("turbo")
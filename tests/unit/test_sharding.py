@@ -0,0 +1,365 @@
+import asyncio
+import random
+import sqlite3
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event, func, insert, inspect, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src import sharding
+from src.auth.manager import current_active_user
+from src.database import Base, Link, LinkAlias, OutboxEvent, Project, ProjectStats, User, get_async_session
+from src.main import app
+from src.outbox import LINK_CREATED, LINK_DELETED, LINK_EXPIRED, LINK_UPDATED, outbox_relay
+from src.sharding import HashRing, ShardRouter, _move, create_shard_engine, create_shard_tables, parse_shards, reshard
+from src.shorturl.clicks import ClickBuffer
+from src.shorturl.fast_redirect import _resolve_stmt
+from src.shorturl.router import redirect_to_original
+from src.shorturl.snapshot import SnapshotReader
+from src.tasks import tasks
+from src.tasks.snapshot import export_redirect_snapshot
+
+USER_ID = uuid.UUID(int=1)
+
+
+def test_ring_moves_only_to_new_shard():
+    codes = [f"code{i}" for i in range(5000)]
+    before = HashRing(["s0", "s1", "s2"])
+    after = HashRing(["s0", "s1", "s2", "s3"])
+    moved = [code for code in codes if before.shard_for(code) != after.shard_for(code)]
+    assert {after.shard_for(code) for code in moved} == {"s3"}
+    assert 0.15 < len(moved) / len(codes) < 0.35
+    assert {before.shard_for(code) for code in codes} == {"s0", "s1", "s2"}
+
+
+def test_parse_shards_and_schema():
+    assert parse_shards("a=sqlite+aiosqlite:///a.db  b=postgresql+asyncpg://u:p@h/db?schema=b") == {
+        "a": "sqlite+aiosqlite:///a.db", "b": "postgresql+asyncpg://u:p@h/db?schema=b",
+    }
+    with pytest.raises(ValueError):
+        parse_shards("sqlite+aiosqlite:///a.db")
+    engine = create_shard_engine("sqlite+aiosqlite:///x.db?schema=shard1")
+    assert engine.get_execution_options()["schema_translate_map"] == {None: "shard1"}
+    assert "schema" not in engine.url.query
+
+
+@pytest_asyncio.fixture
+async def router(tmp_path):
+    engines = {}
+    for name in ("s0", "s1", "s2"):
+        engines[name] = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        await create_shard_tables(engines[name])
+    router = ShardRouter(engines)
+    yield router
+    await router.dispose()
+
+
+def _link(code: str, **values) -> dict:
+    return {"id": uuid.uuid4(), "original_url": f"https://example.com/{code}", "short_code": code,
+            "is_active": True, **values}
+
+
+async def _codes(engine) -> set[str]:
+    async with engine.connect() as conn:
+        return set((await conn.execute(select(Link.short_code))).scalars())
+
+
+@pytest.mark.asyncio
+async def test_first_and_merged(router):
+    owner = uuid.uuid4()
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    links = [_link(f"m{i}", user_id=owner, created_at=start + timedelta(minutes=i)) for i in range(12)]
+    for link in links:
+        async with router.engine_for(link["short_code"]).begin() as conn:
+            await conn.execute(insert(Link), [link])
+    # Ссылка не на своём шарде (переименована или ещё не перенесена) находится на остальных
+    stray = "stray01"
+    other = next(name for name in router.engines if name != router.shard_for(stray))
+    async with router.engines[other].begin() as conn:
+        await conn.execute(insert(Link), [_link(stray)])
+
+    stmt = select(Link.short_code).where(Link.short_code == "m3")
+    assert (await router.first(stmt, {}, "m3")).short_code == "m3"
+    assert (await router.first(select(Link.short_code).where(Link.short_code == stray), {}, stray)) is not None
+    assert await router.first(select(Link.short_code).where(Link.short_code == "none"), {}, "none") is None
+
+    rows = await router.merged(
+        select(Link.short_code, Link.created_at).where(Link.user_id == owner).order_by(Link.created_at.desc()),
+        key=lambda row: row.created_at, reverse=True, limit=5,
+    )
+    assert [row.short_code for row in rows] == ["m11", "m10", "m9", "m8", "m7"]
+
+
+@pytest.mark.asyncio
+async def test_shard_tables_without_foreign_keys(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'shard.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    await create_shard_tables(engine)
+    await create_shard_tables(engine)
+    async with engine.begin() as conn:
+        tables = await conn.run_sync(lambda sync: {
+            name: [fk["referred_table"] for fk in inspect(sync).get_foreign_keys(name)]
+            for name in inspect(sync).get_table_names()
+        })
+        assert tables == {"links": [], "link_aliases": ["links"], "outbox": [], "outbox_dead": []}
+        # Владельца и проекта на шарде нет - ссылка всё равно записывается
+        link = _link("fk01", user_id=uuid.uuid4(), project_id=uuid.uuid4())
+        await conn.execute(insert(Link), [link])
+        await conn.execute(insert(LinkAlias), [{"short_code": "old-fk01", "link_id": link["id"]}])
+    # Основная схема не изменилась
+    assert {fk.column.table.name for fk in Link.__table__.foreign_keys} == {"users", "projects"}
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_sharded_redirect_and_click_flush(router, tmp_path, monkeypatch):
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    owner, project_id = uuid.uuid4(), uuid.uuid4()
+    async with primary.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Project), [{"id": project_id, "user_id": owner, "name": "p"}])
+        await conn.execute(insert(ProjectStats), [{"project_id": project_id, "total_clicks": 0}])
+    async with router.engine_for("shard01").begin() as conn:
+        await conn.execute(insert(Link), [_link("shard01", user_id=owner, project="p", project_id=project_id)])
+    monkeypatch.setattr(sharding, "shard_router", router)
+
+    app.state.engine = primary
+    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/links/shard01", follow_redirects=False)
+        assert response.headers["location"] == "https://example.com/shard01"
+    finally:
+        app.state.engine = None
+        FastAPICache.reset()
+
+    buffer = ClickBuffer()
+    buffer.record("shard01")
+    buffer.record("shard01")
+    assert await buffer.flush(primary) == 1
+    async with router.engine_for("shard01").connect() as conn:
+        assert (await conn.execute(select(Link.clicks).where(Link.short_code == "shard01"))).scalar() == 2
+    async with primary.connect() as conn:
+        assert (await conn.execute(select(func.sum(ProjectStats.total_clicks)))).scalar() == 2
+    await primary.dispose()
+
+
+@pytest_asyncio.fixture
+async def primary(tmp_path):
+    """Основная БД (пользователи, проекты, счётчики) - не входит в шарды"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": USER_ID, "email": "owner@example.com", "username": "owner", "hashed_password": "x"},
+        ])
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def sharded_client(router, primary, monkeypatch):
+    session_maker = async_sessionmaker(primary, expire_on_commit=False)
+
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    monkeypatch.setattr(sharding, "shard_router", router)
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_active_user] = lambda: User(id=USER_ID, email="owner@example.com")
+    FastAPICache.reset()
+    FastAPICache.init(InMemoryBackend())
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+    FastAPICache.reset()
+
+
+async def _where(router, code: str) -> list[str]:
+    """Шарды, на которых лежит ссылка с кодом code"""
+    return [name for name, engine in router.engines.items() if code in await _codes(engine)]
+
+
+@pytest.mark.asyncio
+async def test_link_writes_go_to_shards(sharded_client, router, primary):
+    delivered = []
+
+    async def collect(messages):
+        delivered.extend(messages)
+
+    outbox_relay.hooks = {"collect": collect}
+    try:
+        link = {"original_url": "https://example.com/a", "username": "owner", "project": "p"}
+        response = await sharded_client.post("/links/shorten", json={**link, "custom_alias": "alpha1"})
+        assert response.status_code == 201
+        assert await _where(router, "alpha1") == [router.shard_for("alpha1")]
+        assert "alpha1" not in await _codes(primary)
+        reused = await sharded_client.post("/links/shorten", json={**link, "reuse_existing": True})
+        assert (reused.status_code, reused.json()["short_code"]) == (200, "alpha1")
+
+        # Код, занятый на другом шарде, тоже занят
+        taken = "taken1"
+        homes = (router.shard_for(taken), router.shard_for("alpha1"))
+        other = next(name for name in router.engines if name not in homes)
+        async with router.engines[other].begin() as conn:
+            await conn.execute(insert(Link), [_link(taken)])
+        assert (await sharded_client.post("/links/shorten", json={**link, "custom_alias": taken})).status_code == 400
+        assert (await sharded_client.put("/links/alpha1", json={"short_code": taken})).status_code == 400
+
+        assert (await sharded_client.get("/links/alpha1/stats")).json()["project"] == "p"
+        # Переименованная ссылка остаётся на своём шарде, прежний код - её алиас
+        renamed = await sharded_client.put("/links/alpha1", json={"short_code": "beta22", "keep_alias": True})
+        assert renamed.status_code == 200
+        assert await _where(router, "beta22") == [router.shard_for("alpha1")]
+        patched = await sharded_client.patch("/links/beta22/redirect", json={"redirect_code": 302})
+        assert patched.json()["redirect_code"] == 302
+
+        # Обычный (не быстрый) маршрут редиректа тоже ищет по шардам
+        async with async_sessionmaker(primary)() as db:
+            for code in ("beta22", "alpha1"):
+                response = await redirect_to_original(code, db)
+                assert (response.status_code, response.headers["location"]) == (302, "https://example.com/a")
+
+        assert (await sharded_client.delete("/links/beta22")).status_code == 200
+        assert await _where(router, "beta22") == []
+        assert (await sharded_client.get("/links/beta22/stats")).status_code == 404
+    finally:
+        outbox_relay.hooks = {}
+
+    # События записаны на шарде ссылки и разобраны ретранслятором после ответа
+    assert [(m["event"], m["short_code"]) for m in delivered] == [
+        (LINK_CREATED, "alpha1"), (LINK_UPDATED, "beta22"), (LINK_UPDATED, "beta22"), (LINK_DELETED, "beta22"),
+    ]
+    for engine in (primary, *router.engines.values()):
+        async with engine.connect() as conn:
+            assert (await conn.execute(select(OutboxEvent.id))).first() is None
+    async with primary.connect() as conn:
+        assert (await conn.execute(select(ProjectStats.total_links))).scalar() == 0
+
+
+@pytest.mark.asyncio
+async def test_cleanup_and_snapshot_span_shards(router, primary, tmp_path, monkeypatch):
+    now = datetime.now(timezone.utc)
+    codes = [f"live{i}" for i in range(6)]
+    expired = [f"dead{i}" for i in range(6)]
+    for code in codes:
+        async with router.engine_for(code).begin() as conn:
+            await conn.execute(insert(Link), [_link(code)])
+    for code in expired:
+        async with router.engine_for(code).begin() as conn:
+            await conn.execute(insert(Link), [_link(code, expires_at=now - timedelta(days=1))])
+    assert len({router.shard_for(code) for code in codes + expired}) > 1
+    monkeypatch.setattr(sharding, "shard_router", router)
+
+    path = tmp_path / "redirects.snapshot"
+    assert await export_redirect_snapshot(path) == len(codes)
+    reader = SnapshotReader(path)
+    reader.refresh()
+    assert all(reader.lookup(code)[0] == f"https://example.com/{code}" for code in codes)
+    reader.close()
+
+    monkeypatch.setattr(tasks, "get_engine", lambda: primary)
+    monkeypatch.setattr(tasks, "async_session_maker", async_sessionmaker(primary, expire_on_commit=False))
+    monkeypatch.setattr(tasks, "DEFAULT_UNUSED_LINK_DAYS", 30)
+    assert await tasks.async_cleanup_expired_links() == f"Deleted {len(expired)} expired/unused links"
+    remaining = set()
+    events = []
+    for engine in router.engines.values():
+        remaining |= await _codes(engine)
+        async with engine.connect() as conn:
+            events += (await conn.execute(select(OutboxEvent.event, OutboxEvent.short_code))).all()
+    assert remaining == set(codes)
+    assert sorted(events) == sorted((LINK_EXPIRED, code) for code in expired)
+
+
+@pytest.mark.asyncio
+async def test_reshard_moves_ranges_while_reads_resolve(tmp_path, monkeypatch):
+    engines = {}
+    for name in ("s0", "s1", "s2"):
+        engines[name] = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        await create_shard_tables(engines[name])
+    before = ShardRouter({name: engines[name] for name in ("s0", "s1")})
+    codes = [f"r{i:03d}" for i in range(120)]
+    for code in codes:
+        link = _link(code, clicks=1)
+        async with before.engine_for(code).begin() as conn:
+            await conn.execute(insert(Link), [link])
+            await conn.execute(insert(LinkAlias), [{"short_code": f"old-{code}", "link_id": link["id"]}])
+    # Приложение уже работает с новым набором шардов, ссылки ещё на прежних местах
+    after = ShardRouter(engines)
+    monkeypatch.setattr(sharding, "shard_router", after)
+    assert any(after.shard_for(code) == "s2" for code in codes)
+
+    buffer = ClickBuffer()
+    clicks = 0
+    done = asyncio.Event()
+
+    async def read_and_click():
+        nonlocal clicks
+        while not done.is_set():
+            for code in random.sample(codes, 10):
+                for key in (code, f"old-{code}"):
+                    row = await after.first(_resolve_stmt, {"code": key}, key)
+                    assert row is not None and row.short_code == code
+                buffer.record(code)
+                clicks += 1
+            await buffer.flush(None)
+
+    async def move():
+        try:
+            return await reshard(after, batch_size=7)
+        finally:
+            done.set()
+
+    moved, _ = await asyncio.gather(move(), read_and_click())
+    assert moved == sum(after.shard_for(code) != before.shard_for(code) for code in codes)
+    total = 0
+    for code in codes:
+        assert await _where(after, code) == [after.shard_for(code)]
+    for engine in engines.values():
+        async with engine.connect() as conn:
+            total += (await conn.execute(select(func.coalesce(func.sum(Link.clicks), 0)))).scalar()
+            rows = (await conn.execute(select(LinkAlias.short_code, Link.short_code).join(Link))).all()
+            assert all(alias == f"old-{code}" for alias, code in rows)
+            assert len(rows) == len(await _codes(engine))
+    # Ни один переход не потерян и не посчитан дважды
+    assert total == len(codes) + clicks
+    assert await reshard(after, batch_size=7) == 0
+    await after.dispose()
+
+
+@pytest.mark.asyncio
+async def test_move_carries_changes_made_before_copy_was_visible(tmp_path):
+    source = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'source.db'}")
+    target = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'target.db'}")
+    for engine in (source, target):
+        await create_shard_tables(engine)
+    async with source.begin() as conn:
+        await conn.execute(insert(Link), [_link("late01", clicks=5), _link("gone01", clicks=0)])
+
+    # Пока копия на новом шарде не зафиксирована, запросы ещё попадают на старый
+    @event.listens_for(target.sync_engine, "commit", once=True)
+    def write_to_source(conn):
+        with sqlite3.connect(tmp_path / "source.db") as db:
+            db.execute("UPDATE links SET clicks = clicks + 3, original_url = 'https://example.com/new' "
+                       "WHERE short_code = 'late01'")
+            db.execute("DELETE FROM links WHERE short_code = 'gone01'")
+
+    assert await _move(source, target, ["late01", "gone01"]) == 1
+    assert await _codes(source) == set()
+    async with target.connect() as conn:
+        rows = (await conn.execute(select(Link.short_code, Link.original_url, Link.clicks))).all()
+    assert [tuple(row) for row in rows] == [("late01", "https://example.com/new", 8)]
+    await source.dispose()
+    await target.dispose()
@@ -0,0 +1,124 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, union_all
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src import snapshot_app
+from src.database import Base, Link, LinkAlias
+from src.shorturl.redirect_policy import DEFAULT_POLICY, RedirectPolicy
+from src.shorturl.snapshot import Snapshot, SnapshotEntry, SnapshotReader, write_snapshot
+from src.tasks import snapshot as tasks_snapshot
+from src.tasks.snapshot import export_redirect_snapshot
+
+
+def test_write_and_lookup(tmp_path):
+    path = tmp_path / "redirects.snapshot"
+    policy = RedirectPolicy(301, 600, 0, beacon=True)
+    entries = [SnapshotEntry(f"code{i:04d}", f"https://example.com/{i}", DEFAULT_POLICY) for i in range(500)]
+    entries += [
+        SnapshotEntry("кириллица", "https://example.com/%D0%BA", policy),
+        SnapshotEntry("gone01", "https://example.com/gone", DEFAULT_POLICY, expires=1000),
+        SnapshotEntry("code0001", "https://example.com/duplicate", DEFAULT_POLICY),
+    ]
+    assert write_snapshot(path, entries, created_at=42) == 502
+
+    snapshot = Snapshot(path)
+    assert (len(snapshot), snapshot.created_at) == (502, 42)
+    assert snapshot.lookup("code0001") == ("https://example.com/1", DEFAULT_POLICY)
+    assert snapshot.lookup("code0499") == ("https://example.com/499", DEFAULT_POLICY)
+    assert snapshot.lookup("кириллица") == ("https://example.com/%D0%BA", policy)
+    assert snapshot.lookup("missing") is None
+    # Истёкшая ссылка не отдаётся, хотя и есть в снимке
+    assert snapshot.lookup("gone01", now=999)[0] == "https://example.com/gone"
+    assert snapshot.lookup("gone01", now=1000) is None
+    snapshot.close()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_reader_hot_swap(tmp_path):
+    path = tmp_path / "redirects.snapshot"
+    reader = SnapshotReader(path)
+    assert reader.refresh() is False and reader.lookup("a") is None
+
+    write_snapshot(path, [SnapshotEntry("a", "https://example.com/old", DEFAULT_POLICY)])
+    assert reader.refresh() is True
+    old = reader.snapshot
+    assert reader.refresh() is False
+
+    write_snapshot(path, [SnapshotEntry("a", "https://example.com/new", DEFAULT_POLICY),
+                          SnapshotEntry("b", "https://example.com/b", DEFAULT_POLICY)])
+    assert reader.refresh() is True
+    assert reader.lookup("a")[0] == "https://example.com/new"
+    assert reader.lookup("b") is not None
+    assert old._mm.closed
+
+    # Битый файл не заменяет рабочий снимок
+    broken = tmp_path / "broken"
+    broken.write_bytes(b"garbage")
+    os.replace(broken, path)
+    assert reader.refresh() is False
+    assert reader.lookup("a")[0] == "https://example.com/new"
+    reader.close()
+
+
+@pytest.mark.asyncio
+async def test_export_and_reader_app(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'snapshot.db'}")
+    link_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Link), [
+            {"id": link_id, "original_url": "https://example.com/a b", "short_code": "live01",
+             "is_active": True, "expires_at": now + timedelta(days=1), "redirect_code": 308, "cache_ttl": 600},
+            {"id": uuid.uuid4(), "original_url": "https://example.com/off", "short_code": "off01",
+             "is_active": False, "expires_at": None, "redirect_code": 307, "cache_ttl": None},
+            {"id": uuid.uuid4(), "original_url": "https://example.com/old", "short_code": "old01",
+             "is_active": True, "expires_at": now - timedelta(days=1), "redirect_code": 307, "cache_ttl": None},
+        ])
+        await conn.execute(insert(LinkAlias), [{"short_code": "prev01", "link_id": link_id}])
+
+    path = tmp_path / "redirects.snapshot"
+    assert await export_redirect_snapshot(path, engine) == 2
+    await engine.dispose()
+
+    reader = SnapshotReader(path)
+    monkeypatch.setattr(snapshot_app, "reader", reader)
+    reader.refresh()
+    async with AsyncClient(transport=ASGITransport(app=snapshot_app.app), base_url="http://test") as client:
+        for code in ("live01", "prev01"):
+            response = await client.get(f"/links/{code}")
+            assert response.status_code == 308
+            assert response.headers["location"] == "https://example.com/a%20b"
+            assert response.headers["cache-control"] == "public, max-age=600"
+        for code in ("off01", "old01", "missing"):
+            assert (await client.get(f"/links/{code}")).status_code == 404
+        assert (await client.get("/health")).json() == {"links": 2, "created_at": reader.snapshot.created_at}
+    reader.close()
+
+
+@pytest.mark.asyncio
+async def test_export_prefers_link_over_colliding_alias(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'snapshot.db'}")
+    link_id = uuid.uuid4()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Link), [
+            {"id": link_id, "original_url": "https://example.com/renamed", "short_code": "new01", "is_active": True},
+            {"id": uuid.uuid4(), "original_url": "https://example.com/link", "short_code": "dup01", "is_active": True},
+        ])
+        await conn.execute(insert(LinkAlias), [{"short_code": "dup01", "link_id": link_id}])
+    # Ветки UNION ALL в обратном порядке: алиасы приходят раньше ссылок
+    monkeypatch.setattr(tasks_snapshot, "_snapshot_stmt", union_all(*reversed(tasks_snapshot._snapshot_stmt.selects)))
+
+    path = tmp_path / "redirects.snapshot"
+    assert await export_redirect_snapshot(path, engine) == 2
+    await engine.dispose()
+    reader = SnapshotReader(path)
+    reader.refresh()
+    assert reader.lookup("dup01")[0] == "https://example.com/link"
+    reader.close()
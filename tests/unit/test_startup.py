@@ -0,0 +1,19 @@
+from tests.benchmark.startup import boot_sample, parse_importtime
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:      1500 |      40210 | src.main\n"
+    )
+    entries = parse_importtime(stderr)
+    assert [(e.module, e.self_us, e.cumulative_us) for e in entries] == [("_io", 120, 120), ("src.main", 1500, 40210)]
+
+
+def test_app_import_is_lazy():
+    # Время старта зависит от машины и проверяется бенчмарком (python -m tests.benchmark.startup)
+    sample = boot_sample()
+    # Celery и SMTP подгружаются только обработчиками задач, движок БД создаёт lifespan
+    assert sample.loaded == []
+    assert not sample.engine
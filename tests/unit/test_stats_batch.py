@@ -0,0 +1,114 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis as fake_aioredis
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.manager import current_active_user
+from src.cache import _local_tags, get_many, invalidate, link_tag, set_many
+from src.config import STATS_BATCH_MAX_CODES
+from src.database import Base, Link, User, get_async_session
+from src.main import app
+
+OWNER = uuid.UUID(int=1)
+OTHER = uuid.UUID(int=2)
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'stats_batch.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": OWNER, "email": "owner@example.com", "username": "owner", "hashed_password": "x"},
+            {"id": OTHER, "email": "other@example.com", "username": "other", "hashed_password": "x"},
+        ])
+        await conn.execute(insert(Link), [
+            *({"original_url": f"https://example.com/{i}", "short_code": f"own{i}", "user_id": OWNER, "clicks": i,
+               "project": None} for i in range(600)),
+            {"original_url": "https://example.com/x", "short_code": "foreign", "user_id": OTHER, "clicks": 0,
+             "project": None},
+            {"original_url": "https://example.com/p", "short_code": "public", "user_id": None, "clicks": 0,
+             "project": None},
+        ])
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(engine):
+    FastAPICache.reset()
+    InMemoryBackend._store.clear()
+    _local_tags.clear()
+    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_active_user] = lambda: User(id=OWNER, email="owner@example.com")
+    app.state.engine = engine
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides.clear()
+    app.state.engine = None
+    FastAPICache.reset()
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_own_links_in_order(client, engine, query_budget):
+    codes = [f"own{i}" for i in range(499, -1, -1)]
+    request = {"short_codes": [*codes, "own5", "foreign", "public", "missing"]}
+    with query_budget(1):
+        response = await client.post("/links/stats/batch", json=request)
+    assert response.status_code == 200
+    assert response.headers["x-fastapi-cache"] == "MISS"
+    body = response.json()
+    assert [item["short_code"] for item in body] == codes
+    assert body[0]["clicks"] == 499 and body[0]["original_url"] == "https://example.com/499"
+
+    # Повтор целиком из кэша, без запросов к БД
+    async with engine.begin() as conn:
+        await conn.execute(update(Link).where(Link.short_code == "own499").values(clicks=0))
+    with query_budget(0):
+        cached = await client.post("/links/stats/batch", json=request)
+    assert cached.headers["x-fastapi-cache"] == "HIT"
+    assert cached.json() == body
+
+    # Из БД добирается только промах; изменение ссылки сбрасывает её запись
+    await invalidate(link_tag("own499"))
+    with query_budget(1):
+        mixed = await client.post("/links/stats/batch", json={"short_codes": ["own499", "own500", "own1"]})
+    assert [(item["short_code"], item["clicks"]) for item in mixed.json()] == [("own499", 0), ("own500", 500), ("own1", 1)]
+
+
+@pytest.mark.asyncio
+async def test_batch_limits(client):
+    assert (await client.post("/links/stats/batch", json={"short_codes": []})).status_code == 422
+    too_many = [f"c{i}" for i in range(STATS_BATCH_MAX_CODES + 1)]
+    assert (await client.post("/links/stats/batch", json={"short_codes": too_many})).status_code == 422
+    response = await client.post("/links/stats/batch", json={"short_codes": ["foreign", "missing"]})
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_get_set_many_redis():
+    redis = fake_aioredis.FakeRedis()
+    FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
+    try:
+        await set_many([("k1", b"1", [link_tag("a")]), ("k2", b"2", [link_tag("b")])], expire=30)
+        assert await get_many(["k1", "missing", "k2"]) == [b"1", None, b"2"]
+        assert 0 < await redis.ttl("k1") <= 30
+        await invalidate(link_tag("a"))
+        assert await get_many(["k1", "k2"]) == [None, b"2"]
+    finally:
+        FastAPICache.reset()
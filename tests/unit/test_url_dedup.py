@@ -0,0 +1,105 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.manager import current_active_user
+from src.database import Base, Link, User, get_async_session
+from src.main import app
+from src.utils.url import canonicalize_url, url_hash
+
+OWNER = uuid.UUID(int=1)
+OTHER = uuid.UUID(int=2)
+
+
+def test_canonical_url():
+    assert canonicalize_url(" HTTPS://Example.COM:443") == "https://example.com/"
+    assert canonicalize_url("http://Example.com:8080/A?b=1#c") == "http://example.com:8080/A?b=1#c"
+    assert url_hash("https://example.com") == url_hash("https://EXAMPLE.com/")
+    assert url_hash("https://example.com/a") != url_hash("https://example.com/A")
+    assert len(url_hash("https://example.com")) == 32
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'dedup.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"id": OWNER, "email": "owner@example.com", "username": "owner", "hashed_password": "x"},
+            {"id": OTHER, "email": "other@example.com", "username": "other", "hashed_password": "x"},
+        ])
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def client(engine):
+    FastAPICache.reset()
+    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    current = {"user": User(id=OWNER, email="owner@example.com")}
+
+    async def override_db():
+        async with session_maker() as db:
+            yield db
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_active_user] = lambda: current["user"]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        ac.current = current
+        yield ac
+    app.dependency_overrides.clear()
+    FastAPICache.reset()
+
+
+async def shorten(client, url, **extra):
+    return await client.post("/links/shorten", json={"original_url": url, "username": "owner", **extra})
+
+
+@pytest.mark.asyncio
+async def test_reuse_existing_returns_same_code(client, engine):
+    first = await shorten(client, "https://example.com/page")
+    assert first.status_code == 201
+
+    reused = await shorten(client, "https://EXAMPLE.com:443/page", reuse_existing=True)
+    assert reused.status_code == 200
+    assert reused.json()["short_code"] == first.json()["short_code"]
+
+    # Без флага, у другого пользователя и после деактивации - новая ссылка
+    assert (await shorten(client, "https://example.com/page")).status_code == 201
+    client.current["user"] = User(id=OTHER, email="other@example.com")
+    other = await shorten(client, "https://example.com/page", reuse_existing=True)
+    assert other.status_code == 201
+    client.current["user"] = User(id=OWNER, email="owner@example.com")
+
+    async with engine.begin() as conn:
+        await conn.execute(update(Link).where(Link.user_id == OWNER).values(is_active=False))
+    assert (await shorten(client, "https://example.com/page", reuse_existing=True)).status_code == 201
+
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(func.count()).select_from(Link))).scalar() == 4
+
+
+@pytest.mark.asyncio
+async def test_reuse_existing_requires_same_settings(client):
+    expires_at = "2099-01-01T00:00:00+00:00"
+    first = await shorten(client, "https://example.com/doc", project="a", expires_at=expires_at)
+    assert first.status_code == 201
+
+    same = await shorten(client, "https://example.com/doc", project="a", expires_at="2099-01-01T03:00:00+03:00",
+                         reuse_existing=True)
+    assert (same.status_code, same.json()["short_code"]) == (200, first.json()["short_code"])
+    # Другой проект, срок или политика редиректа - новая ссылка с запрошенными параметрами
+    for changed in ({"project": "b"}, {"expires_at": None}, {"expires_at": "2099-01-02T00:00:00+00:00"},
+                    {"redirect_code": 301}, {"cache_ttl": 60}, {"click_beacon": True}):
+        request = {"project": "a", "expires_at": expires_at, **changed}
+        created = await shorten(client, "https://example.com/doc", reuse_existing=True, **request)
+        assert created.status_code == 201, changed
+        assert created.json()["short_code"] != first.json()["short_code"]
+        assert created.json()["project"] == request["project"]
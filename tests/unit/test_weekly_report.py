@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database import Base, Link, User
+from src.tasks.email import render_email
+from src.tasks.report import iter_weekly_reports
+
+NOW = datetime(2025, 3, 10, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'report.db'}")
+    users = [
+        {"id": uuid.UUID(int=i), "email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x"}
+        for i in range(1, 8)
+    ]
+    links = [
+        {"short_code": f"u{u}l{n}", "original_url": f"https://example.com/{u}/{n}", "clicks": n * 10,
+         "user_id": uuid.UUID(int=u), "project": "docs" if n % 2 else None,
+         "created_at": NOW - timedelta(days=n * 3), "expires_at": NOW + timedelta(days=n)}
+        # У user7 ссылок нет - отчёт ему не нужен
+        for u in range(1, 7) for n in range(1, 7)
+    ]
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), users)
+        await conn.execute(insert(Link), links)
+    yield engine
+    await engine.dispose()
+
+
+async def collect(engine, **kwargs):
+    async with engine.connect() as conn:
+        return [chunk async for chunk in iter_weekly_reports(conn, now=NOW, **kwargs)]
+
+
+@pytest.mark.asyncio
+async def test_weekly_report_aggregates(engine):
+    chunks = await collect(engine, top=3)
+    reports = [report for chunk in chunks for report in chunk]
+    assert [r["username"] for r in reports] == [f"user{i}" for i in range(1, 7)]
+
+    report = reports[0]
+    assert report["to"] == "user1@example.com"
+    assert report["total_links"] == 6
+    assert report["total_clicks"] == 210
+    assert report["new_links"] == 2
+    assert [link["clicks"] for link in report["top_links"]] == [60, 50, 40]
+    assert report["projects"] == [{"project": "docs", "links": 3, "clicks": 90}]
+    assert [link["short_code"] for link in report["expiring"]] == ["u1l1", "u1l2", "u1l3"]
+
+    body = render_email("weekly_report.html", subject="Отчёт", **report).get_content()
+    assert "u1l6" in body and "docs" in body
+
+
+@pytest.mark.asyncio
+async def test_weekly_report_query_count_independent_of_users(engine, query_budget):
+    # 7 пользователей пачками по 3: 3 пачки по 5 запросов и пустая выборка в конце
+    with query_budget(16, allow_n_plus_one=True):
+        chunks = await collect(engine, chunk_size=3)
+    assert [len(chunk) for chunk in chunks] == [3, 3]